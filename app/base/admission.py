@@ -0,0 +1,191 @@
+import asyncio
+import math
+import time
+from collections import deque
+from dataclasses import asdict, dataclass
+from typing import Any, AsyncIterator, Callable
+
+from app.base.metrics import ADMISSION_REQUESTS
+from app.config import settings
+
+
+@dataclass
+class AdmissionStats:
+    admitted: int = 0
+    # admitted after waiting in the queue
+    waited: int = 0
+    shed_queue_full: int = 0
+    shed_deadline: int = 0
+    in_flight: int = 0
+    queued: int = 0
+
+    def as_dict(self) -> dict[str, int]:
+        return asdict(self)
+
+
+class Overloaded(Exception):
+    """The request was shed, it can be retried after `retry_after` seconds"""
+
+    def __init__(self, name: str, retry_after: int):
+        super().__init__(f"Too many {name} requests, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+class AdmissionLimiter:
+    """
+    Lets at most `limit` requests in at once, the next ones wait in a FIFO
+    queue of `queue_size` for up to `max_wait` seconds. A request that finds the
+    queue full, or would wait longer than that (by the recent time in flight of
+    the requests), is shed right away with `Overloaded` instead of queueing on
+    the connection pool. A `limit` of 0 lets every request in
+    """
+
+    def __init__(self, name: str, limit: int, queue_size: int, max_wait: float):
+        self.name = name
+        self.limit = limit
+        self.queue_size = queue_size
+        self.max_wait = max_wait
+        self._waiters: deque[asyncio.Future] = deque()
+        self._in_flight = 0
+        # moving average of the seconds a request is in flight
+        self._service_time = 0.0
+        self._stats = AdmissionStats()
+
+    def expected_wait(self) -> float:
+        """Seconds a request arriving now would wait for a slot"""
+        return (len(self._waiters) + 1) * self._service_time / max(self.limit, 1)
+
+    def _shed(self, reason: str) -> Overloaded:
+        if reason == "queue_full":
+            self._stats.shed_queue_full += 1
+        else:
+            self._stats.shed_deadline += 1
+        ADMISSION_REQUESTS.labels(self.name, f"shed_{reason}").inc()
+        retry_after = max(1, math.ceil(self.expected_wait()))
+        return Overloaded(self.name, retry_after)
+
+    def _admit(self, waited: bool = False) -> None:
+        self._stats.admitted += 1
+        self._stats.waited += waited
+        ADMISSION_REQUESTS.labels(self.name, "admitted").inc()
+
+    async def acquire(self) -> None:
+        if self.limit <= 0:
+            self._admit()
+            return
+        if self._in_flight < self.limit and not self._waiters:
+            self._in_flight += 1
+            self._admit()
+            return
+        if len(self._waiters) >= self.queue_size:
+            raise self._shed("queue_full")
+        if self.expected_wait() > self.max_wait:
+            raise self._shed("deadline")
+
+        # the request releasing a slot hands it over by resolving the future
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        try:
+            async with asyncio.timeout(self.max_wait):
+                await future
+        except (TimeoutError, asyncio.CancelledError) as e:
+            if future.done() and not future.cancelled():
+                # it got the slot as it gave up
+                if isinstance(e, TimeoutError):
+                    self._admit(waited=True)
+                    return
+                self.release()
+                raise
+            self._waiters.remove(future)
+            if isinstance(e, TimeoutError):
+                raise self._shed("deadline") from None
+            raise
+        self._admit(waited=True)
+
+    def release(self, duration: float | None = None) -> None:
+        if self.limit <= 0:
+            return
+        if duration is not None:
+            self._service_time = (
+                duration
+                if not self._service_time
+                else 0.8 * self._service_time + 0.2 * duration
+            )
+        while self._waiters:
+            future = self._waiters.popleft()
+            if not future.done():
+                future.set_result(None)
+                return
+        self._in_flight -= 1
+
+    @property
+    def stats(self) -> AdmissionStats:
+        self._stats.in_flight = self._in_flight
+        self._stats.queued = len(self._waiters)
+        return self._stats
+
+
+limiters = {
+    kind: AdmissionLimiter(
+        kind,
+        limit=limit,
+        queue_size=settings.ADMISSION_QUEUE_SIZE,
+        max_wait=settings.ADMISSION_MAX_WAIT_SECONDS,
+    )
+    for kind, limit in (
+        ("read", settings.ADMISSION_READ_LIMIT),
+        ("write", settings.ADMISSION_WRITE_LIMIT),
+        ("export", settings.ADMISSION_EXPORT_LIMIT),
+    )
+}
+
+
+def admission(kind: str) -> Callable[[], AsyncIterator[None]]:
+    """Dependency holding a slot of the `kind` limiter while the route runs"""
+
+    async def admit() -> AsyncIterator[None]:
+        limiter = limiters[kind]
+        await limiter.acquire()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            limiter.release(time.perf_counter() - start)
+
+    return admit
+
+
+class StreamSlot:
+    """
+    A slot taken for a streamed response, whose body runs after the route and
+    its dependencies. It's released once, by the end of the body or by the
+    background task of the response (the body may not even start)
+    """
+
+    def __init__(self, limiter: AdmissionLimiter):
+        self.limiter = limiter
+        self._start = time.perf_counter()
+        self._released = False
+
+    def release(self) -> None:
+        if not self._released:
+            self._released = True
+            self.limiter.release(time.perf_counter() - self._start)
+
+    async def hold(self, body: AsyncIterator[Any]) -> AsyncIterator[Any]:
+        try:
+            async for chunk in body:
+                yield chunk
+        finally:
+            self.release()
+
+
+async def stream_slot(kind: str) -> StreamSlot:
+    """Takes a slot of the `kind` limiter for a streamed response"""
+    limiter = limiters[kind]
+    await limiter.acquire()
+    return StreamSlot(limiter)
+
+
+admit_read = admission("read")
+admit_write = admission("write")
@@ -0,0 +1,88 @@
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import Any
+
+MISSING = object()
+
+# every cache used by a GenericCRUD, by name, to expose their stats
+caches: dict[str, "CacheBackend"] = {}
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    invalidations: int = 0
+    size: int = 0
+
+    def as_dict(self) -> dict[str, int]:
+        return asdict(self)
+
+
+class CacheBackend(ABC):
+    """
+    Interface of the caches used by `GenericCRUD.get_cached`. Implement it to plug
+    a shared cache (e.g. redis) instead of the in process `TTLCache`.
+    """
+
+    @abstractmethod
+    async def get(self, key: str) -> Any:
+        """Returns the cached value or `MISSING`"""
+
+    @abstractmethod
+    async def set(self, key: str, value: Any) -> None:
+        ...
+
+    @abstractmethod
+    async def delete(self, *keys: str) -> None:
+        ...
+
+    @property
+    @abstractmethod
+    def stats(self) -> CacheStats:
+        ...
+
+
+class TTLCache(CacheBackend):
+    """In process LRU cache of at most `maxsize` entries that live `ttl` seconds"""
+
+    def __init__(self, maxsize: int = 10_000, ttl: float = 60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self._stats = CacheStats()
+
+    async def get(self, key: str) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            self._stats.misses += 1
+            return MISSING
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            self._stats.evictions += 1
+            self._stats.misses += 1
+            return MISSING
+        self._entries.move_to_end(key)
+        self._stats.hits += 1
+        return value
+
+    async def set(self, key: str, value: Any) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self._stats.evictions += 1
+
+    async def delete(self, *keys: str) -> None:
+        for key in keys:
+            if self._entries.pop(key, None) is not None:
+                self._stats.invalidations += 1
+
+    @property
+    def stats(self) -> CacheStats:
+        self._stats.size = len(self._entries)
+        return self._stats
@@ -0,0 +1,86 @@
+import asyncio
+from dataclasses import asdict, dataclass
+from typing import Any, Awaitable, Callable, Hashable
+
+
+@dataclass
+class FlightStats:
+    # reads run
+    flights: int = 0
+    # calls answered by the read of another one
+    shared: int = 0
+    # reads in flight dropped by a write
+    forgotten: int = 0
+
+    def as_dict(self) -> dict[str, int]:
+        return asdict(self)
+
+
+class _LeaderCancelled(Exception):
+    """The read was cancelled along with the call running it"""
+
+
+class SingleFlight:
+    """
+    Coalesces the concurrent identical reads of a worker: a call with the key of
+    a read in flight waits for it and gets its result (or its exception)
+    instead of running the same query again
+    """
+
+    def __init__(self):
+        self._flights: dict[Hashable, asyncio.Future] = {}
+        self.stats = FlightStats()
+
+    async def do(self, key: Hashable, read: Callable[[], Awaitable[Any]]) -> Any:
+        while (future := self._flights.get(key)) is not None:
+            try:
+                # shielded, so a waiter going away doesn't cancel the read
+                result = await asyncio.shield(future)
+            except _LeaderCancelled:
+                # the next waiter runs it again
+                continue
+            self.stats.shared += 1
+            return result
+
+        future = asyncio.get_running_loop().create_future()
+        self._flights[key] = future
+        self.stats.flights += 1
+        try:
+            result = await read()
+        except asyncio.CancelledError:
+            self._fail(future, _LeaderCancelled())
+            raise
+        except Exception as e:
+            self._fail(future, e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            if self._flights.get(key) is future:
+                del self._flights[key]
+
+    @staticmethod
+    def _fail(future: asyncio.Future, exception: Exception) -> None:
+        future.set_exception(exception)
+        # retrieved, or it's logged when nobody was waiting for it
+        future.exception()
+
+    def forget(self, predicate: Callable[[Hashable], bool]) -> None:
+        """
+        The next calls with the keys matching `predicate` run their own read,
+        for a write made while a read was in flight. The calls already waiting
+        still get the read in flight
+        """
+        for key in [key for key in self._flights if predicate(key)]:
+            del self._flights[key]
+            self.stats.forgotten += 1
+
+
+# the reads in flight of every model, shared by all its CRUDs so the writes of
+# any of them drop them
+flights: dict[str, SingleFlight] = {}
+
+
+def model_flights(model_type: type) -> SingleFlight:
+    return flights.setdefault(model_type.__name__, SingleFlight())
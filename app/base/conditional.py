@@ -0,0 +1,59 @@
+import hashlib
+import json
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any
+
+from fastapi import Request
+from fastapi.encoders import jsonable_encoder
+
+
+@dataclass
+class Freshness:
+    """The validators of a response, to answer conditional requests with a 304"""
+
+    etag: str
+    last_modified: datetime | None = None
+
+    @classmethod
+    def of(cls, *values: Any, last_modified: datetime | None = None) -> "Freshness":
+        """Freshness with a weak ETag digesting the `values`"""
+        payload = json.dumps(jsonable_encoder(values)).encode()
+        digest = hashlib.blake2b(payload, digest_size=16).hexdigest()
+        return cls(etag=f'W/"{digest}"', last_modified=last_modified)
+
+    def headers(self) -> dict[str, str]:
+        headers = {"ETag": self.etag}
+        if self.last_modified is not None:
+            # the columns are naive UTC
+            last_modified = self.last_modified.replace(tzinfo=timezone.utc)
+            headers["Last-Modified"] = format_datetime(last_modified, usegmt=True)
+        return headers
+
+    def not_modified(self, request: Request) -> bool:
+        """
+        If the client copy is still fresh: `If-None-Match` has the ETag or, when it
+        isn't sent, nothing changed after `If-Modified-Since`
+        """
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match is not None:
+            etags = [etag.strip() for etag in if_none_match.split(",")]
+            # weak comparison, a W/ prefix doesn't matter
+            ours = self.etag.removeprefix("W/")
+            return "*" in etags or any(
+                etag.removeprefix("W/") == ours for etag in etags
+            )
+
+        if_modified_since = request.headers.get("if-modified-since")
+        if if_modified_since is None or self.last_modified is None:
+            return False
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        # the header only has seconds
+        modified = self.last_modified.replace(tzinfo=timezone.utc, microsecond=0)
+        return modified <= since
@@ -0,0 +1,74 @@
+from collections import Counter
+from typing import Literal
+
+from sqlalchemy import Table, text
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+# how the lists get their total:
+# * exact: a COUNT(*) on every page
+# * cached: a COUNT(*) kept for a while, dropped by the writes of the CRUD
+# * estimated: the planner statistics of the table on Postgres (only for the
+#   unfiltered lists, the filtered ones are cached), cached on other databases
+CountStrategy = Literal["exact", "cached", "estimated"]
+
+# where a total came from: counted for the request, a count of the cache (exact
+# but for the writes made without the CRUD), or the planner statistics
+CountSource = Literal["counted", "cached", "estimated"]
+
+# bumped by the writes of any CRUD of a model, the cached counts are keyed by it
+# so the writes of one CRUD drop the counts cached by the others
+_generations: Counter[str] = Counter()
+
+
+def count_generation(model_type: type) -> int:
+    return _generations.setdefault(model_type.__name__, 0)
+
+
+def invalidate_counts(*model_types: type) -> None:
+    """
+    Drops the cached counts of the models (of all of them when none is given),
+    for the writes made without their CRUD
+    """
+    for name in [model.__name__ for model in model_types] or list(_generations):
+        _generations[name] += 1
+
+
+# by leaf partition, the parent of a partitioned table has no rows of its own
+# (reltuples -1). A table that isn't partitioned is its only leaf
+_ESTIMATE = text(
+    """
+    SELECT c.reltuples, s.null_frac
+    FROM pg_partition_tree(to_regclass(:table)) t
+    JOIN pg_class c ON c.oid = t.relid
+    LEFT JOIN pg_stats s
+        ON s.schemaname = current_schema()
+        AND s.tablename = c.relname
+        AND s.attname = 'deleted_at'
+        AND NOT s.inherited
+    WHERE t.isleaf
+    """
+)
+
+
+async def estimate_count(
+    db: AsyncSession, table: Table, soft_delete: bool
+) -> int | None:
+    """
+    Rows of the table, added up over its partitions (the live ones for soft
+    delete tables, from the fraction of null `deleted_at`) as of the last
+    `ANALYZE`. None when it can't be estimated
+    """
+    if db.bind.dialect.name != "postgresql":
+        return None
+    rows = (await db.execute(_ESTIMATE, {"table": table.name})).all()
+    # the partitions never analyzed are left out, None if none was
+    analyzed = [row for row in rows if row.reltuples >= 0]
+    if not analyzed:
+        return None
+    return round(
+        sum(
+            row.reltuples
+            * (row.null_frac if soft_delete and row.null_frac is not None else 1)
+            for row in analyzed
+        )
+    )
@@ -1,14 +1,98 @@
+import json
 from datetime import datetime
-from typing import Any, Dict, Type
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Sequence, Type
 
 from fastapi.encoders import jsonable_encoder
-from fastapi_pagination import LimitOffsetPage
-from fastapi_pagination.ext.sqlalchemy import paginate as fap_paginate
-from pydantic import BaseModel
+from fastapi_pagination.bases import AbstractParams
+from fastapi_pagination.ext.sqlalchemy import count_query, paginate_query
+from fastapi_pagination.utils import verify_params
+from pydantic import BaseModel, TypeAdapter, ValidationError
+from sqlalchemy import delete, insert, inspect, tuple_, update
+from sqlalchemy.exc import NoResultFound
+from sqlalchemy.orm.exc import StaleDataError
 from sqlmodel import select
 from sqlmodel.ext.asyncio.session import AsyncSession
 
-from app.base.models import SoftDeleteModel
+from app.base.cache import MISSING, CacheBackend, TTLCache, caches
+from app.base.coalescing import model_flights
+from app.base.conditional import Freshness
+from app.base.counting import (
+    CountSource,
+    CountStrategy,
+    count_generation,
+    estimate_count,
+    invalidate_counts,
+)
+from app.base.db import reads_own_writes
+from app.base.filters import (
+    OPERATORS,
+    FilterFields,
+    ListQuery,
+    check_indexed,
+    parse_param,
+)
+from app.base.loading import (
+    LoadStrategy,
+    eager_load_options,
+    serialized_relationships,
+)
+from app.base.metrics import timed
+from app.base.models import SoftDeleteModel, TimestampModel, VersionedModel
+from app.base.pagination import (
+    InvalidCursor,
+    KeysetPage,
+    KeysetParams,
+    LimitOffsetPage,
+)
+from app.base.partitioning import partition_key
+
+
+class StaleRows(StaleDataError):
+    """Some rows of a batch update weren't in the version the client read"""
+
+    def __init__(self, stale_ids: list[Any], updated_ids: list[Any], version: int):
+        super().__init__(f"{len(stale_ids)} rows aren't in version {version}")
+        self.stale_ids = stale_ids
+        self.updated_ids = updated_ids
+
+
+# the coalesced reads of the lists, any write can change them
+LIST_READS = ("paginate",)
+
+
+def _flight_args(args: Any) -> str:
+    return json.dumps(jsonable_encoder(args), sort_keys=True)
+
+
+def _collect_validators(
+    obj: Any,
+    schema: Type[BaseModel] | None,
+    values: list[Any],
+    changes: list[datetime],
+) -> None:
+    """
+    Adds what changes with every write of the row `obj` to `values`: its key,
+    last change and version, or all its columns without a version (two writes
+    can share the last change, SQLite keeps it to the second). The last change
+    of the timestamped rows goes to `changes`. Then does the same for the
+    loaded related rows that `schema` serializes
+    """
+    changed = None
+    if isinstance(obj, TimestampModel):
+        changed = obj.updated_at or obj.created_at
+        changes.append(changed)
+    if isinstance(obj, VersionedModel):
+        values.append([inspect(obj).identity, changed, obj.version])
+    else:
+        values.append(obj.model_dump())
+    if schema is None:
+        return
+    for name, nested_schema in serialized_relationships(type(obj), schema):
+        related = getattr(obj, name)
+        if not isinstance(related, (list, set, tuple)):
+            related = [] if related is None else [related]
+        for related_obj in related:
+            _collect_validators(related_obj, nested_schema, values, changes)
 
 
 class GenericCRUD[
@@ -16,7 +100,23 @@ class GenericCRUD[
     CreateSchemaType: BaseModel,
     UpdateSchemaType: BaseModel,
 ]:
-    def __init__(self, model_type: Type[ModelType]):
+    # the columns `after_write` gets the values of, before and after the writes
+    tracked_columns: tuple[str, ...] = ()
+
+    def __init__(
+        self,
+        model_type: Type[ModelType],
+        keyset_columns: Sequence[str] | None = None,
+        read_schema: Type[BaseModel] | None = None,
+        load_strategy: LoadStrategy | None = None,
+        chunk_size: int = 1000,
+        cache: CacheBackend | None = None,
+        filter_fields: FilterFields | None = None,
+        sort_fields: Sequence[str] = (),
+        count_strategy: CountStrategy = "exact",
+        count_ttl: float = 30,
+        coalesce: bool = False,
+    ):
         """
         CRUD object with default methods to Create, Read, Update, Delete (CRUD).
 
@@ -24,8 +124,79 @@ class GenericCRUD[
 
         * `model`: A SQLAlchemy model class
         * `schema`: A Pydantic model (schema) class
+        * `keyset_columns`: non nullable columns, ending in a unique one, used to
+          sort and continue keyset pages. Defaults to `(created_at, id)`
+        * `read_schema`: the schema the objects are returned with, its nested
+          relationships are eager loaded in every read
+        * `load_strategy`: `selectinload`, `joinedload`, ... to use for all those
+          relationships instead of picking one per relationship
+        * `chunk_size`: rows written per statement (and transaction) by the
+          `*_many` methods
+        * `cache`: where `get_cached` keeps the objects (serialized with
+          `read_schema`), the writes of this CRUD invalidate them
+        * `filter_fields`: the operators each field can be filtered by in the
+          lists, like `{"band_id": ["eq"], "year": ["gte", "lte"]}`
+        * `sort_fields`: the fields `paginate` can sort by
+        * `count_strategy`: how `paginate` gets the total, see `CountStrategy`.
+          The cached counts are kept `count_ttl` seconds
+        * `coalesce`: the concurrent identical calls of `get_cached` and
+          `paginate` (and their `*_with_freshness` variants) share one query
+          (see `SingleFlight`). The objects read are shared by those calls, so
+          they answer them serialized with `read_schema` instead of the ORM
+          objects of one of their sessions
+
+        Filtering and sorting are only allowed by indexed fields, a `ValueError`
+        is raised for the others.
+
+        For a partitioned model (see `partition_table`) the lookups by id take
+        the value of the partition key of the row, when the caller knows it, as
+        `partition`, so Postgres only reads that partition. The objects cached
+        by `get_cached` are cached by their id, and not found in another
+        partition than theirs either
         """
         self.model_type = model_type
+        self.partition_key = partition_key(model_type.__table__)
+        self._id_type = TypeAdapter(model_type.model_fields["id"].annotation)
+        if self.partition_key is not None:
+            self._partition_type = TypeAdapter(
+                model_type.model_fields[self.partition_key].annotation
+            )
+        if keyset_columns is None:
+            if issubclass(model_type, TimestampModel):
+                keyset_columns = ("created_at", "id")
+            else:
+                keyset_columns = ("id",)
+        self.keyset_columns = tuple(keyset_columns)
+        self.chunk_size = chunk_size
+        self.read_schema = read_schema
+        self.cache = cache
+        # bumped on every invalidation so a read that raced a write isn't cached
+        self._cache_generation = 0
+        if cache is not None:
+            if read_schema is None:
+                raise ValueError("A read_schema is needed to cache the objects")
+            caches[model_type.__name__] = cache
+        if coalesce and read_schema is None:
+            raise ValueError("A read_schema is needed to coalesce the reads")
+        self.coalesce = coalesce
+        self._flights = model_flights(model_type)
+        self.count_strategy = count_strategy
+        self._counts = None
+        if count_strategy != "exact":
+            self._counts = TTLCache(maxsize=1000, ttl=count_ttl)
+            caches[f"{model_type.__name__}:count"] = self._counts
+        self.filter_fields = dict(filter_fields or {})
+        self.sort_fields = tuple(sort_fields)
+        for name, ops in self.filter_fields.items():
+            unknown = set(ops) - set(OPERATORS)
+            if unknown:
+                raise ValueError(f"Unknown operators {unknown} for {name}")
+        check_indexed(model_type.__table__, [*self.filter_fields, *self.sort_fields])
+        self.load_options = []
+        if read_schema is not None:
+            self.load_options = eager_load_options(
+                model_type, read_schema, load_strategy
+            )
 
     def apply_soft_delete_filtering(self, statement):
         """If the model is soft delete, then filter out the deleted items"""
@@ -33,68 +204,685 @@ class GenericCRUD[
             statement = statement.filter(self.model_type.deleted_at == None)
         return statement
 
-    async def get(self, db: AsyncSession, id: Any) -> ModelType:
+    def apply_partition_filtering(self, statement, partition: Any = None):
+        if partition is None or self.partition_key is None:
+            return statement
+        return statement.filter(
+            getattr(self.model_type, self.partition_key) == partition
+        )
+
+    def apply_load_options(self, statement):
+        """Eager load the relationships the read schema serializes"""
+        if self.load_options:
+            statement = statement.options(*self.load_options)
+        return statement
+
+    def apply_filters(self, statement, query: ListQuery | None):
+        """Adds the declared filters the client asked for"""
+        for param, value in (query.filters if query else {}).items():
+            name, op = parse_param(param)
+            if op not in self.filter_fields.get(name, ()):
+                raise ValueError(f"Can't filter {param}")
+            column = getattr(self.model_type, name)
+            statement = statement.filter(OPERATORS[op](column, value))
+        return statement
+
+    def apply_sort(self, statement, query: ListQuery | None):
+        """Sorts by the field the client asked for, then by id"""
+        if query and query.sort:
+            name = query.sort.removeprefix("-")
+            if name not in self.sort_fields:
+                raise ValueError(f"Can't sort by {name}")
+            column = getattr(self.model_type, name)
+            statement = statement.order_by(
+                column.desc() if query.sort.startswith("-") else column
+            )
+        return statement.order_by(self.model_type.id)
+
+    async def refresh(self, db: AsyncSession, db_obj: ModelType) -> None:
+        """Reloads `db_obj` after a commit, relationships included"""
+        if not self.load_options:
+            await db.refresh(db_obj)
+            return
+        statement = select(self.model_type).filter(self.model_type.id == db_obj.id)
+        if self.partition_key is not None:
+            statement = self.apply_partition_filtering(
+                statement, getattr(db_obj, self.partition_key)
+            )
+        statement = self.apply_load_options(statement)
+        await db.exec(statement.execution_options(populate_existing=True))
+
+    @timed("get")
+    async def get(self, db: AsyncSession, id: Any, partition: Any = None) -> ModelType:
         statement = select(self.model_type).filter(self.model_type.id == id)
+        statement = self.apply_partition_filtering(statement, partition)
         statement = self.apply_soft_delete_filtering(statement)
+        statement = self.apply_load_options(statement)
 
         result = await db.exec(statement)
-        answer = result.one()
+        answer = result.unique().one()
         return answer
 
-    async def create(self, db: AsyncSession, *, obj_in: CreateSchemaType) -> ModelType:
-        obj_in_data = jsonable_encoder(obj_in)
+    def freshness(self, db_obj: ModelType) -> Freshness | None:
+        """
+        The ETag and Last-Modified of an object read by this CRUD, from the
+        validators of its row and of the related rows `read_schema` serializes
+        (see `_collect_validators`), so a change of one of those (like the band
+        of a song) changes them too. None when the model has no timestamps
+        """
+        if not issubclass(self.model_type, TimestampModel):
+            return None
+        values, changes = [], []
+        _collect_validators(db_obj, self.read_schema, values, changes)
+        return Freshness.of(values, last_modified=max(changes))
+
+    def page_freshness(
+        self, items: Sequence[Any], *page_values: Any
+    ) -> Freshness | None:
+        """
+        The ETag of a list page, from the validators of the rows of its `items`
+        (see `freshness`) and the `page_values` its body has, like the params
+        and the total. There is no Last-Modified, a row leaving the page doesn't
+        change any. None when the model has no timestamps
+        """
+        if not issubclass(self.model_type, TimestampModel):
+            return None
+        values, changes = [], []
+        for item in items:
+            _collect_validators(item, self.read_schema, values, changes)
+        return Freshness.of(values, *page_values)
+
+    def _normalize_id(self, id: Any) -> Any:
+        """
+        The id as the model types it, so the spellings of an id from the routes
+        (like an uppercase UUID) share its cache entry and reads in flight
+        """
+        try:
+            return self._id_type.validate_python(id)
+        except ValidationError:
+            # no row has it, nothing to share
+            return id
+
+    def _cache_key(self, id: Any) -> str:
+        return f"{self.model_type.__name__}:{id}"
+
+    async def get_cached(self, db: AsyncSession, id: Any, partition: Any = None) -> Any:
+        """
+        Read-through `get`: returns the object serialized with `read_schema` from
+        the cache, or reads and caches it. Without a cache it's just `get`
+        """
+        answer, _ = await self.get_with_freshness(db, id, partition)
+        return answer
+
+    @timed("get_cached")
+    async def get_with_freshness(
+        self, db: AsyncSession, id: Any, partition: Any = None
+    ) -> tuple[Any, Freshness | None]:
+        """
+        `get_cached` along with the `freshness` of the object, cached with it so
+        the conditional reads of a cached object don't query the database
+        """
+        if self.cache is None and not self.coalesce:
+            db_obj = await self.get(db, id, partition)
+            return db_obj, self.freshness(db_obj)
+        id = self._normalize_id(id)
+        if self.cache is None:
+            answer, freshness, _ = await self._coalesced(
+                db, "get", id, lambda: self._read(db, id, partition), partition
+            )
+            return answer, freshness
+
+        key = self._cache_key(id)
+        # the client that just wrote reads the primary, the cached object may have
+        # been read from a replica behind it. Its read replaces it
+        entry = MISSING if reads_own_writes(db) else await self.cache.get(key)
+        if entry is MISSING:
+            generation = self._cache_generation
+            entry = await self._coalesced(
+                db, "get", id, lambda: self._read(db, id, partition), partition
+            )
+            if generation == self._cache_generation:
+                await self.cache.set(key, entry)
+        answer, freshness, row_partition = entry
+        if partition is not None and (
+            self._partition_type.validate_python(partition) != row_partition
+        ):
+            raise NoResultFound(
+                f"{self.model_type.__name__} {id} isn't in partition {partition}"
+            )
+        return answer, freshness
+
+    async def _read(
+        self, db: AsyncSession, id: Any, partition: Any = None
+    ) -> tuple[Any, Freshness | None, Any]:
+        """
+        The object serialized with `read_schema`, its freshness and the value of
+        its partition key, what `get_with_freshness` caches
+        """
+        db_obj = await self.get(db, id, partition)
+        answer = self.read_schema.model_validate(db_obj, from_attributes=True)
+        row_partition = (
+            getattr(db_obj, self.partition_key) if self.partition_key else None
+        )
+        return answer, self.freshness(db_obj), row_partition
+
+    async def _coalesced(
+        self,
+        db: AsyncSession,
+        method: str,
+        args: Any,
+        read: Callable[[], Awaitable[Any]],
+        partition: Any = None,
+    ) -> Any:
+        """
+        Runs `read`, or with `coalesce` waits for the identical one in flight. The
+        client that just wrote doesn't wait for the others, they may be reading
+        from a replica
+        """
+        if not self.coalesce or reads_own_writes(db):
+            return await read()
+        # the partition apart, so the writes of an id forget all its reads
+        key = (id(self), method, _flight_args(args), _flight_args(partition))
+        return await self._flights.do(key, read)
+
+    async def invalidate(self, *ids: Any) -> None:
+        """
+        Drops the cached objects of the ids, all the cached counts, and the reads
+        in flight of the ids and of the lists
+        """
+        self._cache_generation += 1
+        invalidate_counts(self.model_type)
+        # the reads in flight started before the write
+        ids = [self._normalize_id(id) for id in ids]
+        written = {_flight_args(id) for id in ids}
+        self._flights.forget(lambda key: key[1] in LIST_READS or key[2] in written)
+        if self.cache is not None and ids:
+            await self.cache.delete(*(self._cache_key(id) for id in ids))
+
+    async def after_write(
+        self, db: AsyncSession, old: Sequence[Any], new: Sequence[Any]
+    ) -> None:
+        """
+        Called by the writes before their commit, with the `tracked_columns` (and
+        `id`) of the rows they changed as they were (`old`, the removed and
+        updated rows) and as they are now (`new`, the created and updated rows),
+        to keep derived data, like a summary table, in the same transaction.
+        Only for the updates changing some tracked column
+        """
+
+    def _tracked(self, values: Any) -> bool:
+        return bool(self.tracked_columns) and any(
+            column in values for column in self.tracked_columns
+        )
+
+    def _tracked_returning(self) -> list[Any]:
+        return [
+            self.model_type.id,
+            *(getattr(self.model_type, column) for column in self.tracked_columns),
+        ]
+
+    async def _tracked_rows(
+        self, db: AsyncSession, ids: Sequence[Any], partition: Any = None
+    ) -> list[Any]:
+        """The tracked columns of the rows, locked until the write commits"""
+        statement = select(*self._tracked_returning()).filter(
+            self.model_type.id.in_(ids)
+        )
+        statement = self.apply_partition_filtering(statement, partition)
+        statement = self.apply_soft_delete_filtering(statement).with_for_update()
+        return (await db.exec(statement)).all()
+
+    @timed("create")
+    async def create(
+        self,
+        db: AsyncSession,
+        *,
+        obj_in: CreateSchemaType | Dict[str, Any],
+    ) -> ModelType:
+        # the model validates the data again, no need to encode it first
+        obj_in_data = obj_in if isinstance(obj_in, dict) else obj_in.model_dump()
         db_obj = self.model_type(**obj_in_data)  # type: ignore
         db.add(db_obj)
+        if self.tracked_columns:
+            await self.after_write(db, old=[], new=[db_obj])
         await db.commit()
-        await db.refresh(db_obj)
+        # no cached object to drop, but the cached counts are stale
+        await self.invalidate()
+        await self.refresh(db, db_obj)
         return db_obj
 
+    def _versioned_values(self, values: Dict[str, Any]) -> Dict[str, Any]:
+        """Bumps the version of a `VersionedModel` along with the other changes"""
+        if issubclass(self.model_type, VersionedModel):
+            values = {**values, "version": self.model_type.version + 1}
+        return values
+
+    def _pop_version(self, update_data: Dict[str, Any], version: int | None):
+        """
+        The version to compare, the one in `update_data` (taken out of it) or
+        `version`. Only a `VersionedModel` has one, a `TypeError` is raised when
+        it's given for the others
+        """
+        if issubclass(self.model_type, VersionedModel):
+            sent_version = update_data.pop("version", None)
+            return version if sent_version is None else sent_version
+        if version is not None:
+            raise TypeError(f"{self.model_type.__name__} isn't versioned")
+        return None
+
+    @timed("update")
     async def update(
         self,
         db: AsyncSession,
         *,
         id: Any,
         obj_in: UpdateSchemaType | Dict[str, Any],
+        version: int | None = None,
+        partition: Any = None,
     ) -> ModelType:
-        db_obj = await self.get(db, id)
-        obj_data = jsonable_encoder(db_obj)
+        """
+        Updates the row with a single `UPDATE ... RETURNING`, raising
+        `NoResultFound` when there is no (live) row with that id.
+
+        For a `VersionedModel` the `version` (argument or field of `obj_in`) the
+        client read is compared and swapped in the same statement, when another
+        write got there first it raises `StaleDataError`. The other models take
+        no `version`, a `TypeError` is raised
+        """
         if isinstance(obj_in, dict):
-            update_data = obj_in
+            update_data = dict(obj_in)
         else:
             update_data = obj_in.model_dump(exclude_unset=True)
-        for field in obj_data:
-            if field in update_data:
-                setattr(db_obj, field, update_data[field])
-        db.add(db_obj)
+        version = self._pop_version(update_data, version)
+        columns = self.model_type.__table__.columns.keys()
+        values = {
+            field: value for field, value in update_data.items() if field in columns
+        }
+
+        statement = (
+            update(self.model_type)
+            .filter(self.model_type.id == id)
+            .values(**self._versioned_values(values))
+            .returning(self.model_type)
+            .execution_options(populate_existing=True)
+        )
+        statement = self.apply_partition_filtering(statement, partition)
+        statement = self.apply_soft_delete_filtering(statement)
+        if version is not None:
+            statement = statement.filter(self.model_type.version == version)
+        tracked = self._tracked(values)
+        if tracked:
+            old_rows = await self._tracked_rows(db, [id], partition)
+        result = await db.exec(statement)
+        db_obj = result.scalars().one_or_none()
+        if db_obj is None:
+            if version is not None:
+                # tells a missing row (404) from a stale version (409)
+                await self.get(db, id, partition)
+                raise StaleDataError(
+                    f"{self.model_type.__name__} {id} isn't in version {version}"
+                )
+            raise NoResultFound(f"No {self.model_type.__name__} {id}")
+        if tracked:
+            await self.after_write(db, old=old_rows, new=[db_obj])
         await db.commit()
-        await db.refresh(db_obj)
+        await self.invalidate(id)
+        # RETURNING only brings the row, the relationships take another select
+        if self.load_options:
+            await self.refresh(db, db_obj)
         return db_obj
 
-    async def remove(self, db: AsyncSession, *, id: int) -> ModelType:
-        obj = await self.get(db, id)
-
+    @timed("remove")
+    async def remove(
+        self, db: AsyncSession, *, id: Any, partition: Any = None
+    ) -> ModelType:
+        """
+        Deletes (or soft deletes) the row with a single statement `RETURNING` it,
+        raising `NoResultFound` when there is no (live) row with that id. The
+        relationships of the returned object aren't loaded
+        """
         if issubclass(self.model_type, SoftDeleteModel):
-            obj.deleted_at = datetime.utcnow()
+            statement = update(self.model_type).values(
+                **self._versioned_values({"deleted_at": datetime.utcnow()})
+            )
         else:
-            await db.delete(obj)
+            statement = delete(self.model_type)
+        statement = (
+            statement.filter(self.model_type.id == id)
+            .returning(self.model_type)
+            .execution_options(populate_existing=True)
+        )
+        statement = self.apply_partition_filtering(statement, partition)
+        statement = self.apply_soft_delete_filtering(statement)
+        result = await db.exec(statement)
+        obj = result.scalars().one_or_none()
+        if obj is None:
+            raise NoResultFound(f"No {self.model_type.__name__} {id}")
+        if self.tracked_columns:
+            await self.after_write(db, old=[obj], new=[])
         await db.commit()
+        await self.invalidate(id)
         return obj
 
-    async def paginate(self, db: AsyncSession) -> LimitOffsetPage[ModelType]:
-        statement = select(self.model_type).order_by(self.model_type.id)
+    def _chunks(self, rows: Sequence[Any], chunk_size: int | None):
+        chunk_size = chunk_size or self.chunk_size
+        for start in range(0, len(rows), chunk_size):
+            yield rows[start : start + chunk_size]
+
+    @timed("create_many")
+    async def create_many(
+        self,
+        db: AsyncSession,
+        *,
+        objs_in: Sequence[CreateSchemaType | Dict[str, Any]],
+        chunk_size: int | None = None,
+    ) -> list[Any]:
+        """
+        Inserts the objects with one multi-row `INSERT ... RETURNING id` and one
+        commit per chunk, returns the ids of the new rows
+        """
+        columns = self.model_type.__table__.columns.keys()
+        ids = []
+        for chunk in self._chunks(objs_in, chunk_size):
+            db_objs = []
+            for obj_in in chunk:
+                if not isinstance(obj_in, dict):
+                    obj_in = obj_in.model_dump()
+                # builds the model so the python side defaults (id, created_at) apply
+                db_objs.append(self.model_type(**obj_in))  # type: ignore
+            rows = [
+                {column: getattr(db_obj, column) for column in columns}
+                for db_obj in db_objs
+            ]
+            statement = insert(self.model_type).returning(self.model_type.id)
+            result = await db.exec(statement, params=rows)
+            ids.extend(result.scalars().all())
+            if self.tracked_columns:
+                await self.after_write(db, old=[], new=db_objs)
+            await db.commit()
+            await self.invalidate()
+        return ids
+
+    @timed("update_many")
+    async def update_many(
+        self,
+        db: AsyncSession,
+        *,
+        ids: Sequence[Any],
+        obj_in: UpdateSchemaType | Dict[str, Any],
+        chunk_size: int | None = None,
+        version: int | None = None,
+    ) -> list[Any]:
+        """
+        Applies the same changes to all the `ids` with one `UPDATE ... WHERE id IN`
+        and one commit per chunk, returns the ids of the updated rows.
+
+        With a `version` (argument or field of `obj_in`, see `update`) only the
+        rows still in it are updated, `StaleRows` is raised at the end with the
+        ids of the others and the ones updated (their chunks are committed)
+        """
+        if isinstance(obj_in, dict):
+            update_data = dict(obj_in)
+        else:
+            update_data = obj_in.model_dump(exclude_unset=True)
+        version = self._pop_version(update_data, version)
+        columns = self.model_type.__table__.columns.keys()
+        update_data = {
+            field: value for field, value in update_data.items() if field in columns
+        }
+        tracked = self._tracked(update_data)
+        updated_ids, stale_ids = [], []
+        for chunk in self._chunks(ids, chunk_size):
+            statement = (
+                update(self.model_type)
+                .filter(self.model_type.id.in_(chunk))
+                .values(**self._versioned_values(update_data))
+                .returning(*self._tracked_returning())
+            )
+            statement = self.apply_soft_delete_filtering(statement)
+            if version is not None:
+                statement = statement.filter(self.model_type.version == version)
+            if tracked:
+                old_rows = await self._tracked_rows(db, chunk)
+            rows = (await db.exec(statement)).all()
+            updated_ids.extend(row.id for row in rows)
+            if version is not None and len(rows) < len(chunk):
+                # the live rows left are in another version
+                left = select(self.model_type.id).filter(
+                    self.model_type.id.in_(chunk),
+                    self.model_type.id.not_in([row.id for row in rows]),
+                )
+                left = self.apply_soft_delete_filtering(left)
+                stale_ids.extend((await db.exec(left)).all())
+            if tracked:
+                await self.after_write(db, old=old_rows, new=rows)
+            await db.commit()
+            await self.invalidate(*chunk)
+        if stale_ids:
+            raise StaleRows(stale_ids, updated_ids, version)
+        return updated_ids
+
+    @timed("remove_many")
+    async def remove_many(
+        self,
+        db: AsyncSession,
+        *,
+        ids: Sequence[Any],
+        chunk_size: int | None = None,
+    ) -> list[Any]:
+        """
+        Deletes (or soft deletes) all the `ids` with one statement and one commit
+        per chunk, returns the ids of the removed rows
+        """
+        removed_ids = []
+        for chunk in self._chunks(ids, chunk_size):
+            if issubclass(self.model_type, SoftDeleteModel):
+                statement = update(self.model_type).values(
+                    **self._versioned_values({"deleted_at": datetime.utcnow()})
+                )
+            else:
+                statement = delete(self.model_type)
+            statement = statement.filter(self.model_type.id.in_(chunk)).returning(
+                *self._tracked_returning()
+            )
+            statement = self.apply_soft_delete_filtering(statement)
+            rows = (await db.exec(statement)).all()
+            removed_ids.extend(row.id for row in rows)
+            if self.tracked_columns:
+                await self.after_write(db, old=rows, new=[])
+            await db.commit()
+            await self.invalidate(*chunk)
+        return removed_ids
 
+    async def count(
+        self,
+        db: AsyncSession,
+        statement,
+        query: ListQuery | None = None,
+    ) -> tuple[int, CountSource]:
+        """
+        The total of the list `statement` by `count_strategy`, and where it came
+        from: counted now, cached up to `count_ttl` seconds ago, or estimated
+        """
+        filters = query.filters if query else {}
+        if self.count_strategy == "estimated" and not filters:
+            soft_delete = issubclass(self.model_type, SoftDeleteModel)
+            total = await estimate_count(db, self.model_type.__table__, soft_delete)
+            if total is not None:
+                return total, "estimated"
+
+        if self._counts is not None:
+            generation = count_generation(self.model_type)
+            key = json.dumps(jsonable_encoder([generation, filters]), sort_keys=True)
+            total = await self._counts.get(key)
+            if total is not MISSING:
+                return total, "cached"
+
+        total = await db.scalar(count_query(statement, use_subquery=False))
+        if self._counts is not None and generation == count_generation(self.model_type):
+            await self._counts.set(key, total)
+        return total, "counted"
+
+    def _list_statement(self, query: ListQuery | None):
+        statement = self.apply_sort(select(self.model_type), query)
         statement = self.apply_soft_delete_filtering(statement)
+        return self.apply_filters(statement, query)
 
-        return await fap_paginate(
-            db,
-            statement,
-            subquery_count=False,
-        )
+    async def paginate(
+        self,
+        db: AsyncSession,
+        query: ListQuery | None = None,
+        params: AbstractParams | None = None,
+    ) -> LimitOffsetPage[ModelType]:
+        page, _ = await self.paginate_with_freshness(db, query, params)
+        return page
+
+    @timed("paginate")
+    async def paginate_with_freshness(
+        self,
+        db: AsyncSession,
+        query: ListQuery | None = None,
+        params: AbstractParams | None = None,
+    ) -> tuple[LimitOffsetPage[ModelType], Freshness | None]:
+        """
+        `paginate` along with the ETag of the page, digesting its rows (see
+        `freshness`), params and total
+        """
+        statement = self._list_statement(query)
+        params, raw_params = verify_params(params, "limit-offset")
+
+        async def read() -> tuple[LimitOffsetPage[ModelType], Freshness | None]:
+            total, total_source = None, "counted"
+            if raw_params.include_total:
+                total, total_source = await self.count(db, statement, query)
+
+            result = await db.exec(
+                paginate_query(self.apply_load_options(statement), params)
+            )
+            items = result.unique().all()
+            # a cached total is as good as a counted one, a weak ETag is the same
+            freshness = self.page_freshness(
+                items, raw_params, total, total_source == "estimated"
+            )
+            if self.coalesce:
+                items = [
+                    self.read_schema.model_validate(item, from_attributes=True)
+                    for item in items
+                ]
+            page = LimitOffsetPage.create(
+                items,
+                params,
+                total=total,
+                total_is_estimate=total_source == "estimated",
+                total_is_cached=total_source == "cached",
+            )
+            return page, freshness
 
+        return await self._coalesced(db, "paginate", [query, raw_params], read)
+
+    @timed("get_all")
     async def get_all(self, db: AsyncSession) -> list[ModelType]:
         statement = select(self.model_type).order_by(self.model_type.id)
 
         statement = self.apply_soft_delete_filtering(statement)
+        statement = self.apply_load_options(statement)
 
         result = await db.exec(statement)
-        return result.all()
+        return result.unique().all()
+
+    async def stream_all(
+        self,
+        db: AsyncSession,
+        yield_per: int | None = None,
+    ) -> AsyncIterator[Sequence[ModelType]]:
+        """
+        Same rows as `get_all`, fetched through a server side cursor `yield_per`
+        rows at a time (`chunk_size` by default) and yielded in those partitions
+        """
+        statement = select(self.model_type).order_by(self.model_type.id)
+
+        statement = self.apply_soft_delete_filtering(statement)
+        statement = self.apply_load_options(statement)
+        statement = statement.execution_options(yield_per=yield_per or self.chunk_size)
+
+        result = await db.stream_scalars(statement)
+        async for partition in result.partitions():
+            yield partition
+
+    def _encode_keyset_cursor(self, obj: ModelType) -> str:
+        values = [getattr(obj, column) for column in self.keyset_columns]
+        return json.dumps(jsonable_encoder(values))
+
+    def _decode_keyset_cursor(self, cursor: str) -> list[Any]:
+        try:
+            values = json.loads(cursor)
+        except ValueError as e:
+            raise InvalidCursor("Invalid cursor value") from e
+        if not isinstance(values, list) or len(values) != len(self.keyset_columns):
+            raise InvalidCursor("Invalid cursor value")
+        try:
+            return [
+                TypeAdapter(
+                    self.model_type.model_fields[column].annotation
+                ).validate_python(value)
+                for column, value in zip(self.keyset_columns, values)
+            ]
+        except ValidationError as e:
+            raise InvalidCursor("Invalid cursor value") from e
+
+    def _after_cursor(self, statement, cursor: str):
+        columns = [getattr(self.model_type, column) for column in self.keyset_columns]
+        last_seen = self._decode_keyset_cursor(cursor)
+        return statement.filter(tuple_(*columns) > tuple_(*last_seen))
+
+    async def keyset_paginate(
+        self,
+        db: AsyncSession,
+        params: KeysetParams | None = None,
+        query: ListQuery | None = None,
+    ) -> KeysetPage[ModelType]:
+        """
+        Paginates by `keyset_columns`, fetching the rows after the cursor and not
+        counting the total unless it's asked for. The pages are always sorted by
+        `keyset_columns`, only the filters of `query` apply
+        """
+        page, _ = await self.keyset_paginate_with_freshness(db, params, query)
+        return page
+
+    @timed("keyset_paginate")
+    async def keyset_paginate_with_freshness(
+        self,
+        db: AsyncSession,
+        params: KeysetParams | None = None,
+        query: ListQuery | None = None,
+    ) -> tuple[KeysetPage[ModelType], Freshness | None]:
+        """
+        `keyset_paginate` along with the ETag of the page, digesting its rows
+        (see `freshness`), params, total and next cursor
+        """
+        params, raw_params = verify_params(params, "cursor")
+        columns = [getattr(self.model_type, column) for column in self.keyset_columns]
+
+        statement = select(self.model_type).order_by(*columns)
+        statement = self.apply_soft_delete_filtering(statement)
+        statement = self.apply_filters(statement, query)
+        statement = self.apply_load_options(statement)
+
+        total = None
+        if raw_params.include_total:
+            total = await db.scalar(count_query(statement, use_subquery=False))
+
+        if raw_params.cursor:
+            statement = self._after_cursor(statement, raw_params.cursor)
+
+        # one extra row tells if there is a next page without counting
+        result = await db.exec(statement.limit(raw_params.size + 1))
+        items = result.unique().all()
+
+        next_ = None
+        if len(items) > raw_params.size:
+            items = items[: raw_params.size]
+            next_ = self._encode_keyset_cursor(items[-1])
+
+        page = KeysetPage.create(items, params, next_=next_, total=total)
+        return page, self.page_freshness(items, raw_params, total, next_)
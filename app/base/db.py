@@ -1,18 +1,120 @@
-from typing import Annotated
+import itertools
+import math
+import time
+from typing import Annotated, Any
 
-from fastapi import Depends
+from fastapi import Depends, Request, Response
+from sqlalchemy import TextClause, event
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.asyncio import create_async_engine
-from sqlalchemy.orm import sessionmaker
-from sqlmodel import SQLModel
+from sqlalchemy.orm import ORMExecuteState, sessionmaker
+from sqlmodel import Session, SQLModel
 from sqlmodel.ext.asyncio.session import AsyncSession
 
-from app.config import settings
+from app.base.instrumentation import instrument_engine
+from app.base.metrics import instrument_pool
+from app.base.pool import InstrumentedQueuePool
+from app.config import Settings, settings
 
-engine = create_async_engine(settings.DATABASE_URL, echo=True, future=True)
+
+def engine_options(url: str, settings: Settings) -> dict[str, Any]:
+    """`create_async_engine` arguments for the pool and driver settings"""
+    options: dict[str, Any] = {"echo": settings.DB_ECHO, "future": True}
+    url = make_url(url)
+    if url.get_backend_name() == "sqlite":
+        # sqlite picks its own pool, it's only used for tests and local runs
+        return options
+
+    options.update(
+        poolclass=InstrumentedQueuePool,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+    )
+    if url.get_driver_name() == "asyncpg":
+        options["connect_args"] = {
+            "prepared_statement_cache_size": settings.DB_PREPARED_STATEMENT_CACHE_SIZE,
+            "server_settings": settings.DB_SERVER_SETTINGS,
+        }
+    return options
+
+
+class WriteTrackingSession(Session):
+    """Sync session of the `AsyncSession`s, it knows if its transaction wrote"""
+
+
+@event.listens_for(WriteTrackingSession, "do_orm_execute")
+def _track_statement(orm_execute_state: ORMExecuteState) -> None:
+    statement = orm_execute_state.statement
+    if isinstance(statement, TextClause):
+        # only the plain SELECTs of the raw SQL are taken as reads
+        wrote = not statement.text.lstrip().lower().startswith("select")
+    else:
+        wrote = not orm_execute_state.is_select
+    if wrote:
+        orm_execute_state.session.info["wrote"] = True
+
+
+@event.listens_for(WriteTrackingSession, "after_flush")
+def _track_flush(session: Session, flush_context) -> None:
+    session.info["wrote"] = True
+
+
+@event.listens_for(WriteTrackingSession, "after_commit")
+@event.listens_for(WriteTrackingSession, "after_rollback")
+def _reset_tracking(session: Session) -> None:
+    session.info.pop("wrote", None)
+
+
+def has_writes(session: AsyncSession) -> bool:
+    """If the session has writes to commit, flushed or not"""
+    sync_session = session.sync_session
+    return bool(
+        sync_session.info.get("wrote")
+        or sync_session.new
+        or sync_session.dirty
+        or sync_session.deleted
+    )
+
+
+engine = create_async_engine(
+    settings.DATABASE_URL, **engine_options(settings.DATABASE_URL, settings)
+)
+# the objects stay loaded after the commit, to serialize them without the session
 SessionLocal = sessionmaker(
-    autocommit=False, autoflush=False, bind=engine, class_=AsyncSession
+    autocommit=False,
+    autoflush=False,
+    expire_on_commit=False,
+    bind=engine,
+    class_=AsyncSession,
+    sync_session_class=WriteTrackingSession,
 )
 
+replica_engines = [
+    create_async_engine(url, **engine_options(url, settings))
+    for url in settings.DATABASE_REPLICA_URLS
+]
+ReplicaSessionLocals = [
+    sessionmaker(
+        autocommit=False,
+        autoflush=False,
+        expire_on_commit=False,
+        bind=replica_engine,
+        class_=AsyncSession,
+        sync_session_class=WriteTrackingSession,
+    )
+    for replica_engine in replica_engines
+]
+_replicas = itertools.cycle(ReplicaSessionLocals)
+
+for instrumented_engine in [engine, *replica_engines]:
+    instrument_engine(instrumented_engine)
+    instrument_pool(instrumented_engine)
+
+READ_YOUR_WRITES_COOKIE = "db_last_write"
+
 
 async def init_db():
     print("Creating database...")
@@ -21,14 +123,84 @@ async def init_db():
         await conn.run_sync(SQLModel.metadata.create_all)
 
 
+async def release(session: AsyncSession) -> None:
+    """
+    Commits the session when it wrote and gives its connection back to the pool.
+    The objects it loaded can still be serialized, and the session used again
+    (with a new connection)
+    """
+    if has_writes(session):
+        await session.commit()
+    await session.close()
+
+
 async def get_session() -> AsyncSession:
+    """
+    The session of a writing request. Like every session it only takes a
+    connection from the pool at its first query, so a request answered without
+    one (from a cache, or a 304) doesn't wait for the pool. The routes `release`
+    it before serializing the response, or it's released after
+    """
     async with SessionLocal() as session:
         try:
             yield session
-            await session.commit()
+            await release(session)
         except Exception as e:
             await session.rollback()
             raise e
 
 
+def get_session_factory() -> sessionmaker:
+    """For the responses that keep reading after the request scoped session is
+    closed, like the streamed ones"""
+    return SessionLocal
+
+
+def mark_write(response: Response) -> None:
+    """Dependency of the writing routes, sends the client reads to the primary
+    for the next `READ_YOUR_WRITES_SECONDS`"""
+    if settings.READ_YOUR_WRITES_SECONDS > 0:
+        response.set_cookie(
+            READ_YOUR_WRITES_COOKIE,
+            str(time.time()),
+            max_age=math.ceil(settings.READ_YOUR_WRITES_SECONDS),
+            httponly=True,
+        )
+
+
+def _recently_wrote(request: Request) -> bool:
+    try:
+        last_write = float(request.cookies[READ_YOUR_WRITES_COOKIE])
+    except (KeyError, ValueError):
+        return False
+    return time.time() - last_write < settings.READ_YOUR_WRITES_SECONDS
+
+
+def get_read_session_factory(request: Request) -> sessionmaker:
+    """Takes turns between the replicas, or the primary when there are none or
+    the client just wrote"""
+    if not ReplicaSessionLocals or _recently_wrote(request):
+        return SessionLocal
+    return next(_replicas)
+
+
+def reads_own_writes(session: AsyncSession) -> bool:
+    """If the session reads from the primary because the client just wrote, the
+    caches and the reads of the other clients can be behind it"""
+    return bool(session.info.get("reads_own_writes"))
+
+
+async def get_read_session(
+    request: Request,
+    session_factory: Annotated[sessionmaker, Depends(get_read_session_factory)],
+) -> AsyncSession:
+    async with session_factory() as session:
+        if ReplicaSessionLocals and _recently_wrote(request):
+            session.info["reads_own_writes"] = True
+        yield session
+
+
 DBSession = Annotated[AsyncSession, Depends(get_session)]
+DBSessionFactory = Annotated[sessionmaker, Depends(get_session_factory)]
+DBReadSession = Annotated[AsyncSession, Depends(get_read_session)]
+DBReadSessionFactory = Annotated[sessionmaker, Depends(get_read_session_factory)]
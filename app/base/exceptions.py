@@ -1,6 +1,13 @@
 from fastapi import FastAPI, Request
+from fastapi.encoders import jsonable_encoder
 from fastapi.responses import JSONResponse
 from sqlalchemy.exc import NoResultFound
+from sqlalchemy.exc import TimeoutError as PoolTimeout
+from sqlalchemy.orm.exc import StaleDataError
+
+from app.base.admission import Overloaded
+from app.base.crud import StaleRows
+from app.base.pagination import InvalidCursor
 
 
 def add_exceptions_handlers(app: FastAPI):
@@ -10,3 +17,47 @@ def add_exceptions_handlers(app: FastAPI):
             status_code=404,
             content={"message": "Not found"},
         )
+
+    @app.exception_handler(InvalidCursor)
+    def handle_InvalidCursor(request: Request, exc: InvalidCursor):
+        return JSONResponse(
+            status_code=400,
+            content={"message": str(exc)},
+        )
+
+    @app.exception_handler(StaleDataError)
+    def handle_StaleDataError(request: Request, exc: StaleDataError):
+        return JSONResponse(
+            status_code=409,
+            content={"message": "The object was modified by another request"},
+        )
+
+    @app.exception_handler(StaleRows)
+    def handle_StaleRows(request: Request, exc: StaleRows):
+        # the rows in the version were updated anyway
+        return JSONResponse(
+            status_code=409,
+            content=jsonable_encoder(
+                {
+                    "message": "Some objects were modified by another request",
+                    "stale_ids": exc.stale_ids,
+                    "updated_ids": exc.updated_ids,
+                }
+            ),
+        )
+
+    @app.exception_handler(Overloaded)
+    def handle_Overloaded(request: Request, exc: Overloaded):
+        return JSONResponse(
+            status_code=503,
+            content={"message": str(exc)},
+            headers={"Retry-After": str(exc.retry_after)},
+        )
+
+    @app.exception_handler(PoolTimeout)
+    def handle_PoolTimeout(request: Request, exc: PoolTimeout):
+        return JSONResponse(
+            status_code=503,
+            content={"message": "No database connection available"},
+            headers={"Retry-After": "1"},
+        )
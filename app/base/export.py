@@ -0,0 +1,64 @@
+import csv
+import io
+import json
+from typing import Any, AsyncIterator, Literal, Sequence, Type
+
+from pydantic import BaseModel
+from sqlalchemy.orm import sessionmaker
+
+ExportFormat = Literal["ndjson", "csv"]
+
+MEDIA_TYPES: dict[ExportFormat, str] = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+def _csv_line(values: list[Any]) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(
+        # nested objects (like a song band) go as JSON inside the cell
+        json.dumps(value) if isinstance(value, dict | list) else value
+        for value in values
+    )
+    return buffer.getvalue()
+
+
+async def export_lines(
+    partitions: AsyncIterator[Sequence[Any]],
+    schema: Type[BaseModel],
+    export_format: ExportFormat,
+) -> AsyncIterator[str]:
+    """Serializes every partition of objects with `schema` into one chunk"""
+    columns = list(schema.model_fields)
+    if export_format == "csv":
+        yield _csv_line(columns)
+
+    async for partition in partitions:
+        rows = [
+            schema.model_validate(obj, from_attributes=True).model_dump(mode="json")
+            for obj in partition
+        ]
+        if export_format == "csv":
+            yield "".join(
+                _csv_line([row[column] for column in columns]) for row in rows
+            )
+        else:
+            yield "".join(f"{json.dumps(row)}\n" for row in rows)
+
+
+async def stream_export(
+    session_factory: sessionmaker,
+    crud,
+    schema: Type[BaseModel],
+    export_format: ExportFormat,
+) -> AsyncIterator[str]:
+    """
+    Streams all the rows of `crud` serialized with `schema`.
+
+    It opens its own session because the response body is sent after the request
+    scoped session is closed.
+    """
+    async with session_factory() as db:
+        async for chunk in export_lines(crud.stream_all(db), schema, export_format):
+            yield chunk
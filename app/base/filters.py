@@ -0,0 +1,99 @@
+import inspect
+import operator
+from dataclasses import dataclass, field
+from typing import Any, Callable, Literal, Mapping, Sequence
+
+from fastapi import Query
+from sqlalchemy import Table
+
+Operator = Literal["eq", "gt", "gte", "lt", "lte", "prefix"]
+
+OPERATORS: dict[Operator, Callable[[Any, Any], Any]] = {
+    "eq": operator.eq,
+    "gt": operator.gt,
+    "gte": operator.ge,
+    "lt": operator.lt,
+    "lte": operator.le,
+    "prefix": lambda column, value: column.startswith(value, autoescape=True),
+}
+
+# declared filters, like {"band_id": ["eq"], "year": ["gte", "lte"]}
+FilterFields = Mapping[str, Sequence[Operator]]
+
+
+@dataclass
+class ListQuery:
+    """The filters and sort a client asked a list for"""
+
+    # by query param, like {"band_id": ..., "year__gte": 1965}
+    filters: dict[str, Any] = field(default_factory=dict)
+    # a sortable field, descending when it starts with "-"
+    sort: str | None = None
+
+
+def param_name(name: str, op: Operator) -> str:
+    return name if op == "eq" else f"{name}__{op}"
+
+
+def parse_param(param: str) -> tuple[str, Operator]:
+    name, _, op = param.partition("__")
+    return name, op or "eq"
+
+
+def indexed_columns(table: Table) -> set[str]:
+    """The columns some index of the table (or its primary key) starts with"""
+    columns = {index.columns[0].name for index in table.indexes if index.columns}
+    if table.primary_key.columns:
+        columns.add(table.primary_key.columns[0].name)
+    return columns
+
+
+def check_indexed(table: Table, names: Sequence[str]) -> None:
+    """Rejects the fields that filtering or sorting by would scan the table"""
+    missing = [name for name in names if name not in indexed_columns(table)]
+    if missing:
+        raise ValueError(
+            f"The fields {missing} of {table.name} have no index to filter or "
+            "sort by, add one first"
+        )
+
+
+def list_query_dependency(
+    model_type: Any,
+    filter_fields: FilterFields,
+    sort_fields: Sequence[str],
+) -> Callable[..., ListQuery]:
+    """
+    A dependency taking the declared filters and sort as query params, so they
+    are validated and documented in the OpenAPI like any other param
+    """
+    parameters = []
+    for name, ops in filter_fields.items():
+        annotation = model_type.model_fields[name].annotation
+        for op in ops:
+            parameters.append(
+                inspect.Parameter(
+                    param_name(name, op),
+                    inspect.Parameter.KEYWORD_ONLY,
+                    default=Query(None),
+                    annotation=(str if op == "prefix" else annotation) | None,
+                )
+            )
+    if sort_fields:
+        choices = [*sort_fields, *(f"-{name}" for name in sort_fields)]
+        parameters.append(
+            inspect.Parameter(
+                "sort",
+                inspect.Parameter.KEYWORD_ONLY,
+                default=Query(None, description="Field to sort by, -field for desc"),
+                annotation=Literal[tuple(choices)] | None,
+            )
+        )
+
+    def list_query(**params) -> ListQuery:
+        sort = params.pop("sort", None)
+        filters = {name: value for name, value in params.items() if value is not None}
+        return ListQuery(filters=filters, sort=sort)
+
+    list_query.__signature__ = inspect.Signature(parameters)
+    return list_query
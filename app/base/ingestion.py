@@ -0,0 +1,195 @@
+"""
+Write-behind ingestion of the creates: `POST /<objects>/ingest` (the
+`write_behind` routers) validates the object, gives it its id and answers 202
+right away, a background task per worker inserts the accepted rows with
+`GenericCRUD.create_many` every `batch_size` rows or `max_delay` seconds, one
+statement and commit per batch instead of one per row.
+
+At most `max_pending` rows wait in memory, past it the creates get a 503. The
+rows still waiting are inserted on shutdown (the lifespan closes the queues),
+but they are lost if the process dies. `GET /<objects>/ingest` lists the ids
+not inserted yet and the ones that failed.
+"""
+import asyncio
+import logging
+import math
+from collections import OrderedDict, deque
+from contextlib import suppress
+from dataclasses import asdict, dataclass
+from typing import Any
+
+from pydantic import BaseModel
+from sqlalchemy.orm import sessionmaker
+
+from app.base.admission import Overloaded
+from app.base.crud import GenericCRUD
+from app.base.metrics import INGESTION_ROWS
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class IngestionStats:
+    accepted: int = 0
+    inserted: int = 0
+    failed: int = 0
+    # shed with a 503, the queue was full
+    rejected: int = 0
+    # batches inserted, a statement and commit each
+    flushes: int = 0
+    pending: int = 0
+
+    def as_dict(self) -> dict[str, int]:
+        return asdict(self)
+
+
+class IngestionQueue:
+    """
+    The rows accepted by the creates of a `GenericCRUD`, waiting to be inserted
+    in batches by a background task of the running event loop
+    """
+
+    def __init__(
+        self,
+        crud: GenericCRUD,
+        *,
+        batch_size: int = settings.INGESTION_BATCH_SIZE,
+        max_delay: float = settings.INGESTION_MAX_DELAY_MS / 1000,
+        max_pending: int = settings.INGESTION_MAX_PENDING,
+    ):
+        self.crud = crud
+        self.name = crud.model_type.__name__
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        self.max_pending = max_pending
+        self.session_factory: sessionmaker | None = None
+        self._rows: deque[dict[str, Any]] = deque()
+        # the rows of the batch being inserted
+        self._flushing: dict[Any, dict[str, Any]] = {}
+        # the last max_pending failed ids and their error
+        self._failed: OrderedDict[Any, str] = OrderedDict()
+        self._task: asyncio.Task | None = None
+        self._flush_task: asyncio.Future | None = None
+        self._wakeup: asyncio.Event | None = None
+        self._stats = IngestionStats()
+
+    def _pending(self) -> int:
+        return len(self._rows) + len(self._flushing)
+
+    def put(self, session_factory: sessionmaker, obj_in: BaseModel) -> Any:
+        """Queues the object to be inserted, returns its id"""
+        if self._pending() >= self.max_pending:
+            self._stats.rejected += 1
+            INGESTION_ROWS.labels(self.name, "rejected").inc()
+            raise Overloaded(f"{self.name} ingest", max(1, math.ceil(self.max_delay)))
+        # the python side defaults (id, created_at) apply now, when accepted
+        db_obj = self.crud.model_type(**obj_in.model_dump())
+        columns = self.crud.model_type.__table__.columns.keys()
+        self._rows.append({column: getattr(db_obj, column) for column in columns})
+        self.session_factory = session_factory
+        self._stats.accepted += 1
+        INGESTION_ROWS.labels(self.name, "accepted").inc()
+
+        self._start()
+        if len(self._rows) == 1 or len(self._rows) >= self.batch_size:
+            self._wakeup.set()
+        return db_obj.id
+
+    def _start(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._task.get_loop() is not loop:
+            self._wakeup = asyncio.Event()
+            self._task = loop.create_task(self._run())
+
+    async def _run(self) -> None:
+        while True:
+            if not self._rows:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+            # the batch fills for up to max_delay
+            self._wakeup.clear()
+            if len(self._rows) < self.batch_size:
+                with suppress(TimeoutError):
+                    async with asyncio.timeout(self.max_delay):
+                        await self._wakeup.wait()
+            # shielded, on shutdown `close` waits for the batch instead
+            self._flush_task = asyncio.ensure_future(self._flush_batch())
+            await asyncio.shield(self._flush_task)
+
+    async def _flush_batch(self) -> None:
+        while self._rows and len(self._flushing) < self.batch_size:
+            row = self._rows.popleft()
+            self._flushing[row["id"]] = row
+        if not self._flushing:
+            return
+        try:
+            await self._insert(list(self._flushing.values()))
+        finally:
+            self._flushing.clear()
+
+    async def _insert(self, rows: list[dict[str, Any]]) -> None:
+        try:
+            async with self.session_factory() as db:
+                await self.crud.create_many(db, objs_in=rows, chunk_size=len(rows))
+        except Exception as e:
+            if len(rows) > 1:
+                # one bad row doesn't take the batch with it
+                logger.warning("%s ingest batch failed, inserting by row", self.name)
+                for row in rows:
+                    await self._insert([row])
+                return
+            logger.exception("%s %s couldn't be ingested", self.name, rows[0]["id"])
+            self._fail(rows[0]["id"], e)
+            return
+        self._stats.inserted += len(rows)
+        self._stats.flushes += 1
+        INGESTION_ROWS.labels(self.name, "inserted").inc(len(rows))
+
+    def _fail(self, id: Any, error: Exception) -> None:
+        self._failed[id] = type(error).__name__
+        if len(self._failed) > self.max_pending:
+            self._failed.popitem(last=False)
+        self._stats.failed += 1
+        INGESTION_ROWS.labels(self.name, "failed").inc()
+
+    async def close(self) -> None:
+        """Stops the background task and inserts the rows still waiting"""
+        task, self._task = self._task, None
+        if task is not None and task.get_loop() is asyncio.get_running_loop():
+            task.cancel()
+            with suppress(asyncio.CancelledError):
+                await task
+            if self._flush_task is not None:
+                await self._flush_task
+        while self._rows:
+            await self._flush_batch()
+
+    def status(self) -> dict[str, Any]:
+        """The stats, the ids not inserted yet and the failed ones"""
+        return {
+            **self.stats.as_dict(),
+            "pending_ids": [*self._flushing, *(row["id"] for row in self._rows)],
+            "failed_ids": dict(self._failed),
+        }
+
+    @property
+    def stats(self) -> IngestionStats:
+        self._stats.pending = self._pending()
+        return self._stats
+
+
+# by model, closed by the lifespan of the app
+ingestion_queues: dict[str, IngestionQueue] = {}
+
+
+def ingestion_queue(crud: GenericCRUD) -> IngestionQueue:
+    """A new queue for the creates of the `crud`"""
+    queue = IngestionQueue(crud)
+    ingestion_queues[queue.name] = queue
+    return queue
+
+
+async def close_ingestion_queues() -> None:
+    for queue in ingestion_queues.values():
+        await queue.close()
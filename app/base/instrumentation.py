@@ -0,0 +1,107 @@
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Iterator
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class QueryStats:
+    count: int = 0
+    duration: float = 0
+    # the ASGI scope of the request, to name the route in the slow query logs
+    scope: dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def route_name(self) -> str | None:
+        route = self.scope.get("route")
+        return getattr(route, "name", None)
+
+
+_query_stats: ContextVar[QueryStats | None] = ContextVar("query_stats", default=None)
+
+
+@contextmanager
+def track_queries(scope: dict[str, Any] | None = None) -> Iterator[QueryStats]:
+    """Counts the statements, and the time they take, run inside the block"""
+    stats = QueryStats(scope=scope or {})
+    token = _query_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _query_stats.reset(token)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append((context, time.perf_counter()))
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()[1]
+    stats = _query_stats.get()
+    if stats is not None:
+        stats.count += 1
+        stats.duration += elapsed
+    if elapsed >= settings.SLOW_QUERY_SECONDS:
+        logger.warning(
+            "Slow query (%.3fs) in %r: %s",
+            elapsed,
+            stats.route_name if stats else None,
+            statement,
+        )
+
+
+def _handle_error(exception_context):
+    # after_cursor_execute isn't called for a failed statement, the errors
+    # fetching its rows come after it though
+    if exception_context.connection is None:
+        return
+    starts = exception_context.connection.info.get("query_start")
+    if starts and starts[-1][0] is exception_context.execution_context:
+        starts.pop()
+
+
+def instrument_engine(engine: AsyncEngine | Engine) -> None:
+    """Times every statement the engine runs"""
+    if isinstance(engine, AsyncEngine):
+        engine = engine.sync_engine
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(engine, "handle_error", _handle_error)
+
+
+class QueryStatsMiddleware:
+    """Reports the statements run by each request and their time in a
+    `Server-Timing` header"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with track_queries(scope) as stats:
+
+            async def send_with_timing(message):
+                if message["type"] == "http.response.start":
+                    duration = stats.duration * 1000
+                    timing = f'db;dur={duration:.2f};desc="{stats.count} queries"'
+                    message["headers"] = [
+                        *message.get("headers", []),
+                        (b"server-timing", timing.encode()),
+                    ]
+                await send(message)
+
+            await self.app(scope, receive, send_with_timing)
@@ -0,0 +1,76 @@
+from types import UnionType
+from typing import Any, Callable, Type, Union, get_args, get_origin
+
+from pydantic import BaseModel
+from sqlalchemy import inspect
+from sqlalchemy.orm import Load, joinedload, selectinload
+
+LoadStrategy = Callable[[Any], Load]
+
+
+def _nested_schema(annotation: Any) -> Type[BaseModel] | None:
+    """Finds the schema inside annotations like `BandRead`, `list[SongRead]` or
+    `BandRead | None`"""
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return annotation
+    if get_origin(annotation) in (list, set, tuple, Union, UnionType):
+        for arg in get_args(annotation):
+            schema = _nested_schema(arg)
+            if schema is not None:
+                return schema
+    return None
+
+
+def _auto_strategy(relationship) -> LoadStrategy:
+    """JOIN the "to one" relationships, one extra SELECT ... IN for collections"""
+    return selectinload if relationship.uselist else joinedload
+
+
+def serialized_relationships(
+    model_type: Type[BaseModel], schema: Type[BaseModel]
+) -> list[tuple[str, Type[BaseModel] | None]]:
+    """The relationships of `model_type` that `schema` serializes, with the
+    schema of the related objects when it's a nested one"""
+    relationships = inspect(model_type).relationships
+    return [
+        (name, _nested_schema(field.annotation))
+        for name, field in schema.model_fields.items()
+        if name in relationships
+    ]
+
+
+def eager_load_options(
+    model_type: Type[BaseModel],
+    schema: Type[BaseModel],
+    strategy: LoadStrategy | None = None,
+    _parent: Load | None = None,
+) -> list[Load]:
+    """
+    Builds the loader options for every relationship of `model_type` that `schema`
+    serializes, so reading them doesn't lazy load one row at a time.
+
+    **Parameters**
+
+    * `model_type`: A SQLAlchemy model class
+    * `schema`: The Pydantic schema the model is read with
+    * `strategy`: `selectinload`, `joinedload`, ... for every relationship.
+      Defaults to `joinedload` for "to one" and `selectinload` for collections
+    """
+    relationships = inspect(model_type).relationships
+    options = []
+    for name, nested_schema in serialized_relationships(model_type, schema):
+        relationship = relationships[name]
+        loader = strategy or _auto_strategy(relationship)
+        attribute = getattr(model_type, name)
+        if _parent is None:
+            option = loader(attribute)
+        else:
+            option = getattr(_parent, loader.__name__)(attribute)
+
+        nested_options = []
+        if nested_schema is not None:
+            nested_options = eager_load_options(
+                relationship.mapper.class_, nested_schema, strategy, option
+            )
+        options.extend(nested_options or [option])
+    return options
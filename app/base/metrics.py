@@ -0,0 +1,140 @@
+import functools
+import os
+import time
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+# With several workers every process writes its samples to files in this folder
+# and the one answering /metrics adds them all up
+MULTIPROC_DIR = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "Time to answer the requests",
+    ["method", "route", "status"],
+)
+REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress",
+    "Requests being answered",
+    ["method"],
+    multiprocess_mode="livesum",
+)
+DB_POOL_CHECKED_OUT = Gauge(
+    "db_pool_checked_out_connections",
+    "Connections checked out of the pool",
+    multiprocess_mode="livesum",
+)
+DB_POOL_CHECKOUT_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds",
+    "Time waited for a connection of the pool",
+)
+DB_POOL_TIMEOUTS = Counter(
+    "db_pool_timeouts",
+    "Checkouts that timed out waiting for a connection",
+)
+ADMISSION_REQUESTS = Counter(
+    "admission_requests",
+    "Requests admitted or shed by the admission control",
+    ["kind", "outcome"],
+)
+INGESTION_ROWS = Counter(
+    "ingestion_rows",
+    "Rows accepted, inserted, failed or rejected by the write-behind ingestion",
+    ["model", "outcome"],
+)
+CRUD_DURATION = Histogram(
+    "crud_operation_duration_seconds",
+    "Time spent in the GenericCRUD methods",
+    ["model", "operation"],
+)
+
+
+def timed(operation: str):
+    """Observes how long the decorated `GenericCRUD` method takes"""
+
+    def decorator(method):
+        @functools.wraps(method)
+        async def wrapper(self, *args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await method(self, *args, **kwargs)
+            finally:
+                CRUD_DURATION.labels(self.model_type.__name__, operation).observe(
+                    time.perf_counter() - start
+                )
+
+        return wrapper
+
+    return decorator
+
+
+def instrument_pool(engine: AsyncEngine) -> None:
+    """Keeps `db_pool_checked_out_connections` up to date"""
+
+    @event.listens_for(engine.sync_engine, "checkout")
+    def checkout(dbapi_connection, connection_record, connection_proxy):
+        DB_POOL_CHECKED_OUT.inc()
+
+    @event.listens_for(engine.sync_engine, "checkin")
+    def checkin(dbapi_connection, connection_record):
+        DB_POOL_CHECKED_OUT.dec()
+
+
+def latest_metrics() -> tuple[bytes, str]:
+    """The metrics of all the workers in the text exposition format"""
+    registry = REGISTRY
+    if MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def mark_process_dead() -> None:
+    """Drops the live gauges of a worker that is shutting down"""
+    if MULTIPROC_DIR:
+        multiprocess.mark_process_dead(os.getpid())
+
+
+class MetricsMiddleware:
+    """Times every request, labelled with the path template of its route"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status = 500
+        start = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        REQUESTS_IN_PROGRESS.labels(method).inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            REQUESTS_IN_PROGRESS.labels(method).dec()
+            route = scope.get("route")
+            # unmatched paths share a label, so random urls don't add series
+            path = getattr(route, "path", "<unmatched>")
+            REQUEST_DURATION.labels(method, path, status).observe(
+                time.perf_counter() - start
+            )
@@ -1,24 +1,115 @@
 import uuid as uuid_pkg
 from datetime import datetime
 
+from sqlalchemy import Column, Index, Table
+from sqlalchemy.orm import declared_attr
 from sqlmodel import Field, SQLModel, text
 
+from app.base.ids import uuid7
+from app.base.partitioning import partition_key
+
+LIVE_ROWS = text("deleted_at IS NULL")
+DEAD_ROWS = text("deleted_at IS NOT NULL")
+
+
+def table_indexes(model_type: type[SQLModel]) -> list[Index]:
+    """
+    The indexes every table gets from its base models:
+
+    * one per foreign key, for the joins and the checks of the deletes
+    * for a `SoftDeleteModel`, partial indexes over the live rows (the only ones
+      `GenericCRUD` reads) by `id` and by the keyset columns `(created_at, id)`,
+      and one over the deleted rows by `(deleted_at, id)` for the purge
+    """
+    table = model_type.__tablename__
+    indexes = [
+        Index(f"ix_{table}_{name}", name)
+        for name, field in model_type.model_fields.items()
+        if isinstance(getattr(field, "foreign_key", None), str)
+    ]
+    if issubclass(model_type, SoftDeleteModel):
+        live_columns = [("id",)]
+        if issubclass(model_type, TimestampModel):
+            live_columns.append(("created_at", "id"))
+        indexes += [
+            Index(
+                f"ix_{table}_live_{'_'.join(columns)}",
+                *columns,
+                postgresql_where=LIVE_ROWS,
+                sqlite_where=LIVE_ROWS,
+            )
+            for columns in live_columns
+        ]
+        indexes.append(
+            Index(
+                f"ix_{table}_dead_deleted_at_id",
+                "deleted_at",
+                "id",
+                postgresql_where=DEAD_ROWS,
+                sqlite_where=DEAD_ROWS,
+            )
+        )
+    return indexes
+
+
+def archive_table(table: Table) -> Table:
+    """
+    `<table>_archive`, with the columns of `table` but none of its constraints
+    or indexes, where `purge --archive` moves the deleted rows to. It isn't
+    partitioned, its primary key leaves the partition key of `table` out unless
+    it's the whole primary key
+    """
+    key = partition_key(table)
+    if list(table.primary_key.columns.keys()) == [key]:
+        key = None
+    archive = Table(
+        f"{table.name}_archive",
+        table.metadata,
+        *(
+            Column(
+                column.name,
+                column.type,
+                primary_key=column.primary_key and column.name != key,
+            )
+            for column in table.columns
+        ),
+    )
+    table.info["archive"] = archive
+    archive.info["archive_of"] = table
+    return archive
+
 
 class UUIDModel(SQLModel):
+    # the primary key is already unique and indexed
     id: uuid_pkg.UUID = Field(
         default_factory=uuid_pkg.uuid4,
         primary_key=True,
-        index=True,
         nullable=False,
-        sa_column_kwargs={
-            # "server_default": text("gen_random_uuid()"),
-            "unique": True,
-        },
+        # sa_column_kwargs={"server_default": text("gen_random_uuid()")},
+    )
+
+    @declared_attr
+    def __table_args__(cls):
+        return tuple(table_indexes(cls))
+
+
+class UUID7Model(UUIDModel):
+    """
+    `UUIDModel` with time ordered ids (`uuid7`): the inserts go to the end of
+    the primary key index instead of random pages, and ordering by `id` is
+    ordering by creation
+    """
+
+    id: uuid_pkg.UUID = Field(
+        default_factory=uuid7,
+        primary_key=True,
+        nullable=False,
     )
 
 
 class TimestampModel(SQLModel):
     created_at: datetime = Field(
+        default_factory=datetime.utcnow,
         nullable=False,
         sa_column_kwargs={"server_default": text("current_timestamp")},
     )
@@ -33,3 +124,16 @@ class TimestampModel(SQLModel):
 
 class SoftDeleteModel(SQLModel):
     deleted_at: datetime = Field(nullable=True)
+
+
+class VersionedModel(SQLModel):
+    """
+    Adds a `version`, bumped by every write of `GenericCRUD`, so an update can
+    compare and swap the one the client read instead of overwriting others
+    """
+
+    version: int = Field(
+        default=1,
+        nullable=False,
+        sa_column_kwargs={"server_default": text("1")},
+    )
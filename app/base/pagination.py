@@ -0,0 +1,75 @@
+from typing import Any, Generic, Optional, Sequence, TypeVar
+
+from fastapi import Query
+from fastapi_pagination import LimitOffsetPage as BaseLimitOffsetPage
+from fastapi_pagination.bases import AbstractPage, AbstractParams, CursorRawParams
+from fastapi_pagination.cursor import decode_cursor, encode_cursor
+from fastapi_pagination.utils import create_pydantic_model
+from pydantic import BaseModel, Field
+
+T = TypeVar("T")
+
+
+class InvalidCursor(ValueError):
+    """The cursor sent by the client can't be decoded for the configured keys"""
+
+
+class KeysetParams(BaseModel, AbstractParams):
+    cursor: Optional[str] = Query(None, description="Cursor for the next page")
+    size: int = Query(50, ge=1, le=100, description="Page size")
+    include_total: bool = Query(False, description="Count the total of items")
+
+    def to_raw_params(self) -> CursorRawParams:
+        return CursorRawParams(
+            cursor=decode_cursor(self.cursor, to_str=True),
+            size=self.size,
+            include_total=self.include_total,
+        )
+
+
+class KeysetPage(AbstractPage[T], Generic[T]):
+    """
+    Page that continues after the last seen sort key instead of skipping rows,
+    so the cost of a page doesn't depend on how deep it is.
+    """
+
+    items: Sequence[T]
+    total: Optional[int] = Field(None, description="Total items")
+    size: int
+    next_page: Optional[str] = Field(None, description="Cursor for the next page")
+
+    __params_type__ = KeysetParams
+
+    @classmethod
+    def create(
+        cls,
+        items: Sequence[T],
+        params: AbstractParams,
+        *,
+        next_: Optional[str] = None,
+        total: Optional[int] = None,
+        **kwargs: Any,
+    ) -> "KeysetPage[T]":
+        raw_params = params.to_raw_params().as_cursor()
+
+        return create_pydantic_model(
+            cls,
+            items=items,
+            total=total,
+            size=raw_params.size,
+            next_page=encode_cursor(next_),
+            **kwargs,
+        )
+
+
+class LimitOffsetPage(BaseLimitOffsetPage[T], Generic[T]):
+    """`LimitOffsetPage` telling if its total was counted, cached or estimated"""
+
+    total_is_estimate: bool = Field(
+        False, description="The total comes from the planner statistics, not counted"
+    )
+    total_is_cached: bool = Field(
+        False,
+        description="The total was counted by an earlier request, before any "
+        "write since",
+    )
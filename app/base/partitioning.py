@@ -0,0 +1,162 @@
+"""
+Declarative partitioning of the tables on Postgres, by the hash or the range of
+a key column, so the vacuum, the index builds and the scans of the deleted rows
+work on partitions instead of the whole table:
+
+    partition_table(Song.__table__, Partitioning("id", partitions=8))
+    partition_table(Event.__table__, Partitioning(
+        "created_at", method="range", bounds=["2026-01-01", "2026-07-01"]
+    ))
+
+The table is created `PARTITION BY` its key with its partitions (`<table>_p0`,
+`<table>_p1`, ...), by `SQLModel.metadata.create_all` and by the migration of
+the existing tables. SQLite (local and tests) keeps a single table.
+
+Postgres wants the key in every unique constraint, the primary key included.
+A table partitioned by its `id` keeps it unique, and the lookups by id only
+read its partition. By another key (like a range of `created_at`) the rest of
+the primary key is only unique within a partition there, the other databases
+get a unique index on it.
+
+Postgres only prunes the partitions of a query filtering by the key, so for a
+key other than the `id` `GenericCRUD` takes its value (`partition`) in the
+lookups by id, and the routes an optional query param named after the key.
+"""
+import inspect
+from dataclasses import dataclass
+from itertools import pairwise
+from typing import Any, Callable, Literal, Sequence
+
+from fastapi import Query
+from sqlalchemy import DDL, Table, event
+
+
+@dataclass(frozen=True)
+class Partitioning:
+    """How a table is partitioned by its `key` column"""
+
+    key: str
+    method: Literal["hash", "range"] = "hash"
+    # hash: the number of partitions
+    partitions: int = 8
+    # range: the lower bound of every partition but the first, from MINVALUE,
+    # the last one goes up to MAXVALUE
+    bounds: Sequence[Any] = ()
+
+    def partition_by(self) -> str:
+        return f"{self.method.upper()} ({self.key})"
+
+    def partitions_ddl(self, table_name: str) -> list[str]:
+        """The `CREATE TABLE ... PARTITION OF` of every partition"""
+        if self.method == "hash":
+            values = [
+                f"WITH (MODULUS {self.partitions}, REMAINDER {remainder})"
+                for remainder in range(self.partitions)
+            ]
+        else:
+            edges = ["MINVALUE", *(_literal(bound) for bound in self.bounds)]
+            edges.append("MAXVALUE")
+            values = [f"FROM ({low}) TO ({high})" for low, high in pairwise(edges)]
+        return [
+            f"CREATE TABLE {table_name}_p{number} PARTITION OF {table_name} "
+            f"FOR VALUES {value}"
+            for number, value in enumerate(values)
+        ]
+
+
+def _literal(value: Any) -> str:
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def _not_postgresql(ddl, target, bind, dialect, **kw) -> bool:
+    return dialect.name != "postgresql"
+
+
+def partition_table(table: Table, partitioning: Partitioning) -> Table:
+    """
+    Declares the partitioning of `table` on Postgres. The key has to be part of
+    the primary key, Postgres only enforces the unique constraints within a
+    partition. Elsewhere the rest of the primary key is kept unique
+    """
+    if partitioning.key not in table.primary_key.columns:
+        raise ValueError(
+            f"The partition key {partitioning.key} of {table.name} has to be part "
+            "of its primary key"
+        )
+    table.dialect_kwargs["postgresql_partition_by"] = partitioning.partition_by()
+    table.info["partitioning"] = partitioning
+    for statement in partitioning.partitions_ddl(table.name):
+        event.listen(
+            table, "after_create", DDL(statement).execute_if(dialect="postgresql")
+        )
+    # DDL instead of an `Index`, it can't be created on Postgres
+    unique = _unique_columns(table)
+    if unique:
+        event.listen(
+            table,
+            "after_create",
+            DDL(
+                f"CREATE UNIQUE INDEX {_unique_index_name(table)} "
+                f"ON {table.name} ({', '.join(unique)})"
+            ).execute_if(callable_=_not_postgresql),
+        )
+    return table
+
+
+def _unique_columns(table: Table) -> list[str]:
+    """The primary key without the partition key"""
+    key = partition_key(table)
+    return [name for name in table.primary_key.columns.keys() if name != key]
+
+
+def _unique_index_name(table: Table) -> str:
+    return f"uq_{table.name}_{'_'.join(_unique_columns(table))}"
+
+
+def partition_key(table: Table) -> str | None:
+    partitioning = table.info.get("partitioning")
+    return partitioning.key if partitioning is not None else None
+
+
+def partitioning_objects(table: Table) -> list[str]:
+    """
+    The names of the tables and indexes `partition_table` creates with DDL, out
+    of the metadata, so autogenerate leaves them alone
+    """
+    partitioning = table.info.get("partitioning")
+    if partitioning is None:
+        return []
+    names = [
+        f"{table.name}_p{number}"
+        for number in range(len(partitioning.partitions_ddl(table.name)))
+    ]
+    if _unique_columns(table):
+        names.append(_unique_index_name(table))
+    return names
+
+
+def partition_dependency(model_type: Any) -> Callable[..., Any]:
+    """
+    A dependency taking the value of the partition key of the model as an
+    optional query param, None for the models that aren't partitioned or are
+    by their `id`, which the lookups filter by anyway
+    """
+    key = partition_key(model_type.__table__)
+    parameters = []
+    if key not in (None, "id"):
+        parameters.append(
+            inspect.Parameter(
+                key,
+                inspect.Parameter.KEYWORD_ONLY,
+                default=Query(
+                    None, description="Partition key of the row, to only look there"
+                ),
+                annotation=model_type.model_fields[key].annotation | None,
+            )
+        )
+
+    def partition(**params) -> Any:
+        return params.get(key)
+
+    partition.__signature__ = inspect.Signature(parameters)
+    return partition
@@ -0,0 +1,63 @@
+import time
+from dataclasses import dataclass
+
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from app.base.metrics import DB_POOL_CHECKOUT_WAIT, DB_POOL_TIMEOUTS
+
+
+@dataclass
+class PoolStats:
+    checkouts: int = 0
+    timeouts: int = 0
+    checkout_wait_seconds_total: float = 0
+    checkout_wait_seconds_max: float = 0
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """The default pool of the async engines, timing how long every checkout
+    waits for a connection"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            return super().connect()
+        except PoolTimeoutError:
+            self.stats.timeouts += 1
+            DB_POOL_TIMEOUTS.inc()
+            raise
+        finally:
+            waited = time.perf_counter() - start
+            self.stats.checkouts += 1
+            self.stats.checkout_wait_seconds_total += waited
+            self.stats.checkout_wait_seconds_max = max(
+                self.stats.checkout_wait_seconds_max, waited
+            )
+            DB_POOL_CHECKOUT_WAIT.observe(waited)
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+    def saturation(self) -> float:
+        """Connections in use over the most the pool can open"""
+        capacity = self.size() + max(self._max_overflow, 0)
+        return self.checkedout() / capacity if capacity else 0
+
+    def as_dict(self) -> dict[str, float]:
+        return {
+            "size": self.size(),
+            "checked_out": self.checkedout(),
+            "overflow": self.overflow(),
+            "saturation": self.saturation(),
+            "checkouts": self.stats.checkouts,
+            "timeouts": self.stats.timeouts,
+            "checkout_wait_seconds_total": self.stats.checkout_wait_seconds_total,
+            "checkout_wait_seconds_max": self.stats.checkout_wait_seconds_max,
+        }
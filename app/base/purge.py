@@ -0,0 +1,177 @@
+"""
+Purge of the soft deleted rows: deletes (or moves to their `<table>_archive`
+with `--archive`) the rows deleted more than the retention ago, so the tables
+and their indexes stay the size of the live rows.
+
+The rows go in small batches, walked by `(deleted_at, id)` over the partial
+index of the deleted rows, each one in its own short transaction and with a
+pause between them. The tables referencing others go first (songs before
+bands), and a row still referenced by another one is kept until that one is
+purged. Run it from the project root:
+
+    python -m app.base.purge
+    python -m app.base.purge --retention-days 7 --archive --vacuum
+
+or with `POST /purge`.
+"""
+import argparse
+import asyncio
+import sys
+from datetime import datetime, timedelta
+
+from sqlalchemy import MetaData, Table, delete, exists, insert, select, text, tuple_
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.orm import sessionmaker
+from sqlmodel import SQLModel
+
+from app.base.db import SessionLocal, engine
+from app.config import settings
+
+
+def soft_delete_tables(metadata: MetaData) -> list[Table]:
+    """The tables with a `deleted_at`, the ones referencing others first"""
+    return [
+        table
+        for table in reversed(metadata.sorted_tables)
+        if "deleted_at" in table.c and "archive_of" not in table.info
+    ]
+
+
+async def purge_table(
+    session_factory: sessionmaker,
+    table: Table,
+    *,
+    before: datetime,
+    batch_size: int = settings.PURGE_BATCH_SIZE,
+    pause: float = settings.PURGE_PAUSE_SECONDS,
+    archive: bool = False,
+) -> int:
+    """Purges the rows of `table` deleted before `before`, returns how many"""
+    archive_table = table.info.get("archive")
+    if archive and archive_table is None:
+        raise ValueError(f"{table.name} has no archive table")
+
+    key = [table.c.deleted_at, table.c.id]
+    conditions = [
+        table.c.deleted_at < before,
+        # the rows another one still references wait for it to be purged, but
+        # for the ones deleted along with them (ON DELETE CASCADE)
+        *(
+            ~exists().where(foreign_key.parent == foreign_key.column)
+            for other in table.metadata.sorted_tables
+            for foreign_key in other.foreign_keys
+            if foreign_key.column.table is table and foreign_key.ondelete != "CASCADE"
+        ),
+    ]
+
+    purged = 0
+    last = None
+    while True:
+        statement = select(*key).where(*conditions).order_by(*key).limit(batch_size)
+        if last is not None:
+            statement = statement.where(tuple_(*key) > tuple_(*last))
+        async with session_factory() as db:
+            batch = (await db.exec(statement)).all()
+            if not batch:
+                break
+            ids = [row.id for row in batch]
+            # checked again, a row could have been referenced since the select
+            result = await db.exec(
+                delete(table)
+                .where(table.c.id.in_(ids), *conditions)
+                .returning(*table.columns)
+            )
+            rows = [row._asdict() for row in result]
+            if archive and rows:
+                await db.exec(insert(archive_table), params=rows)
+            await db.commit()
+        purged += len(rows)
+        last = batch[-1]
+        if len(batch) < batch_size:
+            break
+        await asyncio.sleep(pause)
+    return purged
+
+
+async def purge(
+    session_factory: sessionmaker,
+    metadata: MetaData,
+    *,
+    retention: timedelta = timedelta(days=settings.PURGE_RETENTION_DAYS),
+    batch_size: int = settings.PURGE_BATCH_SIZE,
+    pause: float = settings.PURGE_PAUSE_SECONDS,
+    archive: bool = False,
+) -> dict[str, int]:
+    """Purges every soft delete table, returns the rows purged by table"""
+    before = datetime.utcnow() - retention
+    return {
+        table.name: await purge_table(
+            session_factory,
+            table,
+            before=before,
+            batch_size=batch_size,
+            pause=pause,
+            archive=archive,
+        )
+        for table in soft_delete_tables(metadata)
+    }
+
+
+async def vacuum(engine: AsyncEngine, table_names: list[str]) -> None:
+    """
+    `VACUUM (ANALYZE)` of the tables on Postgres, so the space of the purged
+    rows is reused right away and the planner statistics count the rows left
+    """
+    if engine.dialect.name != "postgresql":
+        return
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        for name in table_names:
+            await conn.execute(text(f'VACUUM (ANALYZE) "{name}"'))
+
+
+async def run(args) -> dict[str, int]:
+    # registers all the models in the metadata
+    import app.main  # noqa: F401
+
+    purged = await purge(
+        SessionLocal,
+        SQLModel.metadata,
+        retention=timedelta(days=args.retention_days),
+        batch_size=args.batch_size,
+        pause=args.pause,
+        archive=args.archive,
+    )
+    if args.vacuum:
+        await vacuum(engine, [name for name, count in purged.items() if count])
+    await engine.dispose()
+    return purged
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--retention-days", type=float, default=settings.PURGE_RETENTION_DAYS
+    )
+    parser.add_argument("--batch-size", type=int, default=settings.PURGE_BATCH_SIZE)
+    parser.add_argument(
+        "--pause",
+        type=float,
+        default=settings.PURGE_PAUSE_SECONDS,
+        help="seconds between the batches",
+    )
+    parser.add_argument(
+        "--archive", action="store_true", help="move the rows to <table>_archive"
+    )
+    parser.add_argument(
+        "--vacuum", action="store_true", help="VACUUM (ANALYZE) the purged tables"
+    )
+    args = parser.parse_args()
+
+    for name, count in asyncio.run(run(args)).items():
+        print(f"{name}: {count} rows purged")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,9 +1,31 @@
-from fastapi import APIRouter
-from fastapi_pagination import LimitOffsetPage
+from typing import Annotated, Any, Sequence
+
+from fastapi import APIRouter, Body, Depends, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from fastapi_pagination import LimitOffsetParams
 from pydantic import BaseModel
+from starlette.background import BackgroundTask
 
+from app.base.admission import admit_read, admit_write, stream_slot
+from app.base.cache import CacheBackend
+from app.base.conditional import Freshness
+from app.base.counting import CountStrategy
 from app.base.crud import GenericCRUD
-from app.base.db import DBSession
+from app.base.db import (
+    DBReadSession,
+    DBReadSessionFactory,
+    DBSession,
+    DBSessionFactory,
+    mark_write,
+    release,
+)
+from app.base.export import MEDIA_TYPES, ExportFormat, stream_export
+from app.base.filters import FilterFields, ListQuery, list_query_dependency
+from app.base.ingestion import ingestion_queue
+from app.base.loading import LoadStrategy
+from app.base.pagination import KeysetPage, KeysetParams, LimitOffsetPage
+from app.base.partitioning import partition_dependency
+from app.base.serialization import FastSerializer
 
 
 class GenericCrudRouter(APIRouter):
@@ -13,6 +35,19 @@ class GenericCrudRouter(APIRouter):
         GetSchemaType: BaseModel,
         CreateSchemaType: BaseModel,
         UpdateSchemaType: BaseModel,
+        *,
+        keyset_pagination: bool = False,
+        keyset_columns: Sequence[str] | None = None,
+        load_strategy: LoadStrategy | None = None,
+        batch_chunk_size: int = 1000,
+        cache: CacheBackend | None = None,
+        filter_fields: FilterFields | None = None,
+        sort_fields: Sequence[str] = (),
+        fast_serialization: bool = False,
+        count_strategy: CountStrategy = "exact",
+        coalesce_reads: bool = False,
+        crud_type: type[GenericCRUD] = GenericCRUD,
+        write_behind: bool = False,
     ):
         """
         CRUD object with default methods to Create, Read, Update, Delete (CRUD).
@@ -21,50 +56,277 @@ class GenericCrudRouter(APIRouter):
 
         * `model`: A SQLAlchemy model class
         * `schema`: A Pydantic model (schema) class
+        * `keyset_pagination`: list with a `KeysetPage` (cursor) instead of a
+          `LimitOffsetPage`
+        * `keyset_columns`: sort key of the keyset pages, see `GenericCRUD`
+        * `load_strategy`: how the relationships of `GetSchemaType` are eager
+          loaded, see `GenericCRUD`
+        * `batch_chunk_size`: rows written per statement and transaction by the
+          `/batch` routes
+        * `cache`: cache for `GET /{id}`, e.g. `TTLCache(maxsize=10_000, ttl=30)`
+        * `filter_fields`: filters of the list, like `{"year": ["gte", "lte"]}`
+          takes `?year__gte=1965&year__lte=1970`, see `GenericCRUD`
+        * `sort_fields`: fields the list can be sorted by, `?sort=-year`. Keyset
+          pages are always sorted by their `keyset_columns`
+        * `fast_serialization`: the reads, creates and updates serialize their
+          response straight to JSON bytes with a compiled `TypeAdapter` (see
+          `FastSerializer`), skipping FastAPI's response model validation and
+          `jsonable_encoder`. The OpenAPI schema stays the same
+        * `count_strategy`: how the `LimitOffsetPage` gets its total, `exact`,
+          `cached` or `estimated`, see `GenericCRUD`
+        * `coalesce_reads`: the concurrent identical reads of the list and get
+          routes share one query per worker, see `SingleFlight`
+        * `crud_type`: the `GenericCRUD` subclass the routes use, for its write
+          hooks like `after_write`
+        * `write_behind`: adds `POST /ingest`, creating like `POST /` but
+          answering 202 with the id at once and inserting in batches in the
+          background, and `GET /ingest` with the ids still pending, see
+          `IngestionQueue`
         """
         obj_name = f"{model_type.__name__.lower()}s"
         super().__init__(prefix=f"/{obj_name}", tags=[obj_name.capitalize()])
-        self.crud = GenericCRUD(model_type)
+        self.crud = crud_type(
+            model_type,
+            keyset_columns=keyset_columns,
+            read_schema=GetSchemaType,
+            load_strategy=load_strategy,
+            chunk_size=batch_chunk_size,
+            cache=cache,
+            filter_fields=filter_fields,
+            sort_fields=() if keyset_pagination else sort_fields,
+            count_strategy=count_strategy,
+            coalesce=coalesce_reads,
+        )
+        list_query = list_query_dependency(
+            model_type, self.crud.filter_fields, self.crud.sort_fields
+        )
+        ListQueryParams = Annotated[ListQuery, Depends(list_query)]
+        PageType = KeysetPage if keyset_pagination else LimitOffsetPage
+        item_serializer = page_serializer = None
+        if fast_serialization:
+            item_serializer = FastSerializer(GetSchemaType)
+            page_serializer = FastSerializer(PageType[GetSchemaType])
+
+        async def render(
+            db, serializer: FastSerializer | None, content, response: Response
+        ):
+            """
+            Releases the connection of the session, everything is loaded already,
+            and leaves the content to FastAPI or serializes it in fast mode
+            """
+            await release(db)
+            if serializer is None:
+                return content
+            return serializer.response(content, headers=response.headers)
+
+        async def render_fresh(
+            db,
+            serializer: FastSerializer | None,
+            content,
+            freshness: Freshness | None,
+            request: Request,
+            response: Response,
+        ):
+            """
+            `render` with the ETag (and Last-Modified) of the content, or an empty
+            304 when the client copy is still fresh, sparing the serialization
+            """
+            if freshness is not None:
+                if freshness.not_modified(request):
+                    await release(db)
+                    return Response(status_code=304, headers=freshness.headers())
+                response.headers.update(freshness.headers())
+            return await render(db, serializer, content, response)
+
+        IdType = model_type.model_fields["id"].annotation
+        # the partition key of a partitioned model as an optional query param of
+        # the "/{id}" routes, so Postgres only looks in its partition
+        Partition = Annotated[Any, Depends(partition_dependency(model_type))]
+        # the routes using the database take a slot of the admission control, and
+        # the writes pin the client reads to the primary for a while
+        reads = [Depends(admit_read)]
+        writes = [Depends(admit_write), Depends(mark_write)]
+
+        if keyset_pagination:
+
+            @self.get(
+                "",
+                name=f"Gets all {model_type.__name__.capitalize()}s",
+                dependencies=reads,
+            )
+            async def get_all(
+                request: Request,
+                response: Response,
+                db: DBReadSession,
+                query: ListQueryParams,
+                params: Annotated[KeysetParams, Depends()],
+            ) -> KeysetPage[GetSchemaType]:
+                page, freshness = await self.crud.keyset_paginate_with_freshness(
+                    db, params, query
+                )
+                return await render_fresh(
+                    db, page_serializer, page, freshness, request, response
+                )
+
+        else:
+
+            @self.get(
+                "",
+                name=f"Gets all {model_type.__name__.capitalize()}s",
+                dependencies=reads,
+            )
+            async def get_all(
+                request: Request,
+                response: Response,
+                db: DBReadSession,
+                query: ListQueryParams,
+                params: Annotated[LimitOffsetParams, Depends()],
+            ) -> LimitOffsetPage[GetSchemaType]:
+                page, freshness = await self.crud.paginate_with_freshness(
+                    db, query, params
+                )
+                return await render_fresh(
+                    db, page_serializer, page, freshness, request, response
+                )
+
+        # declared before the "/{id}" routes so "export" and "batch" aren't taken
+        # as ids
+        @self.get("/export", name=f"Exports all {model_type.__name__.lower()}s")
+        async def export(
+            session_factory: DBReadSessionFactory,
+            export_format: Annotated[ExportFormat, Query(alias="format")] = "ndjson",
+        ) -> StreamingResponse:
+            # the slot is held until the stream ends, not only while the route runs
+            slot = await stream_slot("export")
+            return StreamingResponse(
+                slot.hold(
+                    stream_export(
+                        session_factory, self.crud, GetSchemaType, export_format
+                    )
+                ),
+                background=BackgroundTask(slot.release),
+                media_type=MEDIA_TYPES[export_format],
+                headers={
+                    "Content-Disposition": (
+                        f'attachment; filename="{obj_name}.{export_format}"'
+                    )
+                },
+            )
+
+        @self.post(
+            "/batch",
+            name=f"Creates many {model_type.__name__.lower()}s",
+            dependencies=writes,
+        )
+        async def create_many(
+            objs_in: list[CreateSchemaType],
+            db: DBSession,
+        ) -> list[IdType]:
+            return await self.crud.create_many(db, objs_in=objs_in)
 
-        @self.get("", name=f"Gets all {model_type.__name__.capitalize()}s")
-        async def get_all(
+        @self.put(
+            "/batch",
+            name=f"Updates many {model_type.__name__.lower()}s",
+            dependencies=writes,
+        )
+        async def update_many(
+            ids: Annotated[list[IdType], Body()],
+            obj_in: Annotated[UpdateSchemaType, Body()],
+            db: DBSession,
+        ) -> list[IdType]:
+            return await self.crud.update_many(db, ids=ids, obj_in=obj_in)
+
+        @self.delete(
+            "/batch",
+            name=f"Deletes many {model_type.__name__.lower()}s",
+            dependencies=writes,
+        )
+        async def delete_many(
+            ids: Annotated[list[IdType], Body(embed=True)],
             db: DBSession,
-        ) -> LimitOffsetPage[GetSchemaType]:
-            return await self.crud.paginate(db)
+        ) -> list[IdType]:
+            return await self.crud.remove_many(db, ids=ids)
+
+        if write_behind:
+            self.ingestion = ingestion_queue(self.crud)
+
+            @self.post(
+                "/ingest",
+                status_code=202,
+                name=f"Queues a new {model_type.__name__.lower()} to be created",
+                # no admission slot, it doesn't take a connection
+                dependencies=[Depends(mark_write)],
+            )
+            async def ingest(
+                obj_in: CreateSchemaType,
+                session_factory: DBSessionFactory,
+            ) -> IdType:
+                return self.ingestion.put(session_factory, obj_in)
+
+            @self.get(
+                "/ingest",
+                name=f"Gets the {model_type.__name__.lower()}s pending to be created",
+            )
+            async def ingest_status() -> dict:
+                return self.ingestion.status()
 
         @self.get(
             "/{id}",
             name=f"Gets an existing {model_type.__name__.lower()} by id",
+            dependencies=reads,
         )
         async def get_by_id(
             id: str,
-            db: DBSession,
+            request: Request,
+            response: Response,
+            db: DBReadSession,
+            partition: Partition,
         ) -> GetSchemaType:
-            return await self.crud.get(db, id)
+            # a cached object has its validators cached along, a 304 for it
+            # doesn't even take a connection
+            obj, freshness = await self.crud.get_with_freshness(db, id, partition)
+            return await render_fresh(
+                db, item_serializer, obj, freshness, request, response
+            )
 
-        @self.post("", name=f"Creates a new {model_type.__name__.lower()}")
+        @self.post(
+            "",
+            name=f"Creates a new {model_type.__name__.lower()}",
+            dependencies=writes,
+        )
         async def create(
             obj_in: CreateSchemaType,
+            response: Response,
             db: DBSession,
         ) -> GetSchemaType:
-            return await self.crud.create(db, obj_in=obj_in)
+            obj = await self.crud.create(db, obj_in=obj_in)
+            return await render(db, item_serializer, obj, response)
 
-        @self.put("/{id}", name=f"Updates an existing {model_type.__name__.lower()}")
+        @self.put(
+            "/{id}",
+            name=f"Updates an existing {model_type.__name__.lower()}",
+            dependencies=writes,
+        )
         async def update(
             id: str,
             obj_in: UpdateSchemaType,
+            response: Response,
             db: DBSession,
+            partition: Partition,
         ) -> GetSchemaType:
-            return await self.crud.update(db, id=id, obj_in=obj_in)
+            obj = await self.crud.update(db, id=id, obj_in=obj_in, partition=partition)
+            return await render(db, item_serializer, obj, response)
 
         @self.delete(
             "/{id}",
             status_code=203,
             name=f"Deletes the {model_type.__name__.lower()} by id",
+            dependencies=writes,
         )
         async def delete(
             id: str,
             db: DBSession,
+            partition: Partition,
         ):
-            await self.crud.remove(db, id=id)
+            await self.crud.remove(db, id=id, partition=partition)
             return None
@@ -0,0 +1,32 @@
+from typing import Any, Mapping
+
+from fastapi import Response
+from pydantic import TypeAdapter
+
+
+class JSONBytesResponse(Response):
+    """A response whose content is already serialized JSON"""
+
+    media_type = "application/json"
+
+
+class FastSerializer:
+    """
+    Serializes the responses of a schema straight to JSON bytes, with a
+    compiled `TypeAdapter`: the objects (ORM ones included) are validated once
+    and dumped by pydantic-core, instead of validated by the response model and
+    then encoded again by `jsonable_encoder` and `json`
+    """
+
+    def __init__(self, schema: Any):
+        self.adapter = TypeAdapter(schema)
+
+    def dump(self, obj: Any) -> bytes:
+        return self.adapter.dump_json(
+            self.adapter.validate_python(obj, from_attributes=True)
+        )
+
+    def response(
+        self, obj: Any, headers: Mapping[str, str] | None = None
+    ) -> JSONBytesResponse:
+        return JSONBytesResponse(self.dump(obj), headers=headers)
@@ -6,5 +6,48 @@ class Settings(BaseSettings):
     DATABASE_URL: str
     OPENAPI_URL: str = "/openapi.json"
 
+    # engine and connection pool
+    DB_ECHO: bool = False
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    # asyncpg only
+    DB_PREPARED_STATEMENT_CACHE_SIZE: int = 100
+    DB_SERVER_SETTINGS: dict[str, str] = {}
+
+    # read replicas, a JSON list of urls
+    DATABASE_REPLICA_URLS: list[str] = []
+    # after a write the client reads from the primary during this seconds
+    READ_YOUR_WRITES_SECONDS: float = 0
+
+    # statements slower than this are logged with their route
+    SLOW_QUERY_SECONDS: float = 0.5
+
+    # admission control of the GenericCrudRouter routes: reads and writes in
+    # flight at once (0 for no limit), better no more than the pool connections
+    ADMISSION_READ_LIMIT: int = 10
+    ADMISSION_WRITE_LIMIT: int = 5
+    # the exports hold their connection for the whole stream
+    ADMISSION_EXPORT_LIMIT: int = 2
+    # the next ones wait in a queue, or get a 503 when it's full or the wait
+    # would be longer than this
+    ADMISSION_QUEUE_SIZE: int = 100
+    ADMISSION_MAX_WAIT_SECONDS: float = 2
+
+    # write-behind ingestion of the creates, see app.base.ingestion: a batch is
+    # inserted every this many rows or milliseconds, and past the pending rows
+    # the creates get a 503
+    INGESTION_BATCH_SIZE: int = 500
+    INGESTION_MAX_DELAY_MS: float = 50
+    INGESTION_MAX_PENDING: int = 10_000
+
+    # purge of the soft deleted rows, see app.base.purge
+    PURGE_RETENTION_DAYS: float = 30
+    PURGE_BATCH_SIZE: int = 500
+    # between the batches, so the purge doesn't hog the database
+    PURGE_PAUSE_SECONDS: float = 0.1
+
 
 settings = Settings()
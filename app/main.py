@@ -1,20 +1,44 @@
+import os
+import tempfile
+from contextlib import asynccontextmanager
+
 import uvicorn
 from fastapi import FastAPI
 from fastapi_pagination import add_pagination
 
 from app.base.exceptions import add_exceptions_handlers
+from app.base.ingestion import close_ingestion_queues
+from app.base.instrumentation import QueryStatsMiddleware
+from app.base.metrics import MetricsMiddleware, mark_process_dead
 from app.config import settings
+from app.songs.routes import bands_router
 from app.songs.routes import router as songs_router
+from app.songs.routes import search_router as songs_search_router
 from app.tooling import router as tooling_router
 
-app = FastAPI(openapi_url=settings.OPENAPI_URL)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # the creates accepted but not inserted yet
+    await close_ingestion_queues()
+    mark_process_dead()
+
+
+app = FastAPI(openapi_url=settings.OPENAPI_URL, lifespan=lifespan)
+app.add_middleware(QueryStatsMiddleware)
+app.add_middleware(MetricsMiddleware)
 
 
+app.include_router(songs_search_router)
 app.include_router(songs_router)
+app.include_router(bands_router)
 app.include_router(tooling_router)
 
 add_pagination(app)
 add_exceptions_handlers(app)
 
 if __name__ == "__main__":
+    # so /metrics adds up the numbers of all the workers
+    os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", tempfile.mkdtemp())
     uvicorn.run("app.main:app", reload=True, workers=2)
@@ -7,6 +7,8 @@ from sqlalchemy.engine import Connection
 from sqlalchemy.ext.asyncio import async_engine_from_config
 from sqlmodel import SQLModel  # NEW
 
+from app.base.partitioning import partitioning_objects
+
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
 config = context.config
@@ -22,6 +24,25 @@ if config.config_file_name is not None:
 # target_metadata = mymodel.Base.metadata
 target_metadata = SQLModel.metadata  # UPDATED
 
+
+def include_object(object, name, type_, reflected, compare_to):
+    """Leaves out of autogenerate the full-text search columns, tables and
+    indexes (see app/songs/search.py) and the partitions and their indexes (see
+    app/base/partitioning.py), which aren't in the models"""
+    if reflected and compare_to is None:
+        partitioning = {
+            object_name
+            for table in target_metadata.tables.values()
+            for object_name in partitioning_objects(table)
+        }
+        return not (
+            "search_vector" in name
+            or name.startswith(("song_search", "band_search"))
+            or name in partitioning
+        )
+    return True
+
+
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
 # my_important_option = config.get_main_option("my_important_option")
@@ -44,6 +65,7 @@ def run_migrations_offline() -> None:
     context.configure(
         url=url,
         target_metadata=target_metadata,
+        include_object=include_object,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
     )
@@ -53,7 +75,11 @@ def run_migrations_offline() -> None:
 
 
 def do_run_migrations(connection: Connection) -> None:
-    context.configure(connection=connection, target_metadata=target_metadata)
+    context.configure(
+        connection=connection,
+        target_metadata=target_metadata,
+        include_object=include_object,
+    )
 
     with context.begin_transaction():
         context.run_migrations()
@@ -0,0 +1,31 @@
+"""song_filter_indexes
+
+Revision ID: 3f8a6c1d2e57
+Revises: 9d4b2f6e8a13
+Create Date: 2026-10-18 13:20:00.000000
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "3f8a6c1d2e57"
+down_revision = "9d4b2f6e8a13"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index("ix_song_year", "song", ["year"], postgresql_concurrently=True)
+        op.create_index(
+            "ix_song_name_pattern",
+            "song",
+            ["name"],
+            postgresql_ops={"name": "text_pattern_ops"},
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_song_name_pattern", table_name="song")
+    op.drop_index("ix_song_year", table_name="song")
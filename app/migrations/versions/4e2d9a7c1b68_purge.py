@@ -0,0 +1,65 @@
+"""purge
+
+Revision ID: 4e2d9a7c1b68
+Revises: b71e0c4f5a92
+Create Date: 2026-10-18 15:10:00.000000
+
+"""
+import sqlalchemy as sa
+import sqlmodel  # NEW
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "4e2d9a7c1b68"
+down_revision = "b71e0c4f5a92"
+branch_labels = None
+depends_on = None
+
+DEAD_ROWS = sa.text("deleted_at IS NOT NULL")
+
+SOFT_DELETE_TABLES = ["band", "song"]
+
+
+def upgrade() -> None:
+    # where `purge --archive` moves the deleted rows, see app/base/purge.py
+    op.create_table(
+        "band_archive",
+        sa.Column("deleted_at", sa.DateTime(), nullable=True),
+        sa.Column("id", sqlmodel.sql.sqltypes.GUID(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+        sa.Column("name", sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_table(
+        "song_archive",
+        sa.Column("version", sa.Integer(), nullable=True),
+        sa.Column("deleted_at", sa.DateTime(), nullable=True),
+        sa.Column("id", sqlmodel.sql.sqltypes.GUID(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+        sa.Column("name", sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+        sa.Column("artist", sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+        sa.Column("year", sa.Integer(), nullable=True),
+        sa.Column("band_id", sqlmodel.sql.sqltypes.GUID(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+
+    # the purge walks the deleted rows by (deleted_at, id)
+    with op.get_context().autocommit_block():
+        for table in SOFT_DELETE_TABLES:
+            op.create_index(
+                f"ix_{table}_dead_deleted_at_id",
+                table,
+                ["deleted_at", "id"],
+                postgresql_where=DEAD_ROWS,
+                sqlite_where=DEAD_ROWS,
+                postgresql_concurrently=True,
+            )
+
+
+def downgrade() -> None:
+    for table in SOFT_DELETE_TABLES:
+        op.drop_index(f"ix_{table}_dead_deleted_at_id", table_name=table)
+    op.drop_table("song_archive")
+    op.drop_table("band_archive")
@@ -0,0 +1,41 @@
+"""band stats
+
+Revision ID: 8c3f1a6e2d45
+Revises: 4e2d9a7c1b68
+Create Date: 2026-10-18 17:40:00.000000
+
+"""
+import sqlalchemy as sa
+import sqlmodel  # NEW
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "8c3f1a6e2d45"
+down_revision = "4e2d9a7c1b68"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # kept by the song writes, see app/songs/stats.py
+    op.create_table(
+        "band_stats",
+        sa.Column("song_count", sa.Integer(), nullable=False),
+        sa.Column("min_year", sa.Integer(), nullable=True),
+        sa.Column("max_year", sa.Integer(), nullable=True),
+        sa.Column("last_song_at", sa.DateTime(), nullable=True),
+        sa.Column("band_id", sqlmodel.sql.sqltypes.GUID(), nullable=False),
+        sa.ForeignKeyConstraint(["band_id"], ["band.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("band_id"),
+    )
+    # the stats of the songs already there
+    op.execute(
+        "INSERT INTO band_stats "
+        "(band_id, song_count, min_year, max_year, last_song_at) "
+        "SELECT band_id, count(*), min(year), max(year), max(created_at) "
+        "FROM song WHERE deleted_at IS NULL GROUP BY band_id"
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("band_stats")
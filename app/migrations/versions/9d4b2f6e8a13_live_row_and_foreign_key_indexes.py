@@ -0,0 +1,77 @@
+"""live_row_and_foreign_key_indexes
+
+Revision ID: 9d4b2f6e8a13
+Revises: 5c1e7a2d9b40
+Create Date: 2026-10-18 12:40:00.000000
+
+"""
+import sqlalchemy as sa
+import sqlmodel  # NEW
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "9d4b2f6e8a13"
+down_revision = "5c1e7a2d9b40"
+branch_labels = None
+depends_on = None
+
+LIVE_ROWS = sa.text("deleted_at IS NULL")
+
+LIVE_INDEXES = [
+    ("band", ["id"]),
+    ("band", ["created_at", "id"]),
+    ("song", ["id"]),
+    ("song", ["created_at", "id"]),
+]
+
+
+def upgrade() -> None:
+    # the primary keys are already unique and indexed
+    op.drop_index("ix_song_id", table_name="song")
+    op.drop_index("ix_band_id", table_name="band")
+
+    # band_id was created as a string while band.id is a uuid
+    with op.batch_alter_table("song") as batch_op:
+        batch_op.alter_column(
+            "band_id",
+            existing_type=sqlmodel.sql.sqltypes.AutoString(),
+            type_=sqlmodel.sql.sqltypes.GUID(),
+            existing_nullable=False,
+            postgresql_using="band_id::uuid",
+        )
+
+    # built without locking the writes of big tables
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_song_band_id",
+            "song",
+            ["band_id"],
+            postgresql_concurrently=True,
+        )
+        for table, columns in LIVE_INDEXES:
+            op.create_index(
+                f"ix_{table}_live_{'_'.join(columns)}",
+                table,
+                columns,
+                postgresql_where=LIVE_ROWS,
+                sqlite_where=LIVE_ROWS,
+                postgresql_concurrently=True,
+            )
+
+
+def downgrade() -> None:
+    for table, columns in LIVE_INDEXES:
+        op.drop_index(f"ix_{table}_live_{'_'.join(columns)}", table_name=table)
+    op.drop_index("ix_song_band_id", table_name="song")
+
+    with op.batch_alter_table("song") as batch_op:
+        batch_op.alter_column(
+            "band_id",
+            existing_type=sqlmodel.sql.sqltypes.GUID(),
+            type_=sqlmodel.sql.sqltypes.AutoString(),
+            existing_nullable=False,
+            postgresql_using="band_id::text",
+        )
+
+    op.create_index("ix_band_id", "band", ["id"], unique=True)
+    op.create_index("ix_song_id", "song", ["id"], unique=True)
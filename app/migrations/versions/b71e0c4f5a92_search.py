@@ -0,0 +1,75 @@
+"""search
+
+Revision ID: b71e0c4f5a92
+Revises: 3f8a6c1d2e57
+Create Date: 2026-10-18 13:50:00.000000
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "b71e0c4f5a92"
+down_revision = "3f8a6c1d2e57"
+branch_labels = None
+depends_on = None
+
+# columns searched by table, see app/songs/search.py
+SEARCHED = {"song": ["name", "artist"], "band": ["name"]}
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name == "postgresql":
+        for table, columns in SEARCHED.items():
+            document = " || ' ' || ".join(columns)
+            op.execute(
+                f"ALTER TABLE {table} ADD COLUMN search_vector tsvector "
+                f"GENERATED ALWAYS AS (to_tsvector('simple', {document})) STORED"
+            )
+        with op.get_context().autocommit_block():
+            for table in SEARCHED:
+                op.execute(
+                    f"CREATE INDEX CONCURRENTLY ix_{table}_search_vector "
+                    f"ON {table} USING gin (search_vector)"
+                )
+        return
+
+    for table, columns in SEARCHED.items():
+        fts = f"{table}_search"
+        values = ", ".join(columns)
+        new = ", ".join(f"new.{column}" for column in columns)
+        old = ", ".join(f"old.{column}" for column in columns)
+        delete = (
+            f"INSERT INTO {fts}({fts}, rowid, {values}) "
+            f"VALUES('delete', old.rowid, {old});"
+        )
+        insert = f"INSERT INTO {fts}(rowid, {values}) VALUES (new.rowid, {new});"
+        op.execute(
+            f"CREATE VIRTUAL TABLE {fts} USING fts5({values}, content='{table}', "
+            "content_rowid='rowid')"
+        )
+        op.execute(
+            f"CREATE TRIGGER {fts}_insert AFTER INSERT ON {table} BEGIN {insert} END"
+        )
+        op.execute(
+            f"CREATE TRIGGER {fts}_delete AFTER DELETE ON {table} BEGIN {delete} END"
+        )
+        op.execute(
+            f"CREATE TRIGGER {fts}_update AFTER UPDATE OF {values} ON {table} "
+            f"BEGIN {delete} {insert} END"
+        )
+        # indexes the rows already in the table
+        op.execute(f"INSERT INTO {fts}({fts}) VALUES('rebuild')")
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == "postgresql":
+        for table in SEARCHED:
+            op.execute(f"DROP INDEX ix_{table}_search_vector")
+            op.execute(f"ALTER TABLE {table} DROP COLUMN search_vector")
+        return
+
+    for table in SEARCHED:
+        fts = f"{table}_search"
+        for trigger in ("insert", "delete", "update"):
+            op.execute(f"DROP TRIGGER {fts}_{trigger}")
+        op.execute(f"DROP TABLE {fts}")
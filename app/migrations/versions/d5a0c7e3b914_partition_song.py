@@ -0,0 +1,168 @@
+"""partition song
+
+Revision ID: d5a0c7e3b914
+Revises: 8c3f1a6e2d45
+Create Date: 2026-10-18 19:20:00.000000
+
+Postgres only, SQLite keeps a single table: `song` becomes `PARTITION BY HASH
+(id)` in 8 partitions (`song_p0` ... `song_p7`), see app/base/partitioning.py.
+The id stays the primary key.
+
+A partitioned table can't be altered into one, so the rows are copied to a new
+table that takes the place of the old one. It blocks, all in one transaction:
+
+* the writes of songs (the creates, updates, deletes, ingestion and purge) from
+  the start: `song` is locked in EXCLUSIVE mode for the copy of all its rows
+  and the build of the new indexes, which take about as long as a full
+  `CREATE TABLE AS` and `REINDEX` of the table. The writes of bands wait too
+  once the foreign key of the new table is added, till the end;
+* the reads of songs too for the swap at the end (drop, rename), short but
+  waiting for the reads in flight.
+
+So the songs can't be written for minutes on a big table, run it in a
+maintenance window (or with the writers stopped). It gives up after
+`LOCK_TIMEOUT` waiting for a lock, and leaves everything as it was.
+"""
+import sqlalchemy as sa
+import sqlmodel  # NEW
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "d5a0c7e3b914"
+down_revision = "8c3f1a6e2d45"
+branch_labels = None
+depends_on = None
+
+PARTITIONS = 8
+
+# how long the migration waits for its locks on song before failing, so it can
+# be run again at a quieter time
+LOCK_TIMEOUT = "5s"
+
+COLUMNS = [
+    "version",
+    "deleted_at",
+    "id",
+    "created_at",
+    "updated_at",
+    "name",
+    "artist",
+    "year",
+    "band_id",
+]
+
+LIVE_ROWS = sa.text("deleted_at IS NULL")
+DEAD_ROWS = sa.text("deleted_at IS NOT NULL")
+
+
+def _create_song_table(name: str, **kwargs) -> None:
+    op.create_table(
+        name,
+        sa.Column("version", sa.Integer(), server_default=sa.text("1"), nullable=False),
+        sa.Column("deleted_at", sa.DateTime(), nullable=True),
+        sa.Column("id", sqlmodel.sql.sqltypes.GUID(), nullable=False),
+        sa.Column(
+            "created_at",
+            sa.DateTime(),
+            server_default=sa.text("current_timestamp"),
+            nullable=False,
+        ),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+        sa.Column("name", sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column("artist", sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column("year", sa.Integer(), nullable=True),
+        sa.Column("band_id", sqlmodel.sql.sqltypes.GUID(), nullable=False),
+        **kwargs,
+    )
+    # the search vector before the copy, so the rows aren't written twice
+    op.execute(
+        f"ALTER TABLE {name} ADD COLUMN search_vector tsvector GENERATED ALWAYS AS "
+        "(to_tsvector('simple', name || ' ' || artist)) STORED"
+    )
+
+
+def _create_indexes(table: str, suffix: str) -> list[str]:
+    """Creates the indexes of song on `table`, returns their names"""
+    indexes = [
+        ("ix_song_band_id", ["band_id"], {}),
+        ("ix_song_live_id", ["id"], {"postgresql_where": LIVE_ROWS}),
+        (
+            "ix_song_live_created_at_id",
+            ["created_at", "id"],
+            {"postgresql_where": LIVE_ROWS},
+        ),
+        (
+            "ix_song_dead_deleted_at_id",
+            ["deleted_at", "id"],
+            {"postgresql_where": DEAD_ROWS},
+        ),
+        ("ix_song_year", ["year"], {}),
+        (
+            "ix_song_name_pattern",
+            ["name"],
+            {"postgresql_ops": {"name": "text_pattern_ops"}},
+        ),
+        (
+            "ix_song_search_vector",
+            ["search_vector"],
+            {"postgresql_using": "gin"},
+        ),
+    ]
+    # a partitioned table can't have its indexes built concurrently
+    for index, columns, kwargs in indexes:
+        op.create_index(f"{index}{suffix}", table, columns, **kwargs)
+    return [index for index, _, _ in indexes]
+
+
+def _replace_song_table(name: str) -> None:
+    """
+    Moves the rows of song to `name`, which takes its place. The writes of song
+    wait from the copy on, its reads only for the swap at the end
+    """
+    # gives up instead of queueing behind a long transaction, with every query
+    # of song queued behind the migration
+    op.execute(f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}'")
+    # the reads go on, the writes wait so none is left behind by the copy
+    op.execute("LOCK TABLE song IN EXCLUSIVE MODE")
+    columns = ", ".join(COLUMNS)
+    op.execute(f"INSERT INTO {name} ({columns}) SELECT {columns} FROM song")
+
+    # built before the swap, under names of their own while song has them
+    suffix = "_new"
+    op.create_primary_key(f"song_pkey{suffix}", name, ["id"])
+    op.create_foreign_key(
+        f"song_band_id_fkey{suffix}", name, "band", ["band_id"], ["id"]
+    )
+    indexes = _create_indexes(name, suffix)
+
+    # the swap, song is locked for the reads too until the commit
+    op.drop_table("song")
+    op.rename_table(name, "song")
+    for constraint in ("song_pkey", "song_band_id_fkey"):
+        op.execute(
+            f"ALTER TABLE song RENAME CONSTRAINT {constraint}{suffix} TO {constraint}"
+        )
+    for index in indexes:
+        op.execute(f"ALTER INDEX {index}{suffix} RENAME TO {index}")
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name != "postgresql":
+        return
+
+    _create_song_table("song_partitioned", postgresql_partition_by="HASH (id)")
+    for remainder in range(PARTITIONS):
+        op.execute(
+            f"CREATE TABLE song_p{remainder} PARTITION OF song_partitioned "
+            f"FOR VALUES WITH (MODULUS {PARTITIONS}, REMAINDER {remainder})"
+        )
+    _replace_song_table("song_partitioned")
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != "postgresql":
+        return
+
+    _create_song_table("song_unpartitioned")
+    # the partitions are dropped with song
+    _replace_song_table("song_unpartitioned")
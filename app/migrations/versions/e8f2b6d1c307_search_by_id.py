@@ -0,0 +1,88 @@
+"""search by id
+
+Revision ID: e8f2b6d1c307
+Revises: d5a0c7e3b914
+Create Date: 2026-10-18 21:40:00.000000
+
+SQLite only: the FTS5 tables of the `search` migration were external content
+tables keyed by the `rowid` of `song` and `band`, which a `VACUUM` can renumber
+(they have no INTEGER PRIMARY KEY). They are rebuilt with their own copy of the
+columns and the `id` of the row, see app/songs/search.py.
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "e8f2b6d1c307"
+down_revision = "d5a0c7e3b914"
+branch_labels = None
+depends_on = None
+
+# columns searched by table, see app/songs/search.py
+SEARCHED = {"song": ["name", "artist"], "band": ["name"]}
+
+
+def _drop_search(table: str) -> None:
+    fts = f"{table}_search"
+    for trigger in ("insert", "delete", "update"):
+        op.execute(f"DROP TRIGGER {fts}_{trigger}")
+    op.execute(f"DROP TABLE {fts}")
+
+
+def _create_triggers(table: str, values: str, delete: str, insert: str) -> None:
+    fts = f"{table}_search"
+    op.execute(
+        f"CREATE TRIGGER {fts}_insert AFTER INSERT ON {table} BEGIN {insert} END"
+    )
+    op.execute(
+        f"CREATE TRIGGER {fts}_delete AFTER DELETE ON {table} BEGIN {delete} END"
+    )
+    op.execute(
+        f"CREATE TRIGGER {fts}_update AFTER UPDATE OF {values} ON {table} "
+        f"BEGIN {delete} {insert} END"
+    )
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name != "sqlite":
+        return
+
+    for table, columns in SEARCHED.items():
+        fts = f"{table}_search"
+        values = ", ".join(columns)
+        new = ", ".join(f"new.{column}" for column in columns)
+        _drop_search(table)
+        op.execute(f"CREATE VIRTUAL TABLE {fts} USING fts5(id UNINDEXED, {values})")
+        _create_triggers(
+            table,
+            values,
+            delete=f"DELETE FROM {fts} WHERE id = old.id;",
+            insert=f"INSERT INTO {fts}(id, {values}) VALUES (new.id, {new});",
+        )
+        # indexes the rows already in the table
+        op.execute(f"INSERT INTO {fts}(id, {values}) SELECT id, {values} FROM {table}")
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != "sqlite":
+        return
+
+    for table, columns in SEARCHED.items():
+        fts = f"{table}_search"
+        values = ", ".join(columns)
+        new = ", ".join(f"new.{column}" for column in columns)
+        old = ", ".join(f"old.{column}" for column in columns)
+        _drop_search(table)
+        op.execute(
+            f"CREATE VIRTUAL TABLE {fts} USING fts5({values}, content='{table}', "
+            "content_rowid='rowid')"
+        )
+        _create_triggers(
+            table,
+            values,
+            delete=(
+                f"INSERT INTO {fts}({fts}, rowid, {values}) "
+                f"VALUES('delete', old.rowid, {old});"
+            ),
+            insert=f"INSERT INTO {fts}(rowid, {values}) VALUES (new.rowid, {new});",
+        )
+        op.execute(f"INSERT INTO {fts}({fts}) VALUES('rebuild')")
@@ -1,15 +1,101 @@
+import json
+from typing import Any, Sequence
+
+from fastapi.encoders import jsonable_encoder
+from fastapi_pagination.ext.sqlalchemy import count_query
+from fastapi_pagination.utils import verify_params
+from pydantic import TypeAdapter, ValidationError
+from sqlalchemy import and_, or_
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
 from app.base.crud import GenericCRUD
+from app.base.metrics import timed
+from app.base.pagination import InvalidCursor, KeysetPage, KeysetParams
 from app.songs.models import Band, Song
-from app.songs.schemas import BandCreate, BandUpdate, SongCreate, SongUpdate
+from app.songs.schemas import (
+    BandCreate,
+    BandRead,
+    BandUpdate,
+    SongCreate,
+    SongRead,
+    SongUpdate,
+)
+from app.songs.search import has_words, ranked_song_ids
+from app.songs.stats import apply_song_changes
 
 
 class CRUDSong(GenericCRUD[Song, SongCreate, SongUpdate]):
-    ...
+    tracked_columns = ("band_id", "year", "created_at")
+
+    async def after_write(
+        self, db: AsyncSession, old: Sequence[Any], new: Sequence[Any]
+    ) -> None:
+        # the band stats change in the same transaction as the songs
+        await apply_song_changes(db, removed=old, added=new)
+
+    def _decode_search_cursor(self, cursor: str) -> tuple[float, Any]:
+        try:
+            rank, id = json.loads(cursor)
+            return (
+                TypeAdapter(float).validate_python(rank),
+                TypeAdapter(Song.model_fields["id"].annotation).validate_python(id),
+            )
+        except (ValueError, TypeError, ValidationError) as e:
+            raise InvalidCursor("Invalid cursor value") from e
+
+    @timed("search")
+    async def search(
+        self,
+        db: AsyncSession,
+        q: str,
+        params: KeysetParams | None = None,
+    ) -> KeysetPage[Song]:
+        """
+        The songs with all the words of `q` in their name, artist or band name,
+        the best ranked first, see `app.songs.search`. Paginated by a
+        `(rank, id)` cursor
+        """
+        params, raw_params = verify_params(params, "cursor")
+        if not has_words(q):
+            return KeysetPage.create([], params, next_=None, total=0)
+
+        ranked = ranked_song_ids(db.bind.dialect.name, q)
+        statement = (
+            select(Song, ranked.c.rank)
+            .join(ranked, Song.id == ranked.c.id)
+            .order_by(ranked.c.rank.desc(), Song.id)
+        )
+        statement = self.apply_soft_delete_filtering(statement)
+        statement = self.apply_load_options(statement)
+
+        total = None
+        if raw_params.include_total:
+            total = await db.scalar(count_query(statement, use_subquery=False))
+
+        if raw_params.cursor:
+            rank, id = self._decode_search_cursor(raw_params.cursor)
+            statement = statement.filter(
+                or_(ranked.c.rank < rank, and_(ranked.c.rank == rank, Song.id > id))
+            )
+
+        result = await db.exec(statement.limit(raw_params.size + 1))
+        rows = result.unique().all()
+
+        next_ = None
+        if len(rows) > raw_params.size:
+            rows = rows[: raw_params.size]
+            song, rank = rows[-1]
+            next_ = json.dumps(jsonable_encoder([rank, song.id]))
+
+        return KeysetPage.create(
+            [song for song, _ in rows], params, next_=next_, total=total
+        )
 
 
 class CRUDBand(GenericCRUD[Band, BandCreate, BandUpdate]):
     ...
 
 
-song_crud = CRUDSong(Song)
-band_crud = CRUDBand(Band)
+song_crud = CRUDSong(Song, read_schema=SongRead)
+band_crud = CRUDBand(Band, read_schema=BandRead)
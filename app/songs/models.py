@@ -1,8 +1,19 @@
 import uuid
+from datetime import datetime
 
+from sqlalchemy import ForeignKey, Index
+from sqlalchemy.orm import declared_attr
 from sqlmodel import Field, Relationship, SQLModel
 
-from app.base.models import SoftDeleteModel, TimestampModel, UUIDModel
+from app.base.models import (
+    SoftDeleteModel,
+    TimestampModel,
+    UUID7Model,
+    VersionedModel,
+    archive_table,
+    table_indexes,
+)
+from app.base.partitioning import Partitioning, partition_table
 
 
 # Band models
@@ -10,7 +21,7 @@ class BandBase(SQLModel):
     name: str
 
 
-class Band(BandBase, TimestampModel, UUIDModel, SoftDeleteModel, table=True):
+class Band(BandBase, TimestampModel, UUID7Model, SoftDeleteModel, table=True):
     songs: list["Song"] = Relationship(back_populates="band")
 
 
@@ -21,6 +32,49 @@ class SongBase(SQLModel):
     year: int | None = None
 
 
-class Song(SongBase, TimestampModel, UUIDModel, SoftDeleteModel, table=True):
+class Song(
+    SongBase, TimestampModel, UUID7Model, SoftDeleteModel, VersionedModel, table=True
+):
     band_id: uuid.UUID = Field(foreign_key="band.id")
     band: Band = Relationship(back_populates="songs")
+
+    @declared_attr
+    def __table_args__(cls):
+        # the filters and sort of GET /songs
+        return (
+            *table_indexes(cls),
+            Index("ix_song_year", "year"),
+            # text_pattern_ops, so the name prefix (LIKE 'x%') can use it
+            Index(
+                "ix_song_name_pattern",
+                "name",
+                postgresql_ops={"name": "text_pattern_ops"},
+            ),
+        )
+
+
+# on Postgres, by the hash of the id: it stays the (unique) primary key, and the
+# lookups by id only read one of the 8 partitions
+partition_table(Song.__table__, Partitioning("id", partitions=8))
+
+
+# Band stats models, kept by the song writes, see app.songs.stats
+class BandStatsBase(SQLModel):
+    song_count: int = 0
+    min_year: int | None = None
+    max_year: int | None = None
+    last_song_at: datetime | None = None
+
+
+class BandStats(BandStatsBase, table=True):
+    __tablename__ = "band_stats"
+
+    band_id: uuid.UUID = Field(
+        primary_key=True,
+        sa_column_args=[ForeignKey("band.id", ondelete="CASCADE")],
+    )
+
+
+# where the purge moves the deleted rows to, see app.base.purge
+band_archive = archive_table(Band.__table__)
+song_archive = archive_table(Song.__table__)
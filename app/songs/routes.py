@@ -1,5 +1,59 @@
+import uuid
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, Query
+
+from app.base.admission import admit_read
+from app.base.cache import TTLCache
+from app.base.db import DBReadSession
+from app.base.pagination import KeysetPage
 from app.base.routers import GenericCrudRouter
+from app.songs.crud import CRUDSong, song_crud
 from app.songs.models import Song
-from app.songs.schemas import SongCreate, SongRead, SongUpdate
+from app.songs.schemas import BandStatsRead, SongCreate, SongRead, SongUpdate
+from app.songs.stats import band_stats
+
+router = GenericCrudRouter(
+    Song,
+    SongRead,
+    SongCreate,
+    SongUpdate,
+    cache=TTLCache(maxsize=10_000, ttl=10),
+    filter_fields={
+        "band_id": ["eq"],
+        "year": ["eq", "gte", "lte"],
+        "name": ["prefix"],
+    },
+    sort_fields=["year", "created_at"],
+    fast_serialization=True,
+    count_strategy="estimated",
+    coalesce_reads=True,
+    # keeps the band stats
+    crud_type=CRUDSong,
+    write_behind=True,
+)
+
+# included before `router`, or "/songs/search" would be taken by "/songs/{id}"
+search_router = APIRouter(prefix="/songs", tags=["Songs"])
+
+
+@search_router.get(
+    "/search", name="Searches the songs", dependencies=[Depends(admit_read)]
+)
+async def search(
+    q: Annotated[str, Query(min_length=1, description="Words to look for")],
+    db: DBReadSession,
+) -> KeysetPage[SongRead]:
+    return await song_crud.search(db, q)
+
+
+bands_router = APIRouter(prefix="/bands", tags=["Bands"])
+
 
-router = GenericCrudRouter(Song, SongRead, SongUpdate, SongCreate)
+@bands_router.get(
+    "/{id}/stats",
+    name="Gets the stats of a band",
+    dependencies=[Depends(admit_read)],
+)
+async def get_band_stats(id: uuid.UUID, db: DBReadSession) -> BandStatsRead:
+    return await band_stats(db, id)
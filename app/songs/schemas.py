@@ -1,6 +1,6 @@
 import uuid
 
-from app.songs.models import BandBase, SongBase
+from app.songs.models import BandBase, BandStatsBase, SongBase
 
 
 # band schemas
@@ -16,8 +16,13 @@ class BandRead(BandBase):
     id: uuid.UUID
 
 
+class BandStatsRead(BandStatsBase):
+    band_id: uuid.UUID
+
+
 # song schemas
 class SongRead(SongBase):
+    version: int
     band: BandRead
 
 
@@ -26,4 +31,5 @@ class SongCreate(SongBase):
 
 
 class SongUpdate(SongBase):
-    ...
+    # the version read, to fail with a 409 if the song changed since
+    version: int | None = None
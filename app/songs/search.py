@@ -0,0 +1,153 @@
+"""
+Full-text search of the songs, by their name and artist and the name of their
+band.
+
+* Postgres: a generated `search_vector` tsvector column on `song` and `band`,
+  with a GIN index, ranked with `ts_rank`
+* SQLite: FTS5 tables (`song_search`, `band_search`) with their own copy of
+  the columns and the `id` of the row, kept in sync by triggers, ranked with
+  `bm25`. Not external content tables keyed by the `rowid`: the tables have no
+  INTEGER PRIMARY KEY, so a `VACUUM` can renumber it
+
+Both are created along with the tables (`SQLModel.metadata.create_all`) and by
+the `search` migration for the existing databases.
+"""
+import re
+
+from sqlalchemy import (
+    DDL,
+    column,
+    event,
+    func,
+    literal_column,
+    select,
+    table,
+    union_all,
+)
+from sqlalchemy.sql import Select
+
+from app.songs.models import Band, Song
+
+# "simple" doesn't stem, like the default tokenizer of FTS5
+TS_CONFIG = "simple"
+
+POSTGRES_DDL = {
+    Song.__table__: [
+        "ALTER TABLE song ADD COLUMN search_vector tsvector GENERATED ALWAYS AS "
+        f"(to_tsvector('{TS_CONFIG}', name || ' ' || artist)) STORED",
+        "CREATE INDEX ix_song_search_vector ON song USING gin (search_vector)",
+    ],
+    Band.__table__: [
+        "ALTER TABLE band ADD COLUMN search_vector tsvector GENERATED ALWAYS AS "
+        f"(to_tsvector('{TS_CONFIG}', name)) STORED",
+        "CREATE INDEX ix_band_search_vector ON band USING gin (search_vector)",
+    ],
+}
+
+
+def _fts5_ddl(name: str, columns: list[str]) -> list[str]:
+    fts = f"{name}_search"
+    values = ", ".join(columns)
+    new = ", ".join(f"new.{column}" for column in columns)
+    # the id isn't indexed, the deletes scan the table (SQLite is local only)
+    delete = f"DELETE FROM {fts} WHERE id = old.id;"
+    insert = f"INSERT INTO {fts}(id, {values}) VALUES (new.id, {new});"
+    return [
+        f"CREATE VIRTUAL TABLE {fts} USING fts5(id UNINDEXED, {values})",
+        f"CREATE TRIGGER {fts}_insert AFTER INSERT ON {name} BEGIN {insert} END",
+        f"CREATE TRIGGER {fts}_delete AFTER DELETE ON {name} BEGIN {delete} END",
+        f"CREATE TRIGGER {fts}_update AFTER UPDATE OF {values} ON {name} "
+        f"BEGIN {delete} {insert} END",
+    ]
+
+
+SQLITE_DDL = {
+    Song.__table__: _fts5_ddl("song", ["name", "artist"]),
+    Band.__table__: _fts5_ddl("band", ["name"]),
+}
+
+for dialect, ddl in (("postgresql", POSTGRES_DDL), ("sqlite", SQLITE_DDL)):
+    for search_table, statements in ddl.items():
+        for statement in statements:
+            event.listen(
+                search_table,
+                "after_create",
+                DDL(statement).execute_if(dialect=dialect),
+            )
+
+
+def _words(q: str) -> list[str]:
+    return re.findall(r"\w+", q)
+
+
+def _postgres_hits(word: str) -> list[Select]:
+    query = func.plainto_tsquery(literal_column(f"'{TS_CONFIG}'::regconfig"), word)
+    song_vector = literal_column("song.search_vector")
+    band_vector = literal_column("band.search_vector")
+    song_hits = select(
+        Song.id.label("id"), func.ts_rank(song_vector, query).label("rank")
+    ).where(song_vector.op("@@")(query))
+    band_hits = (
+        select(Song.id.label("id"), func.ts_rank(band_vector, query).label("rank"))
+        .select_from(Band)
+        .join(Song, Song.band_id == Band.id)
+        .where(band_vector.op("@@")(query), Band.deleted_at == None)
+    )
+    return [song_hits, band_hits]
+
+
+def _sqlite_hits(word: str) -> list[Select]:
+    # quoted, so the FTS5 query syntax (AND, *, ", ...) isn't used
+    query = f'"{word}"'
+    song_fts = table("song_search", column("id"))
+    band_fts = table("band_search", column("id"))
+    song_hits = (
+        select(
+            Song.id.label("id"),
+            (-func.bm25(literal_column("song_search"))).label("rank"),
+        )
+        .select_from(song_fts)
+        .join(Song, Song.id == song_fts.c.id)
+        .where(literal_column("song_search").op("MATCH")(query))
+    )
+    band_hits = (
+        select(
+            Song.id.label("id"),
+            (-func.bm25(literal_column("band_search"))).label("rank"),
+        )
+        .select_from(band_fts)
+        .join(Band, Band.id == band_fts.c.id)
+        .join(Song, Song.band_id == Band.id)
+        .where(
+            literal_column("band_search").op("MATCH")(query), Band.deleted_at == None
+        )
+    )
+    return [song_hits, band_hits]
+
+
+def ranked_song_ids(dialect: str, q: str):
+    """
+    Subquery with the `id` of the songs matching all the words of `q` and their
+    `rank`, higher is better. Each word can be in the song or in the name of its
+    band, like `beatles yesterday`, the ranks of all the matches are added up
+    """
+    hits_of = _postgres_hits if dialect == "postgresql" else _sqlite_hits
+    # a match per word, so the songs with all of them are the ones left grouped
+    words = list(dict.fromkeys(word.lower() for word in _words(q)))
+    hits = union_all(
+        *(
+            hit.add_columns(literal_column(str(number)).label("word"))
+            for number, word in enumerate(words)
+            for hit in hits_of(word)
+        )
+    ).subquery()
+    return (
+        select(hits.c.id, func.sum(hits.c.rank).label("rank"))
+        .group_by(hits.c.id)
+        .having(func.count(hits.c.word.distinct()) == len(words))
+        .subquery("ranked")
+    )
+
+
+def has_words(q: str) -> bool:
+    return bool(_words(q))
@@ -0,0 +1,230 @@
+"""
+Stats of every band: `song_count`, `min_year`, `max_year` and `last_song_at` of
+its live songs, kept in the `band_stats` summary table so reading them is a
+primary key lookup whatever the size of the catalog.
+
+The song writes of `CRUDSong` keep them in their own transaction (see
+`GenericCRUD.after_write`):
+
+* the created songs add to the stats of their band with an upsert
+* the bands losing songs (removed, soft deleted or updated) are recomputed from
+  their live songs, the min and max can't be taken back
+
+Both lock the band rows first, so the concurrent writes of a band take turns.
+The bands without live songs have no row. The writes bypassing `CRUDSong` (raw
+SQL, the purge) aren't counted, rebuild the stats after them from the project
+root:
+
+    python -m app.songs.stats
+    python -m app.songs.stats --band-id <id> --band-id <id>
+"""
+import argparse
+import asyncio
+import sys
+import uuid
+from collections import defaultdict
+from typing import Any, Sequence
+
+from sqlalchemy import case, delete, func, insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import sessionmaker
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.base.db import SessionLocal, engine
+from app.songs.models import Band, BandStats, Song
+from app.songs.schemas import BandStatsRead
+
+STATS = BandStats.__table__
+
+
+async def _lock_bands(db: AsyncSession, band_ids: Sequence[Any]) -> None:
+    # in a fixed order against deadlocks, and FOR NO KEY UPDATE so the songs
+    # inserted meanwhile (FOR KEY SHARE of their band) don't wait on it
+    await db.exec(
+        select(Band.id)
+        .where(Band.id.in_(band_ids))
+        .order_by(Band.id)
+        .with_for_update(key_share=True)
+    )
+
+
+def _live_songs_stats(band_ids: Sequence[Any] | None = None):
+    statement = (
+        select(
+            Song.band_id,
+            func.count(),
+            func.min(Song.year),
+            func.max(Song.year),
+            func.max(Song.created_at),
+        )
+        .where(Song.deleted_at.is_(None))
+        .group_by(Song.band_id)
+    )
+    if band_ids is not None:
+        statement = statement.where(Song.band_id.in_(band_ids))
+    return statement
+
+
+async def _recompute(db: AsyncSession, band_ids: Sequence[Any]) -> None:
+    """The stats of the bands from their live songs"""
+    await db.exec(delete(STATS).where(STATS.c.band_id.in_(band_ids)))
+    await db.exec(
+        insert(STATS).from_select(
+            ["band_id", "song_count", "min_year", "max_year", "last_song_at"],
+            _live_songs_stats(band_ids),
+        )
+    )
+
+
+def _upsert(dialect: str):
+    return (postgresql if dialect == "postgresql" else sqlite).insert(STATS)
+
+
+def _least(current, added):
+    # LEAST and MIN(a, b) differ by dialect and in how they take NULLs
+    return case(
+        (current.is_(None), added),
+        (added < current, added),
+        else_=current,
+    )
+
+
+def _greatest(current, added):
+    return case(
+        (current.is_(None), added),
+        (added > current, added),
+        else_=current,
+    )
+
+
+async def _add(db: AsyncSession, songs: Sequence[Any]) -> None:
+    """Adds the songs to the stats of their bands"""
+    by_band = defaultdict(list)
+    for song in songs:
+        by_band[song.band_id].append(song)
+    rows = []
+    for band_id, band_songs in by_band.items():
+        years = [song.year for song in band_songs if song.year is not None]
+        rows.append(
+            {
+                "band_id": band_id,
+                "song_count": len(band_songs),
+                "min_year": min(years, default=None),
+                "max_year": max(years, default=None),
+                "last_song_at": max(song.created_at for song in band_songs),
+            }
+        )
+    statement = _upsert(db.bind.dialect.name)
+    statement = statement.on_conflict_do_update(
+        index_elements=[STATS.c.band_id],
+        set_={
+            "song_count": STATS.c.song_count + statement.excluded.song_count,
+            "min_year": _least(STATS.c.min_year, statement.excluded.min_year),
+            "max_year": _greatest(STATS.c.max_year, statement.excluded.max_year),
+            "last_song_at": _greatest(
+                STATS.c.last_song_at, statement.excluded.last_song_at
+            ),
+        },
+    )
+    await db.exec(statement, params=rows)
+
+
+async def apply_song_changes(
+    db: AsyncSession, *, removed: Sequence[Any], added: Sequence[Any]
+) -> None:
+    """
+    Updates the stats with the songs a write `removed` and `added` (an update
+    both removes the old row and adds the new one), rows with their `band_id`,
+    `year` and `created_at`. Doesn't commit
+    """
+    recomputed = {song.band_id for song in removed}
+    added = [song for song in added if song.band_id not in recomputed]
+    band_ids = recomputed | {song.band_id for song in added}
+    if not band_ids:
+        return
+    await _lock_bands(db, list(band_ids))
+    if recomputed:
+        await _recompute(db, list(recomputed))
+    if added:
+        await _add(db, added)
+
+
+async def band_stats(db: AsyncSession, band_id: Any) -> BandStatsRead:
+    """
+    The stats of a (live) band, raising `NoResultFound` when there is none.
+    Zeros for a band without songs
+    """
+    statement = (
+        select(Band.id, BandStats)
+        .outerjoin(BandStats, BandStats.band_id == Band.id)
+        .where(Band.id == band_id, Band.deleted_at.is_(None))
+    )
+    _, stats = (await db.execute(statement)).one()
+    if stats is None:
+        return BandStatsRead(band_id=band_id)
+    return BandStatsRead.model_validate(stats, from_attributes=True)
+
+
+async def rebuild(
+    session_factory: sessionmaker,
+    band_ids: Sequence[Any] | None = None,
+    *,
+    batch_size: int = 500,
+) -> int:
+    """
+    Recomputes the stats of the bands, all of them by default, `batch_size`
+    bands per transaction. Returns how many bands were recomputed
+    """
+    if band_ids is not None:
+        band_ids = sorted(band_ids)
+        batches = [
+            band_ids[i : i + batch_size] for i in range(0, len(band_ids), batch_size)
+        ]
+    else:
+        batches = None
+
+    rebuilt = 0
+    last = None
+    while True:
+        async with session_factory() as db:
+            if batches is None:
+                # every band, walked by id
+                statement = select(Band.id).order_by(Band.id).limit(batch_size)
+                if last is not None:
+                    statement = statement.where(Band.id > last)
+                batch = (await db.exec(statement)).scalars().all()
+            else:
+                batch = batches.pop(0) if batches else []
+            if not batch:
+                break
+            await _lock_bands(db, batch)
+            await _recompute(db, batch)
+            await db.commit()
+        rebuilt += len(batch)
+        last = batch[-1]
+    return rebuilt
+
+
+async def run(args) -> int:
+    rebuilt = await rebuild(SessionLocal, args.band_id, batch_size=args.batch_size)
+    await engine.dispose()
+    return rebuilt
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--band-id",
+        type=uuid.UUID,
+        action="append",
+        help="only rebuild this band, can be repeated",
+    )
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    print(f"{asyncio.run(run(args))} bands rebuilt")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
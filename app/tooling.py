@@ -1,6 +1,13 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, BackgroundTasks, Response
+from sqlmodel import SQLModel
 
-from app.base.db import init_db
+from app.base.admission import limiters
+from app.base.cache import caches
+from app.base.coalescing import flights
+from app.base.db import DBSessionFactory, engine, init_db
+from app.base.metrics import latest_metrics
+from app.base.pool import InstrumentedQueuePool
+from app.base.purge import purge
 
 router = APIRouter(tags=["Tooling"])
 
@@ -10,6 +17,47 @@ async def pong():
     return {"ping": "pong!"}
 
 
+@router.get("/metrics")
+async def metrics() -> Response:
+    content, media_type = latest_metrics()
+    return Response(content=content, media_type=media_type)
+
+
+@router.get("/cache-stats")
+async def cache_stats() -> dict[str, dict[str, int]]:
+    return {name: cache.stats.as_dict() for name, cache in caches.items()}
+
+
+@router.get("/coalescing-stats")
+async def coalescing_stats() -> dict[str, dict[str, int]]:
+    return {name: flight.stats.as_dict() for name, flight in flights.items()}
+
+
+@router.get("/admission-stats")
+async def admission_stats() -> dict[str, dict[str, int]]:
+    return {kind: limiter.stats.as_dict() for kind, limiter in limiters.items()}
+
+
+@router.get("/pool-stats")
+async def pool_stats() -> dict[str, float]:
+    pool = engine.pool
+    if not isinstance(pool, InstrumentedQueuePool):
+        return {}
+    return pool.as_dict()
+
+
+@router.post("/purge", status_code=202)
+async def purge_route(
+    background_tasks: BackgroundTasks,
+    session_factory: DBSessionFactory,
+    archive: bool = False,
+) -> None:
+    """Purges the rows soft deleted more than `PURGE_RETENTION_DAYS` ago"""
+    background_tasks.add_task(
+        purge, session_factory, SQLModel.metadata, archive=archive
+    )
+
+
 @router.post("/initdb")
 async def init_db_route() -> None:
     await init_db()
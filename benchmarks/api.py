@@ -0,0 +1,254 @@
+"""
+Load benchmark of the GenericCrudRouter endpoints.
+
+Seeds a fresh SQLite database with the test factories and drives the app in
+process through httpx, reporting the throughput and the p50/p95/p99 latency of
+every scenario. Run it from the project root:
+
+    python -m benchmarks.api                     # report
+    python -m benchmarks.api --check             # fail on regressions
+    python -m benchmarks.api --update-baseline   # store a new baseline
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite://")
+
+from httpx import ASGITransport, AsyncClient  # noqa: E402
+from polyfactory.factories.pydantic_factory import ModelFactory  # noqa: E402
+from sqlalchemy.ext.asyncio import create_async_engine  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+from sqlmodel import SQLModel  # noqa: E402
+from sqlmodel.ext.asyncio.session import AsyncSession  # noqa: E402
+
+from app.base.db import (  # noqa: E402
+    WriteTrackingSession,
+    get_read_session_factory,
+    get_session,
+    get_session_factory,
+    release,
+)
+from app.base.ingestion import close_ingestion_queues  # noqa: E402
+from app.main import app  # noqa: E402
+from app.songs.crud import band_crud, song_crud  # noqa: E402
+from tests.songs.factories import (  # noqa: E402
+    BandCreationFactory,
+    SongCreationFactory,
+)
+
+BASELINE_PATH = Path(__file__).parent / "baseline.json"
+
+
+@dataclass
+class Result:
+    requests: int
+    throughput: float
+    p50: float
+    p95: float
+    p99: float
+
+
+async def seed(session_factory: sessionmaker, bands: int, songs: int) -> list:
+    async with session_factory() as db:
+        band_ids = await band_crud.create_many(
+            db, objs_in=BandCreationFactory.batch(bands)
+        )
+        songs_data = [
+            SongCreationFactory.build(band_id=band_ids[i % bands]) for i in range(songs)
+        ]
+        return await song_crud.create_many(db, objs_in=songs_data)
+
+
+async def measure(requests, concurrency: int, warmup: int) -> Result:
+    """Runs the request coroutine factories, `concurrency` at a time, the first
+    `warmup` ones aren't measured"""
+    for request in requests[:warmup]:
+        (await request()).raise_for_status()
+    requests = requests[warmup:]
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def timed(request):
+        async with semaphore:
+            start = time.perf_counter()
+            response = await request()
+            latencies.append(time.perf_counter() - start)
+            response.raise_for_status()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(timed(request) for request in requests))
+    elapsed = time.perf_counter() - start
+
+    percentiles = statistics.quantiles(latencies, n=100)
+    return Result(
+        requests=len(latencies),
+        throughput=len(latencies) / elapsed,
+        p50=percentiles[49] * 1000,
+        p95=percentiles[94] * 1000,
+        p99=percentiles[98] * 1000,
+    )
+
+
+def scenarios(client: AsyncClient, song_ids: list, band_id, requests: int):
+    """Name and requests of every scenario, each one on its own songs"""
+    count = len(song_ids)
+    deep_offset = max(count - 50, 0)
+    to_update = song_ids[:requests]
+    to_delete = song_ids[-requests:]
+    song = SongCreationFactory.build(band_id=band_id).model_dump(mode="json")
+    return {
+        "get": [
+            lambda i=i: client.get(f"/songs/{song_ids[i % count]}")
+            for i in range(requests)
+        ],
+        "deep_pagination": [
+            lambda: client.get("/songs", params={"offset": deep_offset, "limit": 50})
+            for _ in range(requests)
+        ],
+        "create": [lambda: client.post("/songs", json=song) for _ in range(requests)],
+        "ingest": [
+            lambda: client.post("/songs/ingest", json=song) for _ in range(requests)
+        ],
+        "update": [
+            lambda id=id: client.put(f"/songs/{id}", json=song) for id in to_update
+        ],
+        "soft_delete": [
+            lambda id=id: client.delete(f"/songs/{id}") for id in to_delete
+        ],
+    }
+
+
+async def run(args) -> dict[str, Result]:
+    ModelFactory.seed_random(args.seed)
+    with tempfile.TemporaryDirectory() as folder:
+        engine = create_async_engine(f"sqlite+aiosqlite:///{folder}/bench.db")
+        async with engine.begin() as conn:
+            await conn.run_sync(SQLModel.metadata.create_all)
+        session_factory = sessionmaker(
+            engine,
+            autoflush=False,
+            expire_on_commit=False,
+            class_=AsyncSession,
+            sync_session_class=WriteTrackingSession,
+        )
+
+        async def bench_session():
+            async with session_factory() as session:
+                yield session
+                await release(session)
+
+        app.dependency_overrides[get_session] = bench_session
+        app.dependency_overrides[get_session_factory] = lambda: session_factory
+        app.dependency_overrides[get_read_session_factory] = lambda: session_factory
+
+        song_ids = await seed(session_factory, args.bands, args.songs)
+        async with session_factory() as db:
+            band_id = (await song_crud.get(db, song_ids[0])).band_id
+
+        results = {}
+        transport = ASGITransport(app=app)
+        async with AsyncClient(transport=transport, base_url="http://bench") as client:
+            for name, requests in scenarios(
+                client, song_ids, band_id, args.requests + args.warmup
+            ).items():
+                results[name] = await measure(requests, args.concurrency, args.warmup)
+        # the lifespan doesn't run in process
+        await close_ingestion_queues()
+
+        app.dependency_overrides.clear()
+        await engine.dispose()
+    return results
+
+
+def report(results: dict[str, Result], baseline: dict | None) -> None:
+    print(f"{'scenario':<16}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, result in results.items():
+        line = (
+            f"{name:<16}{result.throughput:>10.1f}{result.p50:>10.2f}"
+            f"{result.p95:>10.2f}{result.p99:>10.2f}"
+        )
+        if baseline and name in baseline:
+            change = result.p95 / baseline[name]["p95"] - 1
+            line += f"   p95 {change:+.0%} vs baseline"
+        print(line)
+
+
+def regressions(
+    results: dict[str, Result], baseline: dict, tolerance: float
+) -> list[str]:
+    failures = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        expected = baseline[name]
+        # p50 and p95 are stable enough between runs, p99 and throughput aren't
+        for percentile in ("p50", "p95"):
+            value, limit = getattr(result, percentile), expected[percentile]
+            if value > limit * (1 + tolerance):
+                failures.append(
+                    f"{name}: {percentile} {value:.2f}ms > {limit:.2f}ms baseline"
+                )
+    return failures
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--bands", type=int, default=100)
+    parser.add_argument("--songs", type=int, default=10_000)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--warmup", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--check", action="store_true", help="fail on regressions")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.25,
+        help="allowed slowdown over the baseline (0.25 = 25%%)",
+    )
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args()
+
+    # the results are only comparable with the same workload
+    params = {
+        name: getattr(args, name)
+        for name in ("bands", "songs", "requests", "warmup", "concurrency", "seed")
+    }
+
+    results = asyncio.run(run(args))
+    baseline = None
+    if BASELINE_PATH.exists():
+        stored = json.loads(BASELINE_PATH.read_text())
+        if stored["params"] == params:
+            baseline = stored["scenarios"]
+    report(results, baseline)
+
+    if args.update_baseline:
+        stored = {
+            "params": params,
+            "scenarios": {name: asdict(result) for name, result in results.items()},
+        }
+        BASELINE_PATH.write_text(json.dumps(stored, indent=2) + "\n")
+        print(f"Baseline stored in {BASELINE_PATH}")
+
+    if args.check:
+        if baseline is None:
+            print("There is no baseline for these params, run --update-baseline")
+            return 1
+        failures = regressions(results, baseline, args.tolerance)
+        for failure in failures:
+            print(f"REGRESSION {failure}")
+        return 1 if failures else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,90 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.base import admission
+from app.base.admission import AdmissionLimiter, Overloaded
+
+
+@pytest.mark.asyncio
+async def test_admission_limiter_queues_in_order():
+    limiter = AdmissionLimiter("read", limit=1, queue_size=10, max_wait=5)
+    await limiter.acquire()
+    admitted = []
+
+    async def request(name):
+        await limiter.acquire()
+        admitted.append(name)
+
+    waiters = [asyncio.create_task(request(name)) for name in ("a", "b")]
+    await asyncio.sleep(0)
+    assert limiter.stats.queued == 2
+
+    limiter.release()
+    await asyncio.sleep(0)
+    assert admitted == ["a"]
+    limiter.release()
+    await asyncio.gather(*waiters)
+    assert admitted == ["a", "b"]
+    assert limiter.stats.in_flight == 1
+    assert limiter.stats.waited == 2
+
+
+@pytest.mark.asyncio
+async def test_admission_limiter_sheds_queue_full():
+    limiter = AdmissionLimiter("write", limit=1, queue_size=0, max_wait=5)
+    await limiter.acquire()
+
+    with pytest.raises(Overloaded) as error:
+        await limiter.acquire()
+
+    assert error.value.retry_after >= 1
+    assert limiter.stats.shed_queue_full == 1
+
+
+@pytest.mark.asyncio
+async def test_admission_limiter_sheds_deadline():
+    limiter = AdmissionLimiter("read", limit=1, queue_size=10, max_wait=0.01)
+    await limiter.acquire()
+
+    # waited for the whole budget
+    with pytest.raises(Overloaded):
+        await limiter.acquire()
+    assert limiter.stats.queued == 0
+
+    # the requests take longer than the budget, shed without waiting
+    limiter.release(duration=1)
+    await limiter.acquire()
+    with pytest.raises(Overloaded):
+        await asyncio.wait_for(limiter.acquire(), timeout=0.001)
+    assert limiter.stats.shed_deadline == 2
+
+
+@pytest.mark.asyncio
+async def test_api_overloaded(api_client: TestClient, monkeypatch):
+    limiter = AdmissionLimiter("read", limit=1, queue_size=0, max_wait=1)
+    monkeypatch.setitem(admission.limiters, "read", limiter)
+    await limiter.acquire()
+
+    result = api_client.get("/songs")
+
+    assert result.status_code == 503
+    assert result.headers["retry-after"] == "1"
+    assert api_client.post("/songs/batch", json=[]).status_code == 200
+    assert api_client.get("/admission-stats").json()["read"]["shed_queue_full"] == 1
+
+
+@pytest.mark.asyncio
+async def test_api_export_holds_slot(api_client: TestClient, monkeypatch):
+    limiter = AdmissionLimiter("export", limit=1, queue_size=0, max_wait=1)
+    monkeypatch.setitem(admission.limiters, "export", limiter)
+
+    assert api_client.get("/songs/export").status_code == 200
+    assert limiter.stats.in_flight == 0
+
+    await limiter.acquire()
+    result = api_client.get("/songs/export")
+    assert result.status_code == 503
+    # the reads have their own slots
+    assert api_client.get("/songs").status_code == 200
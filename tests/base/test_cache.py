@@ -0,0 +1,48 @@
+import pytest
+
+from app.base.cache import MISSING, TTLCache
+
+
+@pytest.mark.asyncio
+async def test_ttl_cache_hits_and_misses():
+    cache = TTLCache(maxsize=2, ttl=60)
+
+    assert await cache.get("a") is MISSING
+    await cache.set("a", 1)
+    assert await cache.get("a") == 1
+
+    assert cache.stats.hits == 1
+    assert cache.stats.misses == 1
+
+
+@pytest.mark.asyncio
+async def test_ttl_cache_evicts_least_recently_used():
+    cache = TTLCache(maxsize=2, ttl=60)
+    await cache.set("a", 1)
+    await cache.set("b", 2)
+    await cache.get("a")
+    await cache.set("c", 3)
+
+    assert await cache.get("b") is MISSING
+    assert await cache.get("a") == 1
+    assert cache.stats.evictions == 1
+    assert cache.stats.size == 2
+
+
+@pytest.mark.asyncio
+async def test_ttl_cache_expires():
+    cache = TTLCache(maxsize=2, ttl=0)
+    await cache.set("a", 1)
+
+    assert await cache.get("a") is MISSING
+    assert cache.stats.evictions == 1
+
+
+@pytest.mark.asyncio
+async def test_ttl_cache_delete():
+    cache = TTLCache()
+    await cache.set("a", 1)
+    await cache.delete("a", "b")
+
+    assert await cache.get("a") is MISSING
+    assert cache.stats.invalidations == 1
@@ -0,0 +1,92 @@
+import asyncio
+
+import pytest
+
+from app.base.coalescing import SingleFlight
+
+
+class Read:
+    """A read that waits to be released, counting how many times it ran"""
+
+    def __init__(self, result=None, error: Exception | None = None):
+        self.result = result
+        self.error = error
+        self.calls = 0
+        self.release = asyncio.Event()
+
+    async def __call__(self):
+        self.calls += 1
+        await self.release.wait()
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+@pytest.mark.asyncio
+async def test_single_flight_shares_the_read():
+    flight = SingleFlight()
+    read = Read(result=[1, 2])
+
+    calls = [asyncio.create_task(flight.do("songs", read)) for _ in range(5)]
+    await asyncio.sleep(0)
+    read.release.set()
+
+    assert await asyncio.gather(*calls) == [[1, 2]] * 5
+    assert read.calls == 1
+    assert flight.stats.flights == 1
+    assert flight.stats.shared == 4
+    # the next call runs its own read
+    assert await flight.do("songs", read) == [1, 2]
+    assert read.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_single_flight_shares_the_error():
+    flight = SingleFlight()
+    read = Read(error=LookupError("song"))
+
+    calls = [asyncio.create_task(flight.do("song", read)) for _ in range(2)]
+    await asyncio.sleep(0)
+    read.release.set()
+
+    results = await asyncio.gather(*calls, return_exceptions=True)
+    assert all(isinstance(result, LookupError) for result in results)
+    assert read.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_single_flight_leader_cancelled():
+    flight = SingleFlight()
+    read = Read(result="song")
+
+    leader = asyncio.create_task(flight.do("song", read))
+    await asyncio.sleep(0)
+    waiter = asyncio.create_task(flight.do("song", read))
+    await asyncio.sleep(0)
+    leader.cancel()
+    await asyncio.sleep(0)
+    read.release.set()
+
+    # the waiter runs the read again instead of being cancelled
+    assert await waiter == "song"
+    assert read.calls == 2
+    with pytest.raises(asyncio.CancelledError):
+        await leader
+
+
+@pytest.mark.asyncio
+async def test_single_flight_forget():
+    flight = SingleFlight()
+    stale, fresh = Read(result="old"), Read(result="new")
+
+    before_write = asyncio.create_task(flight.do("song", stale))
+    await asyncio.sleep(0)
+    flight.forget(lambda key: key == "song")
+    after_write = asyncio.create_task(flight.do("song", fresh))
+    await asyncio.sleep(0)
+    stale.release.set()
+    fresh.release.set()
+
+    assert await before_write == "old"
+    assert await after_write == "new"
+    assert flight.stats.forgotten == 1
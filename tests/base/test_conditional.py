@@ -0,0 +1,46 @@
+from datetime import datetime
+
+from starlette.requests import Request
+
+from app.base.conditional import Freshness
+
+
+def request(**headers) -> Request:
+    return Request(
+        {
+            "type": "http",
+            "headers": [
+                (name.replace("_", "-").encode(), value.encode())
+                for name, value in headers.items()
+            ],
+        }
+    )
+
+
+def test_freshness_etag():
+    freshness = Freshness.of("id", 1)
+    assert freshness.etag == Freshness.of("id", 1).etag
+    assert freshness.etag != Freshness.of("id", 2).etag
+    assert freshness.etag.startswith('W/"')
+
+    assert freshness.not_modified(request(if_none_match=freshness.etag))
+    assert freshness.not_modified(request(if_none_match=f'"x", {freshness.etag[2:]}'))
+    assert freshness.not_modified(request(if_none_match="*"))
+    assert not freshness.not_modified(request(if_none_match='"x"'))
+    assert not freshness.not_modified(request())
+
+
+def test_freshness_last_modified():
+    freshness = Freshness.of("id", last_modified=datetime(2024, 1, 12, 14, 45, 6, 9))
+    last_modified = freshness.headers()["Last-Modified"]
+    assert last_modified == "Fri, 12 Jan 2024 14:45:06 GMT"
+
+    assert freshness.not_modified(request(if_modified_since=last_modified))
+    assert not freshness.not_modified(
+        request(if_modified_since="Fri, 12 Jan 2024 14:45:05 GMT")
+    )
+    assert not freshness.not_modified(request(if_modified_since="yesterday"))
+    # If-None-Match wins
+    assert not freshness.not_modified(
+        request(if_none_match='"x"', if_modified_since=last_modified)
+    )
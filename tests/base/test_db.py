@@ -0,0 +1,128 @@
+import itertools
+import time
+
+import pytest
+from fastapi import Request, Response
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.base import db
+from app.base.db import (
+    WriteTrackingSession,
+    engine_options,
+    get_read_session_factory,
+    has_writes,
+    mark_write,
+    release,
+)
+from app.base.pool import InstrumentedQueuePool
+from app.config import Settings
+
+
+def test_engine_options_postgres():
+    settings = Settings(
+        DATABASE_URL="postgresql+asyncpg://postgres@db/fanspark",
+        DB_POOL_SIZE=20,
+        DB_SERVER_SETTINGS={"application_name": "fanspark"},
+    )
+
+    options = engine_options(settings.DATABASE_URL, settings)
+
+    assert options["echo"] is False
+    assert options["poolclass"] is InstrumentedQueuePool
+    assert options["pool_size"] == 20
+    assert options["connect_args"]["server_settings"] == {
+        "application_name": "fanspark"
+    }
+
+
+def test_engine_options_sqlite():
+    settings = Settings(DATABASE_URL="sqlite+aiosqlite:///:memory:")
+
+    assert engine_options(settings.DATABASE_URL, settings) == {
+        "echo": False,
+        "future": True,
+    }
+
+
+@pytest.mark.asyncio
+async def test_instrumented_pool(tmp_path):
+    engine = create_async_engine(
+        f"sqlite+aiosqlite:///{tmp_path / 'pool.db'}",
+        poolclass=InstrumentedQueuePool,
+        pool_size=1,
+        max_overflow=0,
+    )
+    try:
+        async with engine.connect():
+            assert engine.pool.saturation() == 1
+        stats = engine.pool.as_dict()
+    finally:
+        await engine.dispose()
+
+    assert stats["checkouts"] == 1
+    assert stats["checked_out"] == 0
+    assert stats["checkout_wait_seconds_max"] >= 0
+
+
+@pytest.mark.asyncio
+async def test_release(tmp_path):
+    engine = create_async_engine(
+        f"sqlite+aiosqlite:///{tmp_path / 'release.db'}",
+        poolclass=InstrumentedQueuePool,
+        pool_size=1,
+        max_overflow=0,
+    )
+    session_factory = sessionmaker(
+        engine, class_=AsyncSession, sync_session_class=WriteTrackingSession
+    )
+    commits = []
+    try:
+        async with session_factory() as session:
+            event.listen(session.sync_session, "after_commit", commits.append)
+            # no connection until the first query
+            assert engine.pool.checkedout() == 0
+            await session.exec(text("select 1"))
+            assert engine.pool.checkedout() == 1
+            assert not has_writes(session)
+
+            await release(session)
+            assert engine.pool.checkedout() == 0
+            assert not commits
+
+            await session.exec(text("create table song (name text)"))
+            assert has_writes(session)
+            await release(session)
+            assert len(commits) == 1
+            assert not has_writes(session)
+            assert engine.pool.checkedout() == 0
+    finally:
+        await engine.dispose()
+
+
+def request_with_cookie(cookie: str | None = None) -> Request:
+    headers = [(b"cookie", cookie.encode())] if cookie else []
+    return Request({"type": "http", "headers": headers})
+
+
+def test_read_session_factory_without_replicas():
+    assert get_read_session_factory(request_with_cookie()) is db.SessionLocal
+
+
+def test_read_session_factory_read_your_writes(monkeypatch):
+    replica = object()
+    monkeypatch.setattr(db, "ReplicaSessionLocals", [replica])
+    monkeypatch.setattr(db, "_replicas", itertools.cycle([replica]))
+    monkeypatch.setattr(db.settings, "READ_YOUR_WRITES_SECONDS", 5)
+
+    assert get_read_session_factory(request_with_cookie()) is replica
+
+    response = Response()
+    mark_write(response)
+    cookie = response.headers["set-cookie"].split(";")[0]
+    assert get_read_session_factory(request_with_cookie(cookie)) is db.SessionLocal
+
+    old_write = f"{db.READ_YOUR_WRITES_COOKIE}={time.time() - 10}"
+    assert get_read_session_factory(request_with_cookie(old_write)) is replica
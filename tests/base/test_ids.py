@@ -0,0 +1,61 @@
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.base.ids import uuid7, uuid7_time
+from app.songs.crud import song_crud
+from tests.songs.factories import SongCreationFactory
+
+
+def generate(count: int) -> list:
+    return [uuid7() for _ in range(count)]
+
+
+def test_uuid7_layout():
+    before = time.time()
+    id = uuid7()
+    assert id.version == 7
+    assert id.variant == "specified in RFC 4122"
+    assert before - 0.001 <= uuid7_time(id) <= time.time()
+
+
+def test_uuid7_is_monotonic_in_the_same_millisecond():
+    # more ids than the counter holds, with the clock stopped and going back
+    with patch("app.base.ids.time.time_ns", return_value=time.time_ns() + 10**9):
+        ids = generate(5000)
+    with patch("app.base.ids.time.time_ns", return_value=time.time_ns() - 10**9):
+        ids += generate(10)
+    assert ids == sorted(ids)
+    assert len(set(ids)) == len(ids)
+
+
+def test_uuid7_is_monotonic_across_threads():
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        batches = list(executor.map(generate, [2000] * 8))
+
+    for ids in batches:
+        assert ids == sorted(ids)
+    all_ids = [id for ids in batches for id in ids]
+    assert len(set(all_ids)) == len(all_ids)
+
+
+def test_uuid7_is_monotonic_across_processes():
+    with ProcessPoolExecutor(max_workers=4) as executor:
+        batches = list(executor.map(generate, [2000] * 4))
+
+    for ids in batches:
+        assert ids == sorted(ids)
+    all_ids = [id for ids in batches for id in ids]
+    assert len(set(all_ids)) == len(all_ids)
+
+
+@pytest.mark.asyncio
+async def test_order_by_id_is_insertion_order(db: AsyncSession):
+    ids = []
+    for song_data in SongCreationFactory.batch(5):
+        ids.append((await song_crud.create(db, obj_in=song_data.model_dump())).id)
+
+    assert [song.id for song in await song_crud.get_all(db)] == ids
@@ -0,0 +1,62 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.base.admission import Overloaded
+from app.base.ingestion import IngestionQueue
+from app.songs.crud import band_crud, song_crud
+from app.songs.models import Song
+from tests.songs.factories import BandCreationFactory, SongCreationFactory
+
+
+@pytest.fixture
+def session_factory(db: AsyncSession):
+    @asynccontextmanager
+    async def factory():
+        yield db
+
+    return factory
+
+
+async def song_ids(db: AsyncSession) -> set:
+    return set((await db.execute(select(Song.id))).scalars())
+
+
+@pytest.mark.asyncio
+async def test_ingestion_inserts_in_batches(db: AsyncSession, session_factory):
+    band = await band_crud.create(db, obj_in=BandCreationFactory.build())
+    queue = IngestionQueue(song_crud, batch_size=3, max_delay=0.05, max_pending=10)
+
+    ids = [
+        queue.put(session_factory, SongCreationFactory.build(band_id=band.id))
+        for _ in range(4)
+    ]
+    assert queue.status()["pending_ids"] == ids
+    # a full batch right away, the rest after max_delay
+    await asyncio.sleep(0.1)
+
+    assert await song_ids(db) == set(ids)
+    status = queue.status()
+    assert status["pending_ids"] == []
+    assert (status["inserted"], status["flushes"]) == (4, 2)
+    await queue.close()
+
+
+@pytest.mark.asyncio
+async def test_ingestion_is_bounded(db: AsyncSession, session_factory):
+    band = await band_crud.create(db, obj_in=BandCreationFactory.build())
+    queue = IngestionQueue(song_crud, batch_size=10, max_delay=60, max_pending=2)
+    for _ in range(2):
+        queue.put(session_factory, SongCreationFactory.build(band_id=band.id))
+
+    with pytest.raises(Overloaded):
+        queue.put(session_factory, SongCreationFactory.build(band_id=band.id))
+    assert queue.stats.rejected == 1
+
+    # the shutdown doesn't wait for max_delay
+    await queue.close()
+    assert len(await song_ids(db)) == 2
+    assert queue.stats.pending == 0
@@ -0,0 +1,46 @@
+import logging
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from app.base.instrumentation import instrument_engine, track_queries
+
+
+@pytest.mark.asyncio
+async def test_track_queries(sqlite_engine, monkeypatch, caplog):
+    instrument_engine(sqlite_engine)
+    monkeypatch.setattr("app.base.instrumentation.settings.SLOW_QUERY_SECONDS", 0)
+
+    with caplog.at_level(logging.WARNING, logger="app.base.instrumentation"):
+        with track_queries() as stats:
+            async with sqlite_engine.connect() as conn:
+                await conn.execute(text("select 1"))
+                await conn.execute(text("select 2"))
+
+    assert stats.count == 2
+    assert stats.duration > 0
+    assert "select 2" in caplog.text
+
+
+@pytest.mark.asyncio
+async def test_failed_queries_are_forgotten(sqlite_engine):
+    instrument_engine(sqlite_engine)
+
+    async with sqlite_engine.connect() as conn:
+        with pytest.raises(OperationalError):
+            await conn.execute(text("select * from missing_table"))
+        await conn.execute(text("select 1"))
+        assert (await conn.get_raw_connection()).info["query_start"] == []
+
+
+@pytest.mark.asyncio
+async def test_server_timing_header(api_client: TestClient, sqlite_engine):
+    instrument_engine(sqlite_engine)
+
+    result = api_client.get("/songs")
+
+    assert result.headers["server-timing"].startswith("db;dur=")
+    # the count of the page and its rows
+    assert 'desc="2 queries"' in result.headers["server-timing"]
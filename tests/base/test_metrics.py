@@ -0,0 +1,21 @@
+import pytest
+from fastapi.testclient import TestClient
+
+
+@pytest.mark.asyncio
+async def test_metrics(api_client: TestClient):
+    api_client.get("/songs").raise_for_status()
+
+    result = api_client.get("/metrics")
+    result.raise_for_status()
+
+    assert result.headers["content-type"].startswith("text/plain")
+    assert (
+        'http_request_duration_seconds_count{method="GET",route="/songs",status="200"}'
+        in result.text
+    )
+    assert (
+        'crud_operation_duration_seconds_count{model="Song",operation="paginate"}'
+        in result.text
+    )
+    assert "db_pool_checked_out_connections" in result.text
@@ -0,0 +1,26 @@
+from app.songs.models import Band, Song
+
+
+def test_foreign_keys_are_indexed():
+    indexes = {index.name: index for index in Song.__table__.indexes}
+    assert [column.name for column in indexes["ix_song_band_id"].columns] == ["band_id"]
+    assert indexes["ix_song_band_id"].dialect_options["postgresql"]["where"] is None
+
+
+def test_soft_delete_models_index_live_rows():
+    for model in (Band, Song):
+        table = model.__tablename__
+        indexes = {index.name: index for index in model.__table__.indexes}
+        for name, columns in [("id", ["id"]), ("created_at_id", ["created_at", "id"])]:
+            index = indexes[f"ix_{table}_live_{name}"]
+            assert [column.name for column in index.columns] == columns
+            where = index.dialect_options["postgresql"]["where"]
+            assert str(where) == "deleted_at IS NULL"
+
+
+def test_primary_key_has_no_extra_index():
+    for model in (Band, Song):
+        assert not any(
+            list(index.columns) == [model.__table__.c.id] and index.unique
+            for index in model.__table__.indexes
+        )
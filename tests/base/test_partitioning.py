@@ -0,0 +1,77 @@
+import pytest
+from sqlalchemy import Column, Integer, MetaData, Table
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.schema import CreateTable
+
+from app.base.partitioning import (
+    Partitioning,
+    partition_table,
+    partitioning_objects,
+)
+from app.songs.models import Band, Song, song_archive
+
+
+def test_hash_partitions():
+    statements = Partitioning("band_id", partitions=2).partitions_ddl("song")
+    assert statements == [
+        "CREATE TABLE song_p0 PARTITION OF song "
+        "FOR VALUES WITH (MODULUS 2, REMAINDER 0)",
+        "CREATE TABLE song_p1 PARTITION OF song "
+        "FOR VALUES WITH (MODULUS 2, REMAINDER 1)",
+    ]
+
+
+def test_range_partitions():
+    partitioning = Partitioning(
+        "created_at", method="range", bounds=["2026-01-01", "2026-07-01"]
+    )
+    assert partitioning.partition_by() == "RANGE (created_at)"
+    assert [
+        statement.split("FOR VALUES ")[1]
+        for statement in partitioning.partitions_ddl("event")
+    ] == [
+        "FROM (MINVALUE) TO ('2026-01-01')",
+        "FROM ('2026-01-01') TO ('2026-07-01')",
+        "FROM ('2026-07-01') TO (MAXVALUE)",
+    ]
+
+
+def test_partition_key_in_primary_key():
+    table = Table(
+        "event", MetaData(), Column("id", Integer, primary_key=True), Column("day")
+    )
+    with pytest.raises(ValueError):
+        partition_table(table, Partitioning("day", method="range"))
+
+
+def test_song_partitioned_on_postgres_only():
+    create = str(CreateTable(Song.__table__).compile(dialect=postgresql.dialect()))
+    assert "PRIMARY KEY (id)" in create
+    assert "PARTITION BY HASH (id)" in create
+    create = str(CreateTable(Song.__table__).compile(dialect=sqlite.dialect()))
+    assert "PARTITION" not in create
+
+
+def test_partitioning_objects():
+    assert partitioning_objects(Song.__table__) == [
+        f"song_p{number}" for number in range(8)
+    ]
+    assert partitioning_objects(Band.__table__) == []
+
+    # by a key apart from the id, the id gets a unique index off Postgres
+    event = Table(
+        "event",
+        MetaData(),
+        Column("id", Integer, primary_key=True),
+        Column("day", Integer, primary_key=True),
+    )
+    partition_table(event, Partitioning("day", method="range", bounds=[10]))
+    assert partitioning_objects(event) == ["event_p0", "event_p1", "uq_event_id"]
+    create = str(CreateTable(event).compile(dialect=postgresql.dialect()))
+    assert "PRIMARY KEY (id, day)" in create
+
+
+def test_archive_of_partitioned_table():
+    # as the purge migration created it
+    assert list(song_archive.primary_key.columns.keys()) == ["id"]
+    assert song_archive.c.band_id.nullable
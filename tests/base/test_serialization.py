@@ -0,0 +1,27 @@
+import json
+import uuid
+from datetime import datetime
+
+from fastapi.encoders import jsonable_encoder
+from fastapi_pagination import LimitOffsetParams
+
+from app.base.pagination import LimitOffsetPage
+from app.base.serialization import FastSerializer
+from app.songs.models import Band, Song
+from app.songs.schemas import SongRead
+
+
+def test_fast_serializer_matches_fastapi():
+    band = Band(id=uuid.uuid4(), name="The Beatles", created_at=datetime(1965, 8, 6))
+    songs = [
+        Song(id=uuid.uuid4(), name="Help!", artist="Lennon", band_id=band.id, band=band)
+        for _ in range(3)
+    ]
+    page = LimitOffsetPage.create(songs, LimitOffsetParams(limit=3), total=3)
+    PageType = LimitOffsetPage[SongRead]
+
+    fast = FastSerializer(PageType).dump(page)
+
+    expected = jsonable_encoder(PageType.model_validate(page, from_attributes=True))
+    assert json.loads(fast) == expected
+    assert json.loads(fast)["items"][0]["band"]["name"] == "The Beatles"
@@ -1,3 +1,5 @@
+from contextlib import asynccontextmanager
+
 import pytest
 from alembic.config import Config
 from fastapi.testclient import TestClient
@@ -6,7 +8,8 @@ from sqlalchemy.orm import sessionmaker
 from sqlmodel import SQLModel
 from sqlmodel.ext.asyncio.session import AsyncSession
 
-from app.base.db import get_session
+from app.base.counting import invalidate_counts
+from app.base.db import get_read_session_factory, get_session, get_session_factory
 from app.main import app
 
 # Async engine for in-memory SQLite database
@@ -51,6 +54,8 @@ async def db(sqlite_engine):
         await session.close()
         await trans.rollback()
         await connection.close()
+        # the counts cached by the test are of the rolled back rows
+        invalidate_counts()
 
 
 @pytest.fixture(scope="function")
@@ -58,4 +63,11 @@ def api_client(db) -> TestClient:
     # replace the app dependency to get test database
     app.dependency_overrides[get_session] = lambda: db
 
+    @asynccontextmanager
+    async def session_factory():
+        yield db
+
+    app.dependency_overrides[get_session_factory] = lambda: session_factory
+    app.dependency_overrides[get_read_session_factory] = lambda: session_factory
+
     return TestClient(app)
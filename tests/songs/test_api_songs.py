@@ -1,6 +1,13 @@
+import csv
+import json
+
 import pytest
 from fastapi.testclient import TestClient
 
+from app.base.instrumentation import instrument_engine
+from app.songs.routes import router as songs_router
+from tests.songs.factories import SongCreationFactory
+
 
 @pytest.mark.asyncio
 async def test_get_songs_empty(api_client: TestClient):
@@ -20,5 +27,233 @@ async def test_get_one_song(api_client: TestClient, beatles_song):
     result = result.json()
     assert len(result["items"]) == 1
     assert result["total"] == 1
+    # there are no planner statistics on SQLite
+    assert not result["total_is_estimate"]
     assert result["limit"] == 50
     assert result["offset"] == 0
+
+
+@pytest.mark.asyncio
+async def test_batch_songs(api_client: TestClient, beatles_song):
+    songs_data = SongCreationFactory.batch(3, band_id=beatles_song.band_id)
+    result = api_client.post(
+        "/songs/batch",
+        json=[song_data.model_dump(mode="json") for song_data in songs_data],
+    )
+    result.raise_for_status()
+    ids = result.json()
+    assert len(ids) == 3
+
+    result = api_client.put(
+        "/songs/batch",
+        json={"ids": ids[:2], "obj_in": {"name": "Help!", "artist": "The Beatles"}},
+    )
+    result.raise_for_status()
+    assert sorted(result.json()) == sorted(ids[:2])
+
+    # the last one is still in version 1
+    result = api_client.put(
+        "/songs/batch",
+        json={
+            "ids": ids,
+            "obj_in": {"name": "Help", "artist": "The Beatles", "version": 2},
+        },
+    )
+    assert result.status_code == 409
+    assert result.json()["stale_ids"] == ids[2:]
+    assert sorted(result.json()["updated_ids"]) == sorted(ids[:2])
+
+    result = api_client.request("DELETE", "/songs/batch", json={"ids": ids})
+    result.raise_for_status()
+    assert sorted(result.json()) == sorted(ids)
+
+    result = api_client.get("/songs").json()
+    assert result["total"] == 1
+
+    result = api_client.request("DELETE", "/songs/batch", json={"ids": ["x"]})
+    assert result.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_export_songs_ndjson(api_client: TestClient, beatles_song):
+    result = api_client.get("/songs/export")
+    result.raise_for_status()
+    assert result.headers["content-type"] == "application/x-ndjson"
+
+    songs = [json.loads(line) for line in result.text.splitlines()]
+    assert len(songs) == 1
+    assert songs[0]["name"] == beatles_song.name
+    assert songs[0]["band"]["name"] == "The Beatles"
+
+
+@pytest.mark.asyncio
+async def test_export_songs_csv(api_client: TestClient, beatles_song):
+    result = api_client.get("/songs/export", params={"format": "csv"})
+    result.raise_for_status()
+    assert result.headers["content-type"].startswith("text/csv")
+
+    songs = list(csv.DictReader(result.text.splitlines()))
+    assert len(songs) == 1
+    assert songs[0]["name"] == beatles_song.name
+    assert json.loads(songs[0]["band"])["name"] == "The Beatles"
+
+
+@pytest.mark.asyncio
+async def test_get_song_by_id(api_client: TestClient, beatles_song):
+    for _ in range(2):
+        result = api_client.get(f"/songs/{beatles_song.id}")
+        result.raise_for_status()
+        assert result.json()["band"]["name"] == "The Beatles"
+
+    result = api_client.put(
+        f"/songs/{beatles_song.id}",
+        json={"name": "Yesterday", "artist": beatles_song.artist},
+    )
+    result.raise_for_status()
+
+    result = api_client.get(f"/songs/{beatles_song.id}")
+    assert result.json()["name"] == "Yesterday"
+
+
+@pytest.mark.asyncio
+async def test_get_song_by_uppercase_id(api_client: TestClient, beatles_song):
+    # cached under the same key the writes by the lowercase id drop
+    song_url = f"/songs/{str(beatles_song.id).upper()}"
+    assert api_client.get(song_url).json()["name"] == beatles_song.name
+
+    result = api_client.put(
+        f"/songs/{beatles_song.id}",
+        json={"name": "Yesterday", "artist": beatles_song.artist},
+    )
+    result.raise_for_status()
+
+    assert api_client.get(song_url).json()["name"] == "Yesterday"
+
+
+@pytest.mark.asyncio
+async def test_update_song_stale_version(api_client: TestClient, beatles_song):
+    song = {"name": "Yesterday", "artist": beatles_song.artist, "version": 1}
+    result = api_client.put(f"/songs/{beatles_song.id}", json=song)
+    result.raise_for_status()
+    assert result.json()["version"] == 2
+
+    result = api_client.put(f"/songs/{beatles_song.id}", json=song)
+    assert result.status_code == 409
+
+    result = api_client.delete(f"/songs/{beatles_song.id}")
+    result.raise_for_status()
+    result = api_client.put(f"/songs/{beatles_song.id}", json=song)
+    assert result.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_get_songs_filtered_and_sorted(api_client: TestClient, beatles_song):
+    api_client.put(
+        f"/songs/{beatles_song.id}",
+        json={"name": beatles_song.name, "artist": beatles_song.artist, "year": None},
+    ).raise_for_status()
+    for year in (1965, 1969):
+        song_data = SongCreationFactory.build(band_id=beatles_song.band_id, year=year)
+        api_client.post("/songs", json=song_data.model_dump(mode="json"))
+
+    result = api_client.get(
+        "/songs",
+        params={
+            "band_id": str(beatles_song.band_id),
+            "year__gte": 1965,
+            "sort": "-year",
+        },
+    )
+    result.raise_for_status()
+    assert [song["year"] for song in result.json()["items"]] == [1969, 1965]
+
+    result = api_client.get("/songs", params={"sort": "artist"})
+    assert result.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_search_songs(api_client: TestClient, beatles_song):
+    result = api_client.get("/songs/search", params={"q": "the beatles"})
+    result.raise_for_status()
+    result = result.json()
+    assert [song["name"] for song in result["items"]] == [beatles_song.name]
+    assert result["next_page"] is None
+
+    result = api_client.get("/songs/search", params={"q": ""})
+    assert result.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_get_song_by_id_not_modified(
+    api_client: TestClient, beatles_song, sqlite_engine
+):
+    instrument_engine(sqlite_engine)
+    result = api_client.get(f"/songs/{beatles_song.id}")
+    result.raise_for_status()
+    etag, last_modified = result.headers["etag"], result.headers["last-modified"]
+
+    result = api_client.get(
+        f"/songs/{beatles_song.id}", headers={"If-None-Match": etag}
+    )
+    assert result.status_code == 304
+    assert result.headers["etag"] == etag
+    assert not result.content
+    # the validators are cached with the song
+    assert 'desc="0 queries"' in result.headers["server-timing"]
+    result = api_client.get(
+        f"/songs/{beatles_song.id}", headers={"If-Modified-Since": last_modified}
+    )
+    assert result.status_code == 304
+
+    api_client.put(
+        f"/songs/{beatles_song.id}",
+        json={"name": "Yesterday", "artist": beatles_song.artist},
+    ).raise_for_status()
+    result = api_client.get(
+        f"/songs/{beatles_song.id}", headers={"If-None-Match": etag}
+    )
+    assert result.status_code == 200
+    assert result.headers["etag"] != etag
+
+
+@pytest.mark.asyncio
+async def test_get_songs_not_modified(api_client: TestClient, beatles_song):
+    result = api_client.get("/songs", params={"limit": 10})
+    result.raise_for_status()
+    etag = result.headers["etag"]
+
+    result = api_client.get(
+        "/songs", params={"limit": 10}, headers={"If-None-Match": etag}
+    )
+    assert result.status_code == 304
+    # another page is another body
+    result = api_client.get(
+        "/songs", params={"limit": 5}, headers={"If-None-Match": etag}
+    )
+    assert result.status_code == 200
+
+    api_client.delete(f"/songs/{beatles_song.id}").raise_for_status()
+    result = api_client.get(
+        "/songs", params={"limit": 10}, headers={"If-None-Match": etag}
+    )
+    assert result.status_code == 200
+    assert result.json()["total"] == 0
+
+
+@pytest.mark.asyncio
+async def test_ingest_songs(api_client: TestClient, beatles_song, monkeypatch):
+    monkeypatch.setattr(songs_router.ingestion, "max_delay", 60)
+    song_data = SongCreationFactory.build(band_id=beatles_song.band_id)
+
+    # entered, so the shutdown of the app inserts the pending songs
+    with api_client:
+        result = api_client.post(
+            "/songs/ingest", json=song_data.model_dump(mode="json")
+        )
+        assert result.status_code == 202
+        id = result.json()
+        assert api_client.get("/songs/ingest").json()["pending_ids"] == [id]
+        assert api_client.get(f"/songs/{id}").status_code == 404
+
+    api_client.get(f"/songs/{id}").raise_for_status()
+    assert api_client.get("/songs/ingest").json()["pending_ids"] == []
@@ -0,0 +1,78 @@
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel import SQLModel
+
+from app.base.purge import purge, soft_delete_tables
+from app.songs.crud import band_crud, song_crud
+from app.songs.models import Band, Song, song_archive
+from tests.songs.factories import BandCreationFactory, SongCreationFactory
+
+LONG_AGO = datetime.utcnow() - timedelta(days=90)
+
+
+async def create_song(db: AsyncSession, band: Band) -> Song:
+    song_data = SongCreationFactory.build(band_id=band.id)
+    return await song_crud.create(db, obj_in=song_data.model_dump())
+
+
+async def remove_long_ago(db: AsyncSession, model_type, id) -> None:
+    await db.execute(
+        update(model_type).where(model_type.id == id).values(deleted_at=LONG_AGO)
+    )
+
+
+@pytest.fixture
+def session_factory(db: AsyncSession):
+    @asynccontextmanager
+    async def factory():
+        yield db
+
+    return factory
+
+
+def test_soft_delete_tables():
+    tables = [table.name for table in soft_delete_tables(SQLModel.metadata)]
+    assert tables == ["song", "band"]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("archive", [False, True])
+async def test_purge(db: AsyncSession, session_factory, archive: bool):
+    beatles = await band_crud.create(db, obj_in=BandCreationFactory.build())
+    stones = await band_crud.create(db, obj_in=BandCreationFactory.build())
+    old_songs = [await create_song(db, stones) for _ in range(3)]
+    recent_song = await create_song(db, beatles)
+    live_song = await create_song(db, beatles)
+    for song in old_songs:
+        await remove_long_ago(db, Song, song.id)
+    await song_crud.remove(db, id=recent_song.id)
+    # the beatles still have songs, they are kept
+    for band in (beatles, stones):
+        await remove_long_ago(db, Band, band.id)
+
+    purged = await purge(
+        session_factory, SQLModel.metadata, batch_size=2, pause=0, archive=archive
+    )
+
+    assert purged == {"song": 3, "band": 1}
+    song_ids = set((await db.execute(select(Song.id))).scalars())
+    assert song_ids == {recent_song.id, live_song.id}
+    band_ids = set((await db.execute(select(Band.id))).scalars())
+    assert band_ids == {beatles.id}
+    archived_ids = set((await db.execute(select(song_archive.c.id))).scalars())
+    assert archived_ids == ({song.id for song in old_songs} if archive else set())
+
+
+@pytest.mark.asyncio
+async def test_api_purge(api_client: TestClient, db: AsyncSession, beatles_song):
+    await remove_long_ago(db, Song, beatles_song.id)
+
+    result = api_client.post("/purge")
+
+    assert result.status_code == 202
+    assert not (await db.execute(select(Song.id))).all()
@@ -1,9 +1,22 @@
+import asyncio
 from unittest.mock import AsyncMock, patch
 
 import pytest
+from fastapi_pagination import Params
+from sqlalchemy import event, text
+from sqlalchemy.exc import IntegrityError, NoResultFound
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from sqlalchemy.orm.exc import StaleDataError
 
+from app.base.cache import TTLCache
+from app.base.counting import estimate_count
+from app.base.crud import GenericCRUD
+from app.base.filters import ListQuery
+from app.base.pagination import InvalidCursor, KeysetParams
 from app.songs.crud import band_crud, song_crud
+from app.songs.models import Song
+from app.songs.schemas import SongRead
 from tests.songs.factories import BandCreationFactory, SongCreationFactory
 
 
@@ -42,6 +55,111 @@ async def test_crud_delete(db: AsyncSession, beatles_song):
     assert song.deleted_at, "Song.deleted_at should NOT be empty"
 
 
+@pytest.mark.asyncio
+async def test_crud_remove_is_one_statement(
+    db: AsyncSession, sqlite_engine, beatles_song
+):
+    statements = []
+
+    def count_statement(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(sqlite_engine.sync_engine, "before_cursor_execute", count_statement)
+    try:
+        song = await song_crud.remove(db, id=beatles_song.id)
+    finally:
+        event.remove(
+            sqlite_engine.sync_engine, "before_cursor_execute", count_statement
+        )
+
+    # the song is written with one statement, the rest keep the band stats
+    assert statements[0].startswith("UPDATE song")
+    assert all(
+        "band_stats" in statement or statement.startswith("SELECT band.id")
+        for statement in statements[1:]
+    )
+    assert song.deleted_at
+
+
+@pytest.mark.asyncio
+async def test_crud_partition_lookups(db: AsyncSession, beatles_song):
+    crud = GenericCRUD(Song, read_schema=SongRead, cache=TTLCache())
+    other = await song_crud.create(db, obj_in=SongCreationFactory.build())
+
+    # song is partitioned by its id
+    song = await crud.get(db, beatles_song.id, beatles_song.id)
+    assert song.id == beatles_song.id
+    # only the partition of the other song is looked at
+    with pytest.raises(NoResultFound):
+        await crud.get(db, beatles_song.id, other.id)
+    with pytest.raises(NoResultFound):
+        await crud.remove(db, id=beatles_song.id, partition=other.id)
+
+    # cached or not, it isn't in another partition
+    await crud.get_cached(db, beatles_song.id, str(beatles_song.id))
+    with pytest.raises(NoResultFound):
+        await crud.get_cached(db, beatles_song.id, other.id)
+
+    song = await crud.update(
+        db, id=beatles_song.id, obj_in={"name": "Help!"}, partition=beatles_song.id
+    )
+    assert song.name == "Help!"
+
+
+@pytest.mark.asyncio
+async def test_song_ids_unique_across_bands(db: AsyncSession, beatles_song):
+    other_band = await band_crud.create(db, obj_in=BandCreationFactory.build())
+    song_data = SongCreationFactory.build(band_id=other_band.id)
+
+    # the id is the primary key, and the partition key on Postgres
+    with pytest.raises(IntegrityError):
+        await song_crud.create_many(
+            db, objs_in=[{**song_data.model_dump(), "id": beatles_song.id}]
+        )
+
+
+@pytest.mark.asyncio
+async def test_crud_update_and_remove_missing(db: AsyncSession, beatles_song):
+    await song_crud.remove(db, id=beatles_song.id)
+
+    with pytest.raises(NoResultFound):
+        await song_crud.update(db, id=beatles_song.id, obj_in={"name": "Help!"})
+    with pytest.raises(NoResultFound):
+        await song_crud.remove(db, id=beatles_song.id)
+
+
+@pytest.mark.asyncio
+async def test_crud_update_compares_version(db: AsyncSession, beatles_song):
+    assert beatles_song.version == 1
+
+    song = await song_crud.update(
+        db, id=beatles_song.id, obj_in={"name": "Help!", "version": 1}
+    )
+    assert song.version == 2
+    assert song.band.name == "The Beatles"
+
+    with pytest.raises(StaleDataError):
+        await song_crud.update(
+            db, id=beatles_song.id, obj_in={"name": "Yesterday", "version": 1}
+        )
+    song = await song_crud.get(db, beatles_song.id)
+    assert song.name == "Help!"
+
+    # a version 0 is compared too, not taken as missing
+    with pytest.raises(StaleDataError):
+        await song_crud.update(
+            db, id=beatles_song.id, obj_in={"name": "Yesterday", "version": 0}
+        )
+
+
+@pytest.mark.asyncio
+async def test_crud_update_version_of_unversioned_model(db: AsyncSession, beatles_song):
+    with pytest.raises(TypeError):
+        await band_crud.update(
+            db, id=beatles_song.band_id, obj_in={"name": "Wings"}, version=1
+        )
+
+
 @pytest.mark.asyncio
 async def test_crud_get_all_should_be_empty(db: AsyncSession):
     result = await song_crud.get_all(db)
@@ -66,6 +184,378 @@ async def test_crud_get_all_filtering_deleted(db: AsyncSession):
     assert len(songs) == 4
 
 
+@pytest.mark.asyncio
+async def test_crud_keyset_paginate(db: AsyncSession):
+    for song_data in SongCreationFactory.batch(5):
+        await song_crud.create(db, obj_in=song_data.model_dump())
+    expected = [song.id for song in await song_crud.get_all(db)]
+
+    seen = []
+    page = await song_crud.keyset_paginate(db, KeysetParams(size=2))
+    assert page.total is None
+    seen += [song.id for song in page.items]
+    while page.next_page:
+        page = await song_crud.keyset_paginate(
+            db, KeysetParams(size=2, cursor=page.next_page)
+        )
+        seen += [song.id for song in page.items]
+
+    assert sorted(seen) == sorted(expected)
+    assert len(seen) == len(set(seen))
+
+
+@pytest.mark.asyncio
+async def test_crud_keyset_paginate_total(db: AsyncSession, beatles_song):
+    page = await song_crud.keyset_paginate(
+        db, KeysetParams(size=10, include_total=True)
+    )
+    assert page.total == 1
+    assert page.next_page is None
+
+
+@pytest.mark.asyncio
+async def test_crud_keyset_paginate_invalid_cursor(db: AsyncSession):
+    with pytest.raises(InvalidCursor):
+        await song_crud.keyset_paginate(db, KeysetParams(cursor="WyJ4Il0="))
+
+
+@pytest.mark.asyncio
+async def test_crud_paginate_filters_and_sort(db: AsyncSession, beatles_song):
+    crud = GenericCRUD(
+        Song,
+        read_schema=SongRead,
+        filter_fields={"band_id": ["eq"], "year": ["gte", "lte"], "name": ["prefix"]},
+        sort_fields=["year"],
+    )
+    for year, name in [(1965, "Help!"), (1966, "Hello"), (1969, "Something")]:
+        song_data = SongCreationFactory.build(
+            band_id=beatles_song.band_id, year=year, name=name
+        )
+        await crud.create(db, obj_in=song_data.model_dump())
+
+    query = ListQuery(
+        filters={
+            "band_id": beatles_song.band_id,
+            "year__gte": 1965,
+            "name__prefix": "He",
+        },
+        sort="-year",
+    )
+    page = await crud.paginate(db, query, params=Params())
+    assert [song.name for song in page.items] == ["Hello", "Help!"]
+    assert page.total == 2
+
+    with pytest.raises(ValueError):
+        await crud.paginate(db, ListQuery(filters={"artist": "x"}))
+
+
+def test_crud_rejects_unindexed_filters():
+    with pytest.raises(ValueError, match="artist"):
+        GenericCRUD(Song, filter_fields={"artist": ["eq"]})
+    with pytest.raises(ValueError, match="artist"):
+        GenericCRUD(Song, sort_fields=["artist"])
+
+
+@pytest.mark.asyncio
+async def test_crud_search(db: AsyncSession, beatles_song):
+    band_id = beatles_song.band_id
+    songs = {}
+    for name, artist in [
+        ("Help!", "Lennon"),
+        ("Beatles Medley", "Stars on 45"),
+        ("Yesterday", "McCartney"),
+    ]:
+        song_data = SongCreationFactory.build(band_id=band_id, name=name, artist=artist)
+        songs[name] = await song_crud.create(db, obj_in=song_data.model_dump())
+    other = SongCreationFactory.build(name="Help Me", artist="Joni Mitchell")
+    await song_crud.create(db, obj_in=other.model_dump())
+
+    page = await song_crud.search(db, "help!", KeysetParams(include_total=True))
+    assert sorted(song.name for song in page.items) == ["Help Me", "Help!"]
+    assert page.total == 2
+
+    # the song matching by its name and its band goes first
+    page = await song_crud.search(db, "beatles", KeysetParams())
+    assert page.items[0].name == "Beatles Medley"
+    assert len(page.items) == 4
+    assert page.items[0].band.name == "The Beatles"
+
+    await song_crud.update(db, id=songs["Yesterday"].id, obj_in={"name": "Today"})
+    await song_crud.remove(db, id=songs["Help!"].id)
+    assert not (await song_crud.search(db, "yesterday", KeysetParams())).items
+    assert [
+        song.name for song in (await song_crud.search(db, "help", KeysetParams())).items
+    ] == ["Help Me"]
+
+
+@pytest.mark.asyncio
+async def test_crud_search_song_and_band_words(db: AsyncSession, beatles_song):
+    band_id = beatles_song.band_id
+    for name in ("Yesterday", "Let It Be"):
+        song_data = SongCreationFactory.build(band_id=band_id, name=name)
+        await song_crud.create(db, obj_in=song_data.model_dump())
+    other = SongCreationFactory.build(name="Yesterday Once More")
+    await song_crud.create(db, obj_in=other.model_dump())
+
+    page = await song_crud.search(db, "beatles yesterday", KeysetParams())
+    assert [song.name for song in page.items] == ["Yesterday"]
+
+    # the songs of a deleted band don't match by its name anymore
+    await band_crud.remove(db, id=band_id)
+    assert not (await song_crud.search(db, "beatles", KeysetParams())).items
+
+
+@pytest.mark.asyncio
+async def test_crud_search_after_renumbered_rowids(db: AsyncSession, beatles_song):
+    other = SongCreationFactory.build(name="Yesterday Once More")
+    await song_crud.create(db, obj_in=other.model_dump())
+
+    # like a VACUUM of tables without an INTEGER PRIMARY KEY
+    for name in ("song", "band"):
+        await db.exec(text(f"UPDATE {name} SET rowid = 1000 - rowid"))
+
+    page = await song_crud.search(db, "yesterday", KeysetParams())
+    assert [song.name for song in page.items] == ["Yesterday Once More"]
+    page = await song_crud.search(db, "beatles", KeysetParams())
+    assert [song.id for song in page.items] == [beatles_song.id]
+
+
+@pytest.mark.asyncio
+async def test_crud_search_pages(db: AsyncSession, beatles_song):
+    for song_data in SongCreationFactory.batch(4, band_id=beatles_song.band_id):
+        await song_crud.create(db, obj_in=song_data.model_dump())
+
+    seen = []
+    page = await song_crud.search(db, "beatles", KeysetParams(size=2))
+    seen += [song.id for song in page.items]
+    while page.next_page:
+        page = await song_crud.search(
+            db, "beatles", KeysetParams(size=2, cursor=page.next_page)
+        )
+        seen += [song.id for song in page.items]
+    assert len(seen) == len(set(seen)) == 5
+
+    with pytest.raises(InvalidCursor):
+        await song_crud.search(db, "beatles", KeysetParams(cursor="WyJ4Il0="))
+
+
+@pytest.mark.asyncio
+async def test_crud_freshness(db: AsyncSession, beatles_song):
+    song, freshness = await song_crud.get_with_freshness(db, beatles_song.id)
+    params = KeysetParams(size=10)
+    _, page_freshness = await song_crud.keyset_paginate_with_freshness(db, params)
+
+    assert freshness == song_crud.freshness(song)
+    assert freshness.last_modified == beatles_song.created_at
+    assert page_freshness.last_modified is None
+
+    await song_crud.update(db, id=beatles_song.id, obj_in={"name": "Yesterday"})
+    song = await song_crud.get(db, beatles_song.id)
+    assert freshness != song_crud.freshness(song)
+    _, new_page_freshness = await song_crud.keyset_paginate_with_freshness(db, params)
+    assert new_page_freshness != page_freshness
+
+    # the band is in the body of the song
+    freshness = song_crud.freshness(song)
+    await band_crud.update(db, id=song.band_id, obj_in={"name": "The Quarrymen"})
+    await song_crud.refresh(db, song)
+    assert song_crud.freshness(song).etag != freshness.etag
+    assert song_crud.freshness(song).last_modified == song.band.updated_at
+
+    # the writes of the same second of a model without a version
+    band = song.band
+    freshness = band_crud.freshness(band)
+    band.name = "The Beatles"
+    assert band_crud.freshness(band).etag != freshness.etag
+    assert band_crud.freshness(band).last_modified == freshness.last_modified
+
+
+@pytest.mark.asyncio
+async def test_crud_paginate_cached_count(db: AsyncSession, beatles_song):
+    crud = GenericCRUD(Song, read_schema=SongRead, count_strategy="cached")
+
+    page = await crud.paginate(db, params=Params())
+    assert (page.total, page.total_is_cached) == (1, False)
+    page = await crud.paginate(db, params=Params())
+    assert crud._counts.stats.hits == 1
+    assert (page.total_is_estimate, page.total_is_cached) == (False, True)
+
+    # the writes of any CRUD of the model drop the cached counts
+    ids = await song_crud.create_many(db, objs_in=SongCreationFactory.batch(2))
+    assert (await crud.paginate(db, params=Params())).total == 3
+    await crud.remove(db, id=ids[0])
+    assert (await crud.paginate(db, params=Params())).total == 2
+
+
+@pytest.mark.asyncio
+async def test_crud_paginate_estimated_count(db: AsyncSession, beatles_song):
+    crud = GenericCRUD(
+        Song,
+        read_schema=SongRead,
+        filter_fields={"year": ["eq"]},
+        count_strategy="estimated",
+    )
+    # there are no planner statistics on SQLite, the count is cached instead
+    assert await estimate_count(db, Song.__table__, soft_delete=True) is None
+    page = await crud.paginate(db, params=Params())
+    assert (page.total, page.total_is_estimate) == (1, False)
+
+    query = ListQuery(filters={"year": beatles_song.year})
+    assert (await crud.paginate(db, query, Params())).total == 1
+    assert not (await song_crud.paginate(db, params=Params())).total_is_estimate
+
+
+@pytest.mark.asyncio
+async def test_crud_coalesced_reads(db: AsyncSession, beatles_song):
+    crud = GenericCRUD(Song, read_schema=SongRead, coalesce=True)
+
+    with patch.object(crud, "get", wraps=crud.get) as get:
+        songs = await asyncio.gather(
+            *(crud.get_cached(db, beatles_song.id) for _ in range(3))
+        )
+    assert get.call_count == 1
+    assert songs[0] is songs[1] is songs[2]
+    assert songs[0].name == beatles_song.name
+
+    pages = await asyncio.gather(
+        crud.paginate(db, params=Params()), crud.paginate(db, params=Params())
+    )
+    assert pages[0] is pages[1]
+    assert isinstance(pages[0].items[0], SongRead)
+    # the reads after a write don't wait for the ones in flight before it
+    forgotten = crud._flights.stats.forgotten
+    read = asyncio.ensure_future(crud.paginate(db, params=Params()))
+    await asyncio.sleep(0)
+    await crud.invalidate()
+    assert crud._flights.stats.forgotten == forgotten + 1
+    assert (await read).total == 1
+
+
+@pytest.mark.asyncio
+async def test_crud_create_many(db: AsyncSession):
+    songs_data = SongCreationFactory.batch(5)
+    ids = await song_crud.create_many(db, objs_in=songs_data, chunk_size=2)
+    assert len(ids) == 5
+
+    songs = await song_crud.get_all(db)
+    assert sorted(song.id for song in songs) == sorted(ids)
+    assert all(song.created_at for song in songs)
+
+
+@pytest.mark.asyncio
+async def test_crud_update_many(db: AsyncSession):
+    ids = await song_crud.create_many(db, objs_in=SongCreationFactory.batch(3))
+    await song_crud.remove(db, id=ids[0])
+
+    # the fields that aren't columns are left out, like `update` does
+    updated_ids = await song_crud.update_many(
+        db,
+        ids=ids,
+        obj_in={"artist": "Lennon", "band": None},
+        chunk_size=2,
+    )
+
+    assert sorted(updated_ids) == sorted(ids[1:])
+    for id in ids[1:]:
+        song = await song_crud.get(db, id)
+        assert song.artist == "Lennon"
+        assert song.updated_at, "Song.updated_at should NOT be empty"
+
+
+@pytest.mark.asyncio
+async def test_crud_remove_many(db: AsyncSession):
+    ids = await song_crud.create_many(db, objs_in=SongCreationFactory.batch(5))
+
+    removed_ids = await song_crud.remove_many(db, ids=ids[:3], chunk_size=2)
+
+    assert sorted(removed_ids) == sorted(ids[:3])
+    songs = await song_crud.get_all(db)
+    assert sorted(song.id for song in songs) == sorted(ids[3:])
+
+
+@pytest.mark.asyncio
+async def test_crud_stream_all(db: AsyncSession):
+    ids = await song_crud.create_many(db, objs_in=SongCreationFactory.batch(5))
+
+    partitions = [
+        partition async for partition in song_crud.stream_all(db, yield_per=2)
+    ]
+
+    assert [len(partition) for partition in partitions] == [2, 2, 1]
+    assert sorted(song.id for p in partitions for song in p) == sorted(ids)
+
+
+@pytest.mark.asyncio
+async def test_crud_get_cached(db: AsyncSession, beatles_song):
+    crud = GenericCRUD(Song, read_schema=SongRead, cache=TTLCache())
+
+    song = await crud.get_cached(db, beatles_song.id)
+    assert await crud.get_cached(db, beatles_song.id) is song
+    assert crud.cache.stats.hits == 1
+    assert crud.cache.stats.misses == 1
+
+    await crud.update(db, id=beatles_song.id, obj_in={"name": "Yesterday"})
+    song = await crud.get_cached(db, beatles_song.id)
+    assert song.name == "Yesterday"
+
+    await crud.remove(db, id=beatles_song.id)
+    with pytest.raises(NoResultFound):
+        await crud.get_cached(db, beatles_song.id)
+
+
+@pytest.mark.asyncio
+async def test_crud_get_cached_reads_own_writes(db: AsyncSession, beatles_song):
+    crud = GenericCRUD(Song, read_schema=SongRead, cache=TTLCache())
+    # cached from a replica behind the primary
+    stale = SongRead.model_validate(beatles_song, from_attributes=True)
+    stale.name = "Yesterday"
+    await crud.cache.set(
+        crud._cache_key(beatles_song.id), (stale, None, beatles_song.band_id)
+    )
+
+    db.info["reads_own_writes"] = True
+    try:
+        song = await crud.get_cached(db, beatles_song.id)
+    finally:
+        db.info.pop("reads_own_writes")
+    assert song.name == beatles_song.name
+    assert await crud.get_cached(db, beatles_song.id) is song
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "crud, queries",
+    [
+        (song_crud, 1),
+        (GenericCRUD(Song, read_schema=SongRead, load_strategy=selectinload), 2),
+    ],
+)
+async def test_crud_get_all_eager_loads_band(
+    db: AsyncSession, sqlite_engine, crud, queries
+):
+    the_beatles_data = BandCreationFactory.build(name="The Beatles")
+    the_beatles = await band_crud.create(db, obj_in=the_beatles_data.model_dump())
+    for song_data in SongCreationFactory.batch(3, band_id=the_beatles.id):
+        await crud.create(db, obj_in=song_data.model_dump())
+    db.expunge_all()
+
+    statements = []
+
+    def count_statement(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(sqlite_engine.sync_engine, "before_cursor_execute", count_statement)
+    try:
+        songs = await crud.get_all(db)
+    finally:
+        event.remove(
+            sqlite_engine.sync_engine, "before_cursor_execute", count_statement
+        )
+
+    assert len(statements) == queries
+    assert [song.band.name for song in songs] == ["The Beatles"] * 3
+
+
 @pytest.mark.asyncio
 @patch("app.songs.crud.song_crud.get_all", AsyncMock(return_value="Hola"))
 async def test():
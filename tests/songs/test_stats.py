@@ -0,0 +1,101 @@
+import uuid
+from contextlib import asynccontextmanager
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import update
+from sqlalchemy.exc import NoResultFound
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.songs.crud import band_crud, song_crud
+from app.songs.models import Song
+from app.songs.stats import band_stats, rebuild
+from tests.songs.factories import BandCreationFactory, SongCreationFactory
+
+
+async def create_song(db: AsyncSession, band_id, year: int | None) -> Song:
+    song_data = SongCreationFactory.build(band_id=band_id, year=year)
+    return await song_crud.create(db, obj_in=song_data.model_dump())
+
+
+@pytest.mark.asyncio
+async def test_stats_follow_the_writes(db: AsyncSession):
+    band = await band_crud.create(db, obj_in=BandCreationFactory.build())
+    stats = await band_stats(db, band.id)
+    assert (stats.song_count, stats.min_year, stats.max_year) == (0, None, None)
+
+    first = await create_song(db, band.id, 1965)
+    second = await create_song(db, band.id, 1969)
+    await create_song(db, band.id, None)
+    stats = await band_stats(db, band.id)
+    assert (stats.song_count, stats.min_year, stats.max_year) == (3, 1965, 1969)
+    assert stats.last_song_at is not None
+
+    await song_crud.update(db, id=first.id, obj_in={"year": 1967})
+    stats = await band_stats(db, band.id)
+    assert (stats.song_count, stats.min_year, stats.max_year) == (3, 1967, 1969)
+
+    # soft deleted
+    await song_crud.remove(db, id=second.id)
+    stats = await band_stats(db, band.id)
+    assert (stats.song_count, stats.min_year, stats.max_year) == (2, 1967, 1967)
+
+
+@pytest.mark.asyncio
+async def test_stats_follow_the_batch_writes(db: AsyncSession):
+    band = await band_crud.create(db, obj_in=BandCreationFactory.build())
+    other = await band_crud.create(db, obj_in=BandCreationFactory.build())
+    ids = await song_crud.create_many(
+        db,
+        objs_in=[
+            SongCreationFactory.build(band_id=band.id, year=year)
+            for year in (1962, 1964, 1970)
+        ],
+    )
+    stats = await band_stats(db, band.id)
+    assert (stats.song_count, stats.min_year, stats.max_year) == (3, 1962, 1970)
+
+    # moved to the other band
+    await song_crud.update_many(db, ids=ids[:2], obj_in={"band_id": other.id})
+    stats = await band_stats(db, band.id)
+    assert (stats.song_count, stats.min_year, stats.max_year) == (1, 1970, 1970)
+    stats = await band_stats(db, other.id)
+    assert (stats.song_count, stats.min_year, stats.max_year) == (2, 1962, 1964)
+
+    await song_crud.remove_many(db, ids=ids)
+    assert (await band_stats(db, band.id)).song_count == 0
+    assert (await band_stats(db, other.id)).song_count == 0
+
+
+@pytest.mark.asyncio
+async def test_stats_of_missing_band(db: AsyncSession):
+    with pytest.raises(NoResultFound):
+        await band_stats(db, uuid.uuid4())
+
+
+@pytest.mark.asyncio
+async def test_rebuild(db: AsyncSession):
+    band = await band_crud.create(db, obj_in=BandCreationFactory.build())
+    song = await create_song(db, band.id, 1965)
+    await create_song(db, band.id, 1966)
+    # behind the back of the stats
+    await db.execute(update(Song).where(Song.id == song.id).values(year=1960))
+
+    @asynccontextmanager
+    async def session_factory():
+        yield db
+
+    assert await rebuild(session_factory, batch_size=1) == 1
+    stats = await band_stats(db, band.id)
+    assert (stats.song_count, stats.min_year, stats.max_year) == (2, 1960, 1966)
+
+
+@pytest.mark.asyncio
+async def test_api_band_stats(api_client: TestClient, beatles_song):
+    result = api_client.get(f"/bands/{beatles_song.band_id}/stats")
+    result.raise_for_status()
+    stats = result.json()
+    assert stats["band_id"] == str(beatles_song.band_id)
+    assert stats["song_count"] == 1
+
+    assert api_client.get(f"/bands/{uuid.uuid4()}/stats").status_code == 404